@@ -1,10 +1,18 @@
 import logging
 import socket
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import ExitStack
+from multiprocessing import get_context
+from pathlib import Path
 
 from epg2xml.config import Config, ConfigHelpRequested, ConfigLoadError, ConfigUpgradeRequired
-from epg2xml.providers import EPGHandler
+from epg2xml.daemon import EPGDaemon
+from epg2xml.httpcache import HTTPCache
+from epg2xml.journal import Journal
+from epg2xml.providers import EPGHandler, OutputProfile
+from epg2xml.utils import CompressedWriter, compression_of, html_parser_backend, open_output, select_html_parser
+from epg2xml.xmlcache import OUTPUT_KEYS, FragmentCache
 
 log = logging.getLogger("MAIN")
 
@@ -13,39 +21,116 @@ def run():
     conf = Config()
     conf.load()
 
+    if htmlparser := conf.settings["htmlparser"]:
+        select_html_parser(htmlparser)
+
+    if (cmd := conf.args["cmd"]) == "serve":
+        # The daemon loads providers itself, and again on SIGHUP.
+        EPGDaemon(conf).serve_forever()
+        return
+
     log.debug("Loading providers...")
     h = EPGHandler(conf.configs)
 
-    if (cmd := conf.args["cmd"]) in ["run", "fromdb"]:
+    if cmd in ["run", "fromdb"]:
         with ExitStack() as stack:
             xml_output = sys.stdout
+            compression, level = conf.settings["xmlcompress"], conf.settings["xmlcompresslevel"]
             if xmlfile := conf.settings["xmlfile"]:
-                xml_output = stack.enter_context(open(xmlfile, "w", encoding="utf-8"))
+                xml_output = open_output(stack, xmlfile, compression or compression_of(xmlfile), level)
             elif xmlsock := conf.settings["xmlsock"]:
                 sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
                 sock.connect(xmlsock)
-                xml_output = stack.enter_context(sock.makefile("w"))
-
+                if compression:
+                    xml_output = stack.enter_context(CompressedWriter(sock.makefile("wb"), compression, level))
+                else:
+                    xml_output = stack.enter_context(sock.makefile("w"))
+            outputs = []
+            for profile in conf.outputs:
+                output = open_output(stack, profile["PATH"], compression_of(profile["PATH"]), level)
+                flags = {k: profile[k] for k in OUTPUT_KEYS if k in profile}
+                outputs.append(OutputProfile(output, flags, profile.get("CHANNELS")))
+            if xmlcache := conf.settings["xmlcache"]:
+                xml_cache = FragmentCache(xmlcache)
+                stack.callback(xml_cache.log_stats)
+                h.set_xml_cache(stack.enter_context(xml_cache))
+
+            stream_from, streamed, journal = None, False, None
             if cmd == "fromdb":
-                log.debug("Importing from dbfile...")
-                h.from_db(conf.settings["dbfile"])
+                if conf.settings["dbstream"]:
+                    stream_from = conf.settings["dbfile"]
+                else:
+                    log.debug("Importing from dbfile...")
+                    h.from_db(conf.settings["dbfile"])
             else:
+                if replay_dir := conf.settings["replay"]:
+                    log.info("Replaying HTTP traffic from '%s'", replay_dir)
+                    h.replay(replay_dir)
+                elif record_dir := conf.settings["record"]:
+                    log.info("Recording HTTP traffic into '%s'", record_dir)
+                    h.record(record_dir)
+                stack.callback(h.close_sessions)
+
                 log.debug("Loading service channels...")
                 h.load_channels(conf.settings["channelfile"], conf.settings["parallel"])
 
                 log.debug("Loading requested channels...")
                 h.load_req_channels()
+                if conf.settings["dbfile"] is not None:
+                    h.plan_refresh(conf.settings["dbfile"])
+
+                if http_cache := conf.settings["http_cache"]:
+                    cache_size = conf.settings["http_cache_size"] * 1024**2
+                    cache = HTTPCache(http_cache, ttl=conf.settings["http_cache_ttl"], max_size=cache_size)
+                    h.set_http_cache(cache)
+
+                if journal_file := conf.settings["journal"]:
+                    journal = stack.enter_context(Journal(journal_file, resume=conf.settings["resume"]))
+                    stack.callback(journal.log_stats)
+                    h.set_journal(journal)
+
+                if parse_workers := conf.settings["parse_workers"]:
+                    # Providers run on threads, which do not mix well with forked workers.
+                    pool = ProcessPoolExecutor(
+                        max_workers=parse_workers,
+                        mp_context=get_context("spawn"),
+                        initializer=select_html_parser,
+                        initargs=(html_parser_backend.name,),
+                    )
+                    h.set_parse_pool(stack.enter_context(pool))
 
                 log.debug("Getting EPG...")
-                h.get_programs(conf.settings["parallel"])
-
-                if (dbfile := conf.settings["dbfile"]) is not None:
+                ratefile = Path(conf.settings["channelfile"]).with_name("RateLimit.json")
+                if not replay_dir:
+                    h.load_rates(ratefile)
+                if streamed := conf.settings["stream"]:
+                    log.info("Writing xmltv.dtd header...")
+                    h.stream_xml(
+                        writer=xml_output,
+                        dbfile=conf.settings["dbfile"],
+                        incremental=conf.settings["dbincremental"],
+                        parallel=conf.settings["parallel"],
+                        outputs=outputs,
+                    )
+                else:
+                    h.get_programs(conf.settings["parallel"])
+                if not replay_dir:
+                    h.save_rates(ratefile)
+                if http_cache:
+                    cache.log_stats()
+                html_parser_backend.log_stats()
+
+                if not streamed and (dbfile := conf.settings["dbfile"]) is not None:
                     log.debug("Exporting to dbfile...")
-                    h.to_db(dbfile)
+                    h.to_db(dbfile, incremental=conf.settings["dbincremental"])
 
-            log.info("Writing xmltv.dtd header...")
-            h.to_xml(writer=xml_output)
+            if not streamed:
+                log.info("Writing xmltv.dtd header...")
+                h.to_xml(writer=xml_output, dbfile=stream_from, outputs=outputs)
 
+            if journal is not None:
+                # The run is complete, so the next one starts over.
+                journal.clear()
             log.info("Done")
     elif cmd == "update_channels":
         h.load_channels(conf.settings["channelfile"], conf.settings["parallel"])
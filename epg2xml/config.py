@@ -7,11 +7,13 @@ import sys
 from copy import deepcopy
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
-from typing import Union
+from typing import List, Union
 
 from epg2xml import __description__, __title__, __url__, __version__
 from epg2xml.providers.all import PROVIDERS
+from epg2xml.refresh import RefreshPolicy, parse_duration
 from epg2xml.utils import OptionalDependencyError, dump_config, load_config
+from epg2xml.xmlcache import OUTPUT_KEYS
 
 # Reduce log noise from third-party modules.
 logging.getLogger("requests").setLevel(logging.ERROR)
@@ -68,8 +70,13 @@ class Config:
             "ADD_XMLTV_NS": False,
             "ADD_CHANNEL_ICON": True,
             "HTTP_PROXY": None,
+            "CONCURRENCY": 1,
+            "MAX_TPS": None,
+            "REFRESH_POLICY": None,
+            "REFRESH_INTERVAL": "1h",
         },
         **{provider.name.upper(): {"MY_CHANNELS": []} for provider in PROVIDERS},
+        "OUTPUTS": [],
     }
 
     base_settings = {
@@ -115,6 +122,27 @@ class Config:
             "help": "send output to this Unix socket",
             "argparse": {"nargs": "?", "const": None},
         },
+        "xmlcompress": {
+            "argv": ["--xmlcompress"],
+            "env": "EPG2XML_XMLCOMPRESS",
+            "default": None,
+            "help": "compress output (xmlfile: guessed from .gz/.xz/.bz2 if not given)",
+            "argparse": {"choices": ("gzip", "xz", "bz2")},
+        },
+        "xmlcompresslevel": {
+            "argv": ["--xmlcompresslevel"],
+            "env": "EPG2XML_XMLCOMPRESSLEVEL",
+            "default": None,
+            "help": "compression level (gzip/bz2: 1-9, xz: 0-9)",
+            "argparse": {"type": int},
+        },
+        "xmlcache": {
+            "argv": ["--xmlcache"],
+            "env": "EPG2XML_XMLCACHE",
+            "default": None,
+            "help": "reuse <programme> elements rendered in earlier runs from this file",
+            "argparse": {"nargs": "?", "const": None},
+        },
         "parallel": {
             "argv": ["--parallel"],
             "env": "EPG2XML_PARALLEL",
@@ -122,6 +150,27 @@ class Config:
             "help": "run in parallel",
             "argparse": {"action": "store_true"},
         },
+        "htmlparser": {
+            "argv": ["--htmlparser"],
+            "env": "EPG2XML_HTMLPARSER",
+            "default": None,
+            "help": "HTML parser (default: lxml if installed, else html.parser; lxml.html: lxml API where supported)",
+            "argparse": {"choices": ("lxml", "html.parser", "html5lib", "lxml.html")},
+        },
+        "parse_workers": {
+            "argv": ["--parse-workers"],
+            "env": "EPG2XML_PARSE_WORKERS",
+            "default": 0,
+            "help": "parse HTML pages of KT, NAVER and DAUM in this many processes (0: in the fetching threads)",
+            "argparse": {"type": int},
+        },
+        "stream": {
+            "argv": ["--stream"],
+            "env": "EPG2XML_STREAM",
+            "default": False,
+            "help": "run: write programs of each channel as soon as they are fetched",
+            "argparse": {"action": "store_true"},
+        },
         "dbfile": {
             "argv": ["--dbfile"],
             "env": "EPG2XML_DBFILE",
@@ -129,6 +178,82 @@ class Config:
             "help": "path to the database file for import/export",
             "argparse": {"nargs": "?", "const": None},
         },
+        "dbincremental": {
+            "argv": ["--dbincremental"],
+            "env": "EPG2XML_DBINCREMENTAL",
+            "default": False,
+            "help": "update dbfile in place, keeping programs outside the fetched period",
+            "argparse": {"action": "store_true"},
+        },
+        "dbstream": {
+            "argv": ["--dbstream"],
+            "env": "EPG2XML_DBSTREAM",
+            "default": False,
+            "help": "fromdb: write programs while reading dbfile instead of loading them first",
+            "argparse": {"action": "store_true"},
+        },
+        "journal": {
+            "argv": ["--journal"],
+            "env": "EPG2XML_JOURNAL",
+            "default": None,
+            "help": "run: record fetched work units in this file until the run completes",
+            "argparse": {"nargs": "?", "const": None},
+        },
+        "resume": {
+            "argv": ["--resume"],
+            "env": "EPG2XML_RESUME",
+            "default": False,
+            "help": "run: skip work units an interrupted run recorded in the journal",
+            "argparse": {"action": "store_true"},
+        },
+        "http_port": {
+            "argv": ["--http-port"],
+            "env": "EPG2XML_HTTP_PORT",
+            "default": None,
+            "help": "serve: serve the latest XMLTV over HTTP on this port",
+            "argparse": {"type": int},
+        },
+        "http_bind": {
+            "argv": ["--http-bind"],
+            "env": "EPG2XML_HTTP_BIND",
+            "default": "127.0.0.1",
+            "help": "serve: address to bind the HTTP server to",
+        },
+        "http_cache": {
+            "argv": ["--http-cache"],
+            "env": "EPG2XML_HTTP_CACHE",
+            "default": None,
+            "help": "cache HTTP responses in this directory",
+            "argparse": {"nargs": "?", "const": None},
+        },
+        "http_cache_ttl": {
+            "argv": ["--http-cache-ttl"],
+            "env": "EPG2XML_HTTP_CACHE_TTL",
+            "default": 0,
+            "help": "seconds to serve cached responses before revalidating them",
+            "argparse": {"type": int},
+        },
+        "http_cache_size": {
+            "argv": ["--http-cache-size"],
+            "env": "EPG2XML_HTTP_CACHE_SIZE",
+            "default": 100,
+            "help": "size limit of the HTTP cache in MiB",
+            "argparse": {"type": int},
+        },
+        "record": {
+            "argv": ["--record"],
+            "env": "EPG2XML_RECORD",
+            "default": None,
+            "help": "record HTTP traffic of providers into this directory",
+            "argparse": {"nargs": "?", "const": None},
+        },
+        "replay": {
+            "argv": ["--replay"],
+            "env": "EPG2XML_REPLAY",
+            "default": None,
+            "help": "replay HTTP traffic recorded in this directory instead of going online",
+            "argparse": {"nargs": "?", "const": None},
+        },
     }
 
     def __init__(self):
@@ -138,6 +263,7 @@ class Config:
         self.settings = self.get_settings()
         # Configs
         self.configs = None
+        self.outputs = []
 
     @property
     def default_config(self):
@@ -198,14 +324,35 @@ class Config:
 
     def load_with_hidden(self, cfg_old):
         cfg_new = deepcopy(cfg_old)
+        self.outputs = self.load_outputs(cfg_new.pop("OUTPUTS", []))
         for p in cfg_new:
             # Apply GLOBAL values as per-provider defaults.
             for k, v in cfg_old["GLOBAL"].items():
                 if k not in cfg_new[p]:
                     cfg_new[p][k] = deepcopy(v)
+            RefreshPolicy.from_config(cfg_new[p].get("REFRESH_POLICY"))
+            if (interval := cfg_new[p].get("REFRESH_INTERVAL")) is not None:
+                parse_duration(interval)
         del cfg_new["GLOBAL"]
         self.configs = cfg_new
 
+    @staticmethod
+    def load_outputs(outputs) -> List[dict]:
+        """Check OUTPUTS entries: extra XMLTV files written from the same fetch with their own output flags."""
+        if not isinstance(outputs, list):
+            raise ValueError(f"OUTPUTS must be a list: {outputs!r}")
+        for profile in outputs:
+            if not isinstance(profile, dict) or not isinstance(profile.get("PATH"), str):
+                raise ValueError(f"OUTPUTS entries require a PATH: {profile!r}")
+            if unknown := set(profile) - {"PATH", "CHANNELS", *OUTPUT_KEYS}:
+                raise ValueError(f"Unknown keys in OUTPUTS entry: {sorted(unknown)}")
+            if any(not isinstance(profile[k], bool) for k in OUTPUT_KEYS if k in profile):
+                raise ValueError(f"OUTPUTS flags must be true or false: {profile!r}")
+            channels = profile.get("CHANNELS")
+            if channels is not None and not (isinstance(channels, list) and all(isinstance(x, str) for x in channels)):
+                raise ValueError(f"OUTPUTS CHANNELS must be a list of channel ids or patterns: {channels!r}")
+        return outputs
+
     def load(self):
         logger.debug("Loading config...")
         try:
@@ -256,15 +403,44 @@ class Config:
                 logger.exception("Failed to resolve setting %r", name)
 
         # Check that parent directories for important files exist.
-        for argname in ["config", "logfile", "channelfile", "dbfile"]:
+        for argname in [
+            "config",
+            "logfile",
+            "channelfile",
+            "xmlcache",
+            "dbfile",
+            "journal",
+            "http_cache",
+            "record",
+            "replay",
+        ]:
             filepath = setts[argname]
             if filepath is not None and not Path(filepath).parent.exists():
                 raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), filepath)
 
         # Normalize boolean arguments.
-        for argname in ["parallel"]:
+        for argname in ["parallel", "stream", "dbincremental", "dbstream", "resume"]:
             if isinstance(setts[argname], str):
                 setts[argname] = setts[argname].lower() in ("y", "yes", "t", "true", "on", "1")
+        if setts["resume"] and setts["journal"] is None:
+            logger.warning("Ignoring resume without a journal to resume from; pass --journal as well")
+            setts["resume"] = False
+
+        # Normalize integer arguments.
+        for argname in ["http_port", "http_cache_ttl", "http_cache_size", "xmlcompresslevel", "parse_workers"]:
+            if not isinstance(setts[argname], str):
+                continue
+            try:
+                setts[argname] = int(setts[argname])
+            except ValueError:
+                logger.warning("Ignoring invalid integer setting %s=%r", argname, setts[argname])
+                setts[argname] = self.base_settings[argname]["default"]
+
+        # Validate choices, which argparse only does for command line arguments.
+        for argname in ["xmlcompress", "htmlparser"]:
+            if setts[argname] not in (None, *self.base_settings[argname]["argparse"]["choices"]):
+                logger.warning("Ignoring invalid setting %s=%r", argname, setts[argname])
+                setts[argname] = self.base_settings[argname]["default"]
 
         # Configure file logging.
         if setts["logfile"] is not None:
@@ -289,12 +465,13 @@ class Config:
         parser.add_argument(
             "cmd",
             metavar="command",
-            choices=("run", "fromdb", "update_channels"),
+            choices=("run", "fromdb", "update_channels", "serve"),
             help="\n".join(
                 (
                     '"run": XML 형식으로 출력',
                     '"fromdb": dbfile로부터 불러오기',
                     '"update_channels": 채널 정보 업데이트',
+                    '"serve": 계속 실행하며 제공자별로 주기적으로 갱신',
                 )
             ),
         )
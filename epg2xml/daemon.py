@@ -0,0 +1,260 @@
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from epg2xml.config import Config, ConfigHelpRequested, ConfigLoadError, ConfigUpgradeRequired
+from epg2xml.httpcache import HTTPCache
+from epg2xml.providers import EPGChannel, EPGHandler, EPGProvider, output_targets
+from epg2xml.refresh import parse_duration
+from epg2xml.server import ChannelFragment, Snapshot, XMLTVServer
+from epg2xml.utils import AtomicOutput, compress_bytes, compression_of
+from epg2xml.xmlcache import FragmentCache
+
+log = logging.getLogger("DAEMON")
+
+
+def load_config() -> Config:
+    conf = Config()
+    conf.load()
+    return conf
+
+
+class EPGDaemon:
+    """Keep providers and their sessions across refreshes, and the latest XMLTV document in memory.
+
+    Each provider is refreshed every REFRESH_INTERVAL on a worker thread, and rendered into fragments per
+    channel. When a refresh completes, a Snapshot of the document is put together from the latest fragments
+    of all providers and swapped in whole, so readers never wait on a refresh nor see a partial one.
+    A failed refresh keeps the previous fragments. SIGHUP reloads the config once the refreshes in flight
+    are done, keeping the providers whose config did not change. SIGINT and SIGTERM stop the daemon.
+    """
+
+    def __init__(self, conf: Config, reload_config: Callable[[], Config] = load_config):
+        self.conf = conf
+        self.reload_config = reload_config
+        self.handler: Optional[EPGHandler] = None
+        self.http_cache: Optional[HTTPCache] = None
+        self.xml_cache: Optional[FragmentCache] = None
+        self.snapshot: Optional[Snapshot] = None
+        self.fragments: Dict[str, List[ChannelFragment]] = {}
+        self.publish_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.written: Optional[Snapshot] = None
+        self.running: Dict[str, Future] = {}
+        self.due: Dict[str, float] = {}
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.executor_workers = 0
+        self.wakeup = threading.Event()
+        self.reload_requested = threading.Event()
+        self.stopping = threading.Event()
+
+    def load(self) -> None:
+        """Load providers and channels from the current config, reusing the providers that did not change."""
+        handler = EPGHandler(self.conf.configs)
+        previous = {p.provider_name: p for p in self.handler.providers} if self.handler is not None else {}
+        providers = []
+        for p in handler.providers:
+            prev = previous.pop(p.provider_name, None)
+            if prev is not None and prev.cfg == p.cfg:
+                p.sess.close()
+                p = prev
+            else:
+                if prev is not None:
+                    prev.sess.close()
+                self.due[p.provider_name] = 0
+            providers.append(p)
+        for prev in previous.values():
+            prev.sess.close()
+            self.due.pop(prev.provider_name, None)
+        handler.providers = providers
+
+        handler.load_channels(self.conf.settings["channelfile"], self.conf.settings["parallel"])
+        handler.load_req_channels()
+        handler.set_http_cache(self.http_cache)
+        handler.set_xml_cache(self.xml_cache)
+        handler.load_rates(self.ratefile)
+        self.handler = handler
+
+        with self.publish_lock:
+            if removed := set(self.fragments) - {p.provider_name for p in providers}:
+                for name in removed:
+                    del self.fragments[name]
+                self.__publish()
+        self.write_xmlfile()
+
+    @property
+    def xml(self) -> Optional[str]:
+        return None if self.snapshot is None else self.snapshot.body.decode("utf-8")
+
+    @property
+    def xml_compression(self) -> Optional[str]:
+        xmlfile = self.conf.settings["xmlfile"]
+        return self.conf.settings["xmlcompress"] or (compression_of(xmlfile) if xmlfile else None)
+
+    @property
+    def ratefile(self) -> Path:
+        return Path(self.conf.settings["channelfile"]).with_name("RateLimit.json")
+
+    def interval(self, p: EPGProvider) -> float:
+        return parse_duration(p.cfg.get("REFRESH_INTERVAL") or 3600).total_seconds()
+
+    def refresh(self, p: EPGProvider) -> None:
+        """Fetch the programs of a provider again and publish the document with them."""
+        stime = time.time()
+        for ch in p.req_channels:
+            ch.programs.clear()
+        try:
+            p.get_programs()
+            fragments = []
+            for ch in p.req_channels:
+                if not ch.programs:
+                    p.log.warning("Skipping '%s' because no program entries were found", ch.id)
+                    continue
+                fragments.append(self.render_channel(p, ch))
+        except Exception:  # pylint: disable=broad-except
+            p.log.exception("Refresh failed, keeping the previous programs")
+            return
+        finally:
+            for ch in p.req_channels:
+                ch.programs.clear()
+        with self.publish_lock:
+            self.fragments[p.provider_name] = fragments
+            self.__publish()
+            self.handler.save_rates(self.ratefile)
+        self.write_xmlfile()
+        p.log.info("Refreshed in %.1fs", time.time() - stime)
+
+    @staticmethod
+    def render_channel(p: EPGProvider, ch: EPGChannel) -> ChannelFragment:
+        channel, programs = StringIO(), StringIO()
+        ch.to_xml(writer=channel)
+        targets = output_targets(programs, p.cfg, (), ch.id)
+        for prog in ch.programs:
+            prog.write_xml(targets, cache=p.xml_cache)
+        return ch.id, channel.getvalue(), programs.getvalue()
+
+    def __publish(self) -> None:
+        names = [p.provider_name for p in self.handler.providers]
+        head = StringIO()
+        EPGHandler.write_head(head)
+        providers = [(name, self.fragments[name]) for name in names if name in self.fragments]
+        # With a gzipped xmlfile, the snapshot is compressed as that file is, so that both share the bytes.
+        level = self.conf.settings["xmlcompresslevel"] if self.xml_compression == "gzip" else 6
+        self.snapshot = Snapshot(head.getvalue(), providers, time.time(), 9 if level is None else level)
+
+    def write_xmlfile(self) -> None:
+        """Write the latest snapshot into xmlfile from its bytes, outside of publish_lock.
+
+        Writes take turns and each takes the snapshot current at the time, so the file ends up with the last one.
+        """
+        if not (xmlfile := self.conf.settings["xmlfile"]):
+            return
+        with self.write_lock:
+            snapshot = self.snapshot
+            if snapshot is None or snapshot is self.written:
+                return
+            if (compression := self.xml_compression) == "gzip":
+                data = snapshot.gzipped
+            elif compression:
+                data = compress_bytes(snapshot.body, compression, self.conf.settings["xmlcompresslevel"])
+            else:
+                data = snapshot.body
+            with AtomicOutput(xmlfile) as raw:
+                raw.write(data)
+            self.written = snapshot
+
+    def tick(self, now: float) -> float:
+        """Start the refreshes that are due at now, and return the seconds until the next one."""
+        for name, future in list(self.running.items()):
+            if future.done():
+                del self.running[name]
+        for p in self.handler.providers:
+            name = p.provider_name
+            if name in self.running or self.due.get(name, 0) > now:
+                continue
+            self.due[name] = now + self.interval(p)
+            self.running[name] = self.executor.submit(self.refresh, p)
+            self.running[name].add_done_callback(lambda _: self.wakeup.set())
+        waiting = [self.due[p.provider_name] for p in self.handler.providers if p.provider_name not in self.running]
+        return max(0.0, min(waiting, default=now + 3600) - now)
+
+    def reload(self) -> None:
+        self.reload_requested.clear()
+        log.info("Reloading config...")
+        try:
+            conf = self.reload_config()
+        except (ConfigHelpRequested, ConfigLoadError, ConfigUpgradeRequired, FileNotFoundError) as e:
+            log.error("Keeping the current config: %r", e)
+            return
+        # The refreshes in flight finish with the providers they started with.
+        wait(list(self.running.values()))
+        self.conf = conf
+        self.start_executor()
+        self.load()
+
+    def start_executor(self) -> None:
+        """Start the refresh workers, or start them again if their number changed with the config."""
+        workers = len(self.conf.configs) if self.conf.settings["parallel"] else 1
+        if self.executor is not None:
+            if workers == self.executor_workers:
+                return
+            # Idle, as reload() waits for the refreshes in flight.
+            self.executor.shutdown()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresh")
+        self.executor_workers = workers
+
+    def request_reload(self, *_) -> None:
+        self.reload_requested.set()
+        self.wakeup.set()
+
+    def stop(self, *_) -> None:
+        self.stopping.set()
+        self.wakeup.set()
+
+    def install_signals(self) -> None:
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self.request_reload)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def serve_forever(self) -> None:
+        settings = self.conf.settings
+        if http_cache := settings["http_cache"]:
+            cache_size = settings["http_cache_size"] * 1024**2
+            self.http_cache = HTTPCache(http_cache, ttl=settings["http_cache_ttl"], max_size=cache_size)
+        if xmlcache := settings["xmlcache"]:
+            self.xml_cache = FragmentCache(xmlcache)
+        self.start_executor()
+        self.install_signals()
+        httpd = None
+        try:
+            self.load()
+            if settings["http_port"] is not None:
+                httpd = XMLTVServer((settings["http_bind"], settings["http_port"]), lambda: self.snapshot)
+                httpd.start()
+            log.info("Serving %d providers", len(self.handler.providers))
+            while not self.stopping.is_set():
+                if self.reload_requested.is_set():
+                    self.reload()
+                timeout = self.tick(time.time())
+                self.wakeup.wait(timeout)
+                self.wakeup.clear()
+        finally:
+            log.info("Stopping...")
+            if httpd is not None:
+                httpd.stop()
+            for future in self.running.values():
+                future.cancel()
+            self.executor.shutdown()
+            if self.handler is not None:
+                self.handler.close_sessions()
+            if self.xml_cache is not None:
+                self.xml_cache.close()
+                self.xml_cache.log_stats()
+            if self.http_cache is not None:
+                self.http_cache.log_stats()
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from os import PathLike
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+log = logging.getLogger("HTTP")
+
+
+class CacheEntry(NamedTuple):
+    key: str
+    text: str
+    stored: float
+    expires: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_type: Optional[str] = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+    @property
+    def validators(self) -> dict:
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    """Size-bounded on-disk store of GET responses keyed by method, URL and params.
+
+    Each entry is a `<key>.json` metadata file next to a `<key>.body` file holding the decoded text.
+    Entries are served without a request for `ttl` seconds (or the server's max-age or Expires), then
+    revalidated with If-None-Match/If-Modified-Since. Least recently used bodies are evicted past `max_size` bytes.
+    """
+
+    def __init__(self, cache_dir: PathLike, ttl: float = 0, max_size: int = 100 * 1024**2):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.size = sum(f.stat().st_size for f in self.cache_dir.glob("*.body"))
+
+    @staticmethod
+    def request_key(method: str, url: str, params: Any = None) -> str:
+        raw = json.dumps([method.upper(), url, params], sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, method: str, url: str, params: Any = None) -> Optional[CacheEntry]:
+        key = self.request_key(method, url, params)
+        meta_path = self.cache_dir / f"{key}.json"
+        try:
+            with open(meta_path, "r", encoding="utf-8") as fp:
+                meta = json.load(fp)
+            text = (self.cache_dir / f"{key}.body").read_text(encoding="utf-8")
+        except (FileNotFoundError, json.decoder.JSONDecodeError, ValueError):
+            return None
+        return CacheEntry(key=key, text=text, **meta)
+
+    def hit(self, entry: CacheEntry, response: Any = None) -> None:
+        """Record a use of `entry`, or renew it from `response`, the 304 confirming it is unchanged.
+
+        The headers of a 304 replace the stored ones, so its Cache-Control or Expires sets the new lifetime,
+        which otherwise stays what it was, and validators it carries are kept for the next revalidation.
+        """
+        self.stats["hits" if response is None else "revalidated"] += 1
+        if response is not None:
+            headers = getattr(response, "headers", None) or {}
+            now = time.time()
+            ttl = self.__max_age(headers, entry.expires - entry.stored)
+            entry = entry._replace(
+                stored=now,
+                expires=now + (ttl or 0),
+                etag=headers.get("ETag") or entry.etag,
+                last_modified=headers.get("Last-Modified") or entry.last_modified,
+            )
+            self.__write_meta(entry.key, entry)
+        try:
+            os.utime(self.cache_dir / f"{entry.key}.body")
+        except FileNotFoundError:
+            pass
+
+    def put(self, method: str, url: str, params: Any, response: Any) -> None:
+        """Store a successful response if it can be reused."""
+        self.stats["misses"] += 1
+        headers = getattr(response, "headers", None) or {}
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        ttl = self.__max_age(headers, self.ttl)
+        if ttl is None:
+            return
+        if not (ttl or etag or last_modified):
+            return
+        key = self.request_key(method, url, params)
+        body = response.text.encode("utf-8")
+        body_path = self.cache_dir / f"{key}.body"
+        now = time.time()
+        entry = CacheEntry(key, "", now, now + ttl, etag, last_modified, headers.get("Content-Type"))
+        with self.lock:
+            try:
+                self.size -= body_path.stat().st_size
+            except FileNotFoundError:
+                pass
+            self.__atomic_write(body_path, body)
+            self.__write_meta(key, entry)
+            self.size += len(body)
+            if self.size > self.max_size:
+                self.__evict()
+
+    def __max_age(self, headers: Any, default: float) -> Optional[float]:
+        """TTL for a response: None if it must not be stored, else max-age, Expires or `default`.
+
+        The configured ttl is the least a response given a lifetime is kept for.
+        """
+        directives = {}
+        for directive in headers.get("Cache-Control", "").lower().split(","):
+            name, _, value = directive.strip().partition("=")
+            directives[name] = value.strip('"')
+        if "no-store" in directives:
+            return None
+        if "no-cache" in directives:
+            return 0
+        if "max-age" in directives:
+            try:
+                return max(self.ttl, float(directives["max-age"]))
+            except ValueError:
+                return self.ttl
+        if expires := headers.get("Expires"):
+            try:
+                served = parsedate_to_datetime(headers["Date"]).timestamp() if headers.get("Date") else time.time()
+                return max(self.ttl, parsedate_to_datetime(expires).timestamp() - served)
+            except (TypeError, ValueError):
+                # An invalid Expires means already expired.
+                return self.ttl
+        return default
+
+    def __write_meta(self, key: str, entry: CacheEntry) -> None:
+        meta = entry._asdict()
+        del meta["key"], meta["text"]
+        self.__atomic_write(self.cache_dir / f"{key}.json", json.dumps(meta).encode("utf-8"))
+
+    @staticmethod
+    def __atomic_write(path: Path, data: bytes) -> None:
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def __evict(self) -> None:
+        bodies = []
+        for f in self.cache_dir.glob("*.body"):
+            try:
+                st = f.stat()
+            except FileNotFoundError:
+                continue
+            bodies.append((st.st_mtime, st.st_size, f))
+        bodies.sort()
+        self.size = sum(size for _, size, _ in bodies)
+        for _, size, f in bodies:
+            if self.size <= self.max_size:
+                break
+            f.with_suffix(".json").unlink(missing_ok=True)
+            f.unlink(missing_ok=True)
+            self.size -= size
+            self.stats["evicted"] += 1
+
+    def log_stats(self) -> None:
+        log.info(
+            "HTTP cache: %d hits, %d revalidated, %d misses, %d evicted (%.1f MiB)",
+            self.stats["hits"],
+            self.stats["revalidated"],
+            self.stats["misses"],
+            self.stats["evicted"],
+            self.size / 1024**2,
+        )
@@ -0,0 +1,90 @@
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import fields
+from os import PathLike
+from typing import Any, List, Optional
+
+from epg2xml import __version__
+
+log = logging.getLogger("JOURNAL")
+
+
+class Journal:
+    """SQLite checkpoint of the work units a run has completed, with the programs each of them gave.
+
+    EPGProvider.fetch_programs() records every (provider, channel, unit) as soon as it is fetched, so a run
+    that dies halfway loses only the units in flight. With `resume`, units recorded by the same epg2xml
+    version within `max_age` seconds are taken from here instead of being fetched again; otherwise the
+    journal starts empty. A run that completes clears it.
+    """
+
+    def __init__(self, dbfile: PathLike, resume: bool = False, max_age: float = 6 * 3600):
+        self.conn = sqlite3.connect(dbfile, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS unit (
+            provider TEXT NOT NULL, channel TEXT NOT NULL, args TEXT NOT NULL,
+            version TEXT NOT NULL, stored REAL NOT NULL, programs BLOB NOT NULL,
+            PRIMARY KEY (provider, channel, args)
+            )"""
+        )
+        self.resume = resume
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        with self.conn:
+            if resume:
+                self.conn.execute(
+                    "DELETE FROM unit WHERE version != ? OR stored < ?", (__version__, time.time() - max_age)
+                )
+            else:
+                self.conn.execute("DELETE FROM unit")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, provider: str, channelid: str, args: tuple) -> Optional[List[tuple]]:
+        """Field tuples of the programs a completed unit gave, or None if it has to be fetched."""
+        if not self.resume:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT programs FROM unit WHERE provider = ? AND channel = ? AND args = ? AND stored >= ?",
+                (provider, channelid, repr(args), time.time() - self.max_age),
+            ).fetchone()
+            if row is None:
+                return None
+            self.stats["resumed"] += 1
+        return pickle.loads(row[0])
+
+    def put(self, provider: str, channelid: str, args: tuple, programs: List[Any]) -> None:
+        """Record a completed unit. It is committed right away, as the run may die any time after."""
+        records = [tuple(getattr(p, f.name) for f in fields(p)) for p in programs]
+        data = pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO unit (provider, channel, args, version, stored, programs) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (provider, channelid, repr(args), __version__, time.time(), data),
+            )
+            self.stats["recorded"] += 1
+
+    def clear(self) -> None:
+        """Forget all units, once the run they belong to has completed."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM unit")
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+    def log_stats(self) -> None:
+        log.info("Journal: %d units resumed, %d recorded", self.stats["resumed"], self.stats["recorded"])
@@ -1,19 +1,39 @@
 import json
 import logging
+import queue
 import re
 import sqlite3
 import sys
+import threading
 import time
-from collections import Counter
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from contextlib import closing
-from dataclasses import InitVar, asdict, dataclass, fields
-from datetime import datetime, timedelta
-from functools import wraps
+from collections import Counter, deque
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, closing, suppress
+from dataclasses import InitVar, dataclass, field, fields
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from fnmatch import fnmatchcase
+from functools import lru_cache, wraps
 from importlib import import_module
-from itertools import chain
+from itertools import chain, islice
 from os import PathLike
-from typing import Any, ClassVar, Iterable, Iterator, List, Literal, Optional, TextIO, Tuple, Union
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 try:
     from curl_cffi import requests
@@ -21,8 +41,14 @@ except ImportError:
     import requests
 
 from epg2xml import __title__, __version__
+from epg2xml.httpcache import CacheEntry, HTTPCache
 from epg2xml.id_format import render_id_format
-from epg2xml.utils import Element, PrefixLogger, RateLimiter, dump_json, norm_text
+from epg2xml.journal import Journal
+from epg2xml.refresh import FetchedUnit, RefreshPolicy
+from epg2xml.replay import RecordingSession, ReplaySession, archive_path
+from epg2xml.utils import AdaptiveRateLimiter, PrefixLogger, decode_body, dump_json, json_loads, norm_text, xmltv_time
+from epg2xml.xmlcache import OUTPUT_KEYS, FragmentCache
+from epg2xml.xmltv import ChannelData, ProgrammeData, render_channel, render_programme
 
 log = logging.getLogger("PROV")
 
@@ -59,6 +85,20 @@ TAG_CREDITS = (
 )
 
 
+# Programs are held by the million before being written, so drop their per-instance __dict__ where possible.
+DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+def intern_text(value: Optional[str]) -> Optional[str]:
+    """Return the shared copy of a string repeated across programs, e.g. channel ids and categories."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@lru_cache(maxsize=None)
+def rating_label(rating: int) -> str:
+    return "전체 관람가" if rating == 0 else f"{rating}세 이상 관람가"
+
+
 def norm_text_list(values: List[str]) -> Optional[List[str]]:
     if not values:
         return None
@@ -76,7 +116,15 @@ class DuplicateChannelIdError(ValueError):
     """Raised when requested channels resolve to duplicate XML channel IDs."""
 
 
-@dataclass
+class ChannelEnded(Exception):
+    """Raised by a fetch_programs() fetch when its channel has no programs from this unit on."""
+
+
+class _StreamClosed(Exception):
+    """Stops a background get_programs() whose iter_programs() consumer went away."""
+
+
+@dataclass(**DATACLASS_SLOTS)
 class Credit:
     name: str
     title: str
@@ -96,7 +144,7 @@ class Credit:
             raise ValueError(f"Unsupported credit title: {self.title}")
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class EPGProgram:
     """For individual program entities"""
 
@@ -118,6 +166,12 @@ class EPGProgram:
     extras: List[str] = None
     keywords: List[str] = None
 
+    def __post_init__(self) -> None:
+        self.channelid = intern_text(self.channelid)
+        for field_name in ("categories", "extras", "keywords"):
+            if values := getattr(self, field_name):
+                setattr(self, field_name, [intern_text(x) for x in values])
+
     def __str__(self) -> str:
         title = self.title or "<untitled>"
         stime = self.stime.isoformat() if isinstance(self.stime, datetime) else repr(self.stime)
@@ -129,7 +183,7 @@ class EPGProgram:
             return
         items = getattr(self, field_name) or []
         if value not in items:
-            items.append(value)
+            items.append(intern_text(value))
             setattr(self, field_name, items)
 
     def add_category(self, value: str) -> None:
@@ -214,111 +268,201 @@ class EPGProgram:
         for credit in (self.cast or []) + (self.crew or []):
             credit.validate()
 
-    def to_xml(self, cfg: dict, writer: TextIO = None) -> None:
-        self.sanitize()
-        self.validate()
-        if self.etime is None:
-            raise ValueError("EPGProgram.etime is required for XML serialization")
+    def xml_data(self, cfg: dict, checked: bool = False) -> ProgrammeData:
+        """Sanitize, validate and resolve the fields written for this program under the given provider config.
+
+        With checked, sanitize() and validate() are taken as done, e.g. when rendering for another output.
+        """
+        if not checked:
+            self.sanitize()
+            self.validate()
+        return programme_data(self, cfg)
+
+    def to_xml(self, cfg: dict, writer: TextIO = None, cache: FragmentCache = None) -> None:
         writer = writer or sys.stdout
+        writer.write(render_programme(self.xml_data(cfg)) if cache is None else cache.render(self, cfg))
+        writer.write("\n")
+
+    def write_xml(self, targets: Sequence[Tuple[TextIO, dict]], cache: FragmentCache = None) -> None:
+        """Write this program to several (writer, cfg) outputs, rendering it once per distinct output config."""
+        rendered = {}
+        # Rendering sanitizes the program, so its cache content is taken before the first one.
+        content = None if cache is None else cache.program_content(self)
+        for writer, cfg in targets:
+            flags = tuple(cfg[k] for k in OUTPUT_KEYS)
+            if (xml := rendered.get(flags)) is None:
+                if cache is not None:
+                    xml = cache.render(self, cfg, content)
+                else:
+                    xml = render_programme(self.xml_data(cfg, checked=bool(rendered)))
+                rendered[flags] = xml
+            writer.write(xml)
+            writer.write("\n")
+
+
+class ProgramRow(NamedTuple):
+    """A program of an epgprogram row as EPGProgram.sanitize() and validate() would leave it, for writing only.
+
+    Only the columns that are written are decoded, and categories and keywords only when set, so a stored
+    program is written without the per-row cost of EPGProgram and of the JSON/TIMESTAMP converters.
+    """
+
+    channelid: str
+    stime: datetime
+    etime: Optional[datetime]
+    title: Optional[str]
+    title_sub: Optional[str]
+    ep_num: Optional[str]
+    categories: Optional[List[str]]
+    rebroadcast: bool
+    rating: int
+    desc: Optional[str]
+    poster_url: Optional[str]
+    keywords: Optional[List[str]]
+    # Credits are not stored as JSON, so EPGProgram drops them when loaded from a row as well.
+    cast: None = None
+    crew: None = None
+
+    def __str__(self) -> str:
+        return f"{self.title or '<untitled>'} <{self.channelid}> @ {self.stime.isoformat()}"
 
-        # local variables
-        stime = self.stime.strftime("%Y%m%d%H%M%S +0900")
-        etime = self.etime.strftime("%Y%m%d%H%M%S +0900")
-        title = self.title
-        title_sub = self.title_sub
-        cast = self.cast or []
-        crew = self.crew or []
-        categories = self.categories or []
-        keywords = self.keywords or []
-        episode = self.ep_num
-        rebroadcast = "재" if self.rebroadcast else ""
-        rating = "전체 관람가" if self.rating == 0 else f"{self.rating}세 이상 관람가"
-
-        # programm
-        _p = Element("programme", start=stime, stop=etime, channel=self.channelid)
-
-        # title, sub-title
-        if title and (matches := PTN_TITLE.match(title)):
-            title = matches.group(1).strip()
-            title_sub = " ".join(filter(bool, [matches.group(2), title_sub]))
-            title_sub = title_sub or None
-        title = [
-            title or title_sub or "제목 없음",
-            f"({episode}회)" if episode and cfg["ADD_EPNUM_TO_TITLE"] else "",
-            f"({rebroadcast})" if rebroadcast and cfg["ADD_REBROADCAST_TO_TITLE"] else "",
+    @classmethod
+    def from_row(cls, row: tuple) -> "ProgramRow":
+        """Build from a row read without converters, raising as EPGProgram.validate() would."""
+        channelid, stime, etime, title, title_sub, _, ep_num, categories, rebroadcast, rating, desc, poster_url, *_ = row
+        keywords = row[-1]
+        if not channelid:
+            raise ValueError(f"EPGProgram.channelid is required: {row}")
+        if stime is None:
+            raise TypeError(f"EPGProgram.stime must be a datetime: {row}")
+        if rebroadcast is None:
+            raise TypeError(f"EPGProgram.rebroadcast must be a bool: {row}")
+        stime = datetime.fromisoformat(stime)
+        if etime is not None:
+            etime = datetime.fromisoformat(etime)
+            if etime < stime:
+                raise ValueError(f"EPGProgram.etime must not be earlier than stime: {row}")
+        title, title_sub = norm_text(title), norm_text(title_sub)
+        if title and title_sub == title:
+            title_sub = None
+        try:
+            rating = max(0, int(rating or 0))
+        except (TypeError, ValueError):
+            rating = 0
+        this = cls(
+            channelid,
+            stime,
+            etime,
+            title,
+            title_sub,
+            norm_text(ep_num),
+            categories and norm_text_list(json_loads(categories)),
+            bool(int(rebroadcast)),
+            rating,
+            norm_text(desc),
+            norm_text(poster_url),
+            keywords and norm_text_list(json_loads(keywords)),
+        )
+        if not title:
+            log.warning("EPGProgram.title is missing: %s", this)
+        return this
+
+    def write_xml(self, targets: Sequence[Tuple[TextIO, dict]], cache: FragmentCache = None) -> None:
+        """Like EPGProgram.write_xml() without a cache, which is keyed on EPGProgram."""
+        if cache is not None:
+            raise ValueError("ProgramRow cannot be written through a fragment cache, which is keyed on EPGProgram")
+        rendered = {}
+        for writer, cfg in targets:
+            flags = tuple(cfg[k] for k in OUTPUT_KEYS)
+            if (xml := rendered.get(flags)) is None:
+                rendered[flags] = xml = render_programme(programme_data(self, cfg))
+            writer.write(xml)
+            writer.write("\n")
+
+
+def programme_data(prog: Union[EPGProgram, ProgramRow], cfg: dict) -> ProgrammeData:
+    """The fields written for a sanitized and validated program under the given provider config."""
+    if prog.etime is None:
+        raise ValueError("EPGProgram.etime is required for XML serialization")
+
+    # local variables
+    stime = xmltv_time(prog.stime)
+    etime = xmltv_time(prog.etime)
+    title = prog.title
+    title_sub = prog.title_sub
+    cast = prog.cast or []
+    crew = prog.crew or []
+    categories = prog.categories or []
+    keywords = prog.keywords or []
+    episode = prog.ep_num
+    rebroadcast = "재" if prog.rebroadcast else ""
+    rating = rating_label(prog.rating)
+
+    # title, sub-title
+    if title and (matches := PTN_TITLE.match(title)):
+        title = matches.group(1).strip()
+        title_sub = " ".join(filter(bool, [matches.group(2), title_sub]))
+        title_sub = title_sub or None
+    title = [
+        title or title_sub or "제목 없음",
+        f"({episode}회)" if episode and cfg["ADD_EPNUM_TO_TITLE"] else "",
+        f"({rebroadcast})" if rebroadcast and cfg["ADD_REBROADCAST_TO_TITLE"] else "",
+    ]
+    title = PTN_SPACES.sub(" ", " ".join(filter(bool, title)))
+
+    # desc
+    desc = None
+    if cfg["ADD_DESCRIPTION"]:
+        desc = [
+            title,
+            f"부제 : {title_sub}" if title_sub else "",
+            f"방송 : {rebroadcast}방송" if rebroadcast else "",
+            f"회차 : {episode}회" if episode else "",
+            f"장르 : {','.join(categories)}" if categories else "",
+            f"출연 : {','.join(x.name for x in cast)}" if cast else "",
+            f"제작 : {','.join(x.name for x in crew)}" if crew else "",
+            f"등급 : {rating}",
+            prog.desc,
         ]
-        title = PTN_SPACES.sub(" ", " ".join(filter(bool, title)))
-        _p.append(Element("title", title, lang="ko"))
-        if title_sub:
-            _p.append(Element("sub-title", title_sub, lang="ko"))
-
-        # desc
-        if cfg["ADD_DESCRIPTION"]:
-            desc = [
-                title,
-                f"부제 : {title_sub}" if title_sub else "",
-                f"방송 : {rebroadcast}방송" if rebroadcast else "",
-                f"회차 : {episode}회" if episode else "",
-                f"장르 : {','.join(categories)}" if categories else "",
-                f"출연 : {','.join(x.name for x in cast)}" if cast else "",
-                f"제작 : {','.join(x.name for x in crew)}" if crew else "",
-                f"등급 : {rating}",
-                self.desc,
-            ]
-            desc = PTN_SPACES.sub(" ", "\n".join(filter(bool, desc)))
-            _p.append(Element("desc", desc, lang="ko"))
-
-        # credits
-        if cast or crew:
-            _c = Element("credits")
-            for cc in sorted(cast + crew, key=lambda x: TAG_CREDITS.index(x.title)):
-                attrs = {k: v for k, v in asdict(cc).items() if k not in {"title", "name"} and v is not None}
-                _c.append(Element(cc.title, cc.name, **attrs))
-            _p.append(_c)
-
-        # categories
-        for cat_ko in categories:
-            _p.append(Element("category", cat_ko, lang="ko"))
-            if cat_en := CAT_KO2EN.get(cat_ko):
-                _p.append(Element("category", cat_en, lang="en"))
-
-        # keywords
-        for keyword in keywords:
-            _p.append(Element("keyword", keyword, lang="ko"))
-
-        # icon
-        if self.poster_url:
-            _p.append(Element("icon", src=self.poster_url))
-
-        # episode-num
-        if episode:
-            if cfg["ADD_XMLTV_NS"]:
-                try:
-                    episode_ns = int(episode) - 1
-                except ValueError:
-                    episode_ns = int(episode.split(",", 1)[0]) - 1
-                episode_ns = f"0.{str(episode_ns)}.0/0"
-                _p.append(Element("episode-num", episode_ns, system="xmltv_ns"))
-            else:
-                _p.append(Element("episode-num", episode, system="onscreen"))
-
-        # previously-shown
-        if rebroadcast:
-            _p.append(Element("previously-shown"))
-
-        # rating
-        if rating:
-            # 한국 TV 프로그램 시청등급은 영화·비디오물 쪽 제도인 KMRB 표기로 적기 어렵다.
-            # KCSC(방심위)도 검토했지만, 실제 등급 표시는 방송사/플랫폼의 자체 분류에 가깝고
-            # 방심위는 기준 설정·조정 역할이어서 특정 기관명을 system 값으로 단정하기 애매하다.
-            # 그래서 여기서는 가장 중립적인 국가 단위 표기인 KR을 사용한다.
-            _r = Element("rating", system="KR")
-            _r.append(Element("value", rating))
-            _p.append(_r)
-
-        # dumps
-        writer.write(_p.tostring(level=1))
-        writer.write("\n")
+        desc = PTN_SPACES.sub(" ", "\n".join(filter(bool, desc)))
+
+    # credits
+    xml_credits = [(cc.title, cc.name, cc.role) for cc in sorted(cast + crew, key=lambda x: TAG_CREDITS.index(x.title))]
+
+    # categories
+    xml_categories = []
+    for cat_ko in categories:
+        xml_categories.append((cat_ko, "ko"))
+        if cat_en := CAT_KO2EN.get(cat_ko):
+            xml_categories.append((cat_en, "en"))
+
+    # episode-num
+    episode_num = None
+    if episode:
+        if cfg["ADD_XMLTV_NS"]:
+            try:
+                episode_ns = int(episode) - 1
+            except ValueError:
+                episode_ns = int(episode.split(",", 1)[0]) - 1
+            episode_num = (f"0.{str(episode_ns)}.0/0", "xmltv_ns")
+        else:
+            episode_num = (episode, "onscreen")
+
+    return ProgrammeData(
+        start=stime,
+        stop=etime,
+        channel=prog.channelid,
+        title=title,
+        title_sub=title_sub,
+        desc=desc,
+        credits=xml_credits,
+        categories=xml_categories,
+        keywords=keywords,
+        icon=prog.poster_url,
+        episode=episode_num,
+        previously_shown=bool(rebroadcast),
+        rating=rating,
+    )
 
 
 @dataclass
@@ -393,24 +537,44 @@ class EPGChannel:
             except IndexError:
                 prog.etime = (prog.stime + timedelta(days=1)).replace(hour=0, minute=0, second=0)
 
-    def to_xml(self, writer: TextIO = None) -> None:
-        writer = writer or sys.stdout
+    def xml_data(self) -> ChannelData:
         self.sanitize()
         self.validate()
-        chel = Element("channel", id=self.id)
-        # TODO: Find a better strategy for display-name values.
-        chel.append(Element("display-name", self.name))
-        chel.append(Element("display-name", self.src))
+        # TODO: Find a better strategy for display-name values.
+        display_names = [self.name, self.src]
         if self.no:
-            chel.append(Element("display-name", f"{self.no}"))
-            chel.append(Element("display-name", f"{self.no} {self.name}"))
-            chel.append(Element("display-name", f"{self.no} {self.src}"))
-        if self.icon:
-            chel.append(Element("icon", src=self.icon))
-        writer.write(chel.tostring(level=1))
+            display_names += [f"{self.no}", f"{self.no} {self.name}", f"{self.no} {self.src}"]
+        return ChannelData(self.id, display_names, self.icon)
+
+    def to_xml(self, writer: TextIO = None) -> None:
+        writer = writer or sys.stdout
+        writer.write(render_channel(self.xml_data()))
         writer.write("\n")
 
 
+@dataclass
+class OutputProfile:
+    """An extra XMLTV output of an OUTPUTS config entry, written in the same pass as the main one.
+
+    flags override the output config keys of each provider, and channels limits the output to channel ids
+    matching any of the given patterns.
+    """
+
+    writer: TextIO
+    flags: dict = field(default_factory=dict)
+    channels: Optional[List[str]] = None
+
+    def wants(self, channelid: str) -> bool:
+        return self.channels is None or any(fnmatchcase(channelid, x) for x in self.channels)
+
+
+def output_targets(
+    writer: TextIO, cfg: dict, outputs: Sequence[OutputProfile], channelid: str
+) -> List[Tuple[TextIO, dict]]:
+    """The (writer, cfg) pairs a program of channelid goes to: the main output and the profiles taking it."""
+    return [(writer or sys.stdout, cfg)] + [(o.writer, {**cfg, **o.flags}) for o in outputs if o.wants(channelid)]
+
+
 # user-agent - curl -L microlink.io/user-agents.json | jq -r .user[0]
 UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
 
@@ -421,10 +585,17 @@ class EPGProvider:
     referer: str = None
     title_regex: Union[str, re.Pattern] = None
     tps: float = 1.0
+    # Without MAX_TPS, the rate may grow up to tps times this while the server keeps up.
+    max_tps_headroom: float = 2.0
     timeout: float = 10.0
     retry_attempts: int = 3
     retry_backoff: float = 0.5
+    retry_after_max: float = 60.0
     was_channel_updated: bool = False
+    http_cache: HTTPCache = None
+    xml_cache: FragmentCache = None
+    journal: Journal = None
+    parse_pool: Executor = None
 
     def __init__(self, cfg: dict):
         self.provider_name = self.__class__.__name__
@@ -440,26 +611,55 @@ class EPGProvider:
             self.sess.proxies.update({"http": http_proxy, "https": http_proxy})
         if self.title_regex:
             self.title_regex = re.compile(self.title_regex)
-        self.request = RateLimiter(tps=self.tps)(self.__request)
+        max_tps = cfg.get("MAX_TPS") or self.tps * self.max_tps_headroom
+        self.limiter = AdaptiveRateLimiter(tps=self.tps, max_tps=max_tps)
+        self.__limited_request = self.limiter(self.__request)
+        self.refresh_policy = RefreshPolicy.from_config(cfg.get("REFRESH_POLICY"))
         # Runtime state placeholders.
         self.svc_channels: List[dict] = []
         self.req_channels: List[EPGChannel] = []
-
-    def __request(self, url: str, method: str = "GET", **kwargs) -> Any:
+        # (channelid, day) units of fetch_programs(), see EPGHandler.plan_refresh.
+        self.fetched_units: Dict[Tuple[str, date], FetchedUnit] = {}
+        self.refresh_plan: Dict[Tuple[str, date], Tuple[FetchedUnit, List[EPGProgram]]] = {}
+        self.__channel_done: Optional[Callable[[EPGChannel], None]] = None
+
+    def request(self, url: str, method: str = "GET", **kwargs) -> Any:
+        """Send a rate-limited request, answering fresh GETs from the HTTP cache without one."""
+        entry = None
+        if self.http_cache is not None and method.upper() == "GET":
+            entry = self.http_cache.get(method, url, kwargs.get("params"))
+            if entry is not None and entry.fresh:
+                self.http_cache.hit(entry)
+                return decode_body(entry.text, entry.content_type)
+        return self.__limited_request(url, method=method, entry=entry, **kwargs)
+
+    def __request(self, url: str, method: str = "GET", entry: CacheEntry = None, **kwargs) -> Any:
+        """Send a request, revalidating `entry`, the stale cache entry read by request(), if it has validators."""
         kwargs.setdefault("timeout", self.timeout)
         request_desc = f"{method.upper()} {url}"
         if params := kwargs.get("params"):
             request_desc += f" params={params}"
 
+        if entry is not None and entry.validators:
+            kwargs["headers"] = {**kwargs.get("headers", {}), **entry.validators}
+
         for attempt in range(1, self.retry_attempts + 1):
             try:
                 r = self.sess.request(method=method, url=url, **kwargs)
                 r.raise_for_status()
-                try:
-                    return r.json()
-                except (json.decoder.JSONDecodeError, ValueError):
-                    return r.text
+                self.limiter.success()
+                if entry is not None and getattr(r, "status_code", None) == 304:
+                    self.http_cache.hit(entry, r)
+                    return decode_body(entry.text, entry.content_type)
+                if self.http_cache is not None and method.upper() == "GET":
+                    self.http_cache.put(method, url, params, r)
+                return decode_body(r.text, r.headers.get("Content-Type"))
             except requests.exceptions.RequestException as e:
+                retry_after = None
+                if isinstance(e, requests.exceptions.Timeout) or self.__is_throttled(e):
+                    retry_after = self.__retry_after(e)
+                    self.limiter.backoff(retry_after)
+                    self.log.debug("Server pushed back, rate lowered to %.2f tps", self.limiter.rate)
                 if attempt >= self.retry_attempts:
                     self.log.error("Request failed: %s (%s)", request_desc, e)
                     return ""
@@ -470,10 +670,54 @@ class EPGProvider:
                     request_desc,
                     e,
                 )
-                time.sleep(self.retry_backoff * attempt)
+                time.sleep(self.retry_backoff * attempt if retry_after is None else retry_after)
 
         return ""
 
+    @staticmethod
+    def __is_throttled(e: Exception) -> bool:
+        return getattr(getattr(e, "response", None), "status_code", None) in (429, 503)
+
+    def __retry_after(self, e: Exception) -> Optional[float]:
+        """Seconds to wait as told by the Retry-After header, capped at retry_after_max."""
+        try:
+            value = e.response.headers["Retry-After"].strip()
+        except (AttributeError, KeyError, TypeError):
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return max(0.0, min(delay, self.retry_after_max))
+
+    def load_rate(self, rateinfo: dict = None) -> None:
+        """Start from the request rate learned in a previous run if it is fresh enough."""
+        try:
+            updated_at = datetime.fromisoformat(rateinfo["UPDATED"])
+            if (datetime.now() - updated_at).total_seconds() > 3600 * 24 * 4:
+                return
+            self.limiter.set_rate(float(rateinfo["TPS"]))
+            self.log.debug("Request rate %.2f tps loaded from cache", self.limiter.rate)
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    def dump_rate(self) -> dict:
+        self.log.info(
+            "Request rate: %.2f tps (min %.2f, max %.2f, throttled %d times)",
+            self.limiter.rate,
+            self.limiter.min_tps,
+            self.limiter.max_tps,
+            self.limiter.throttled,
+        )
+        return {
+            "UPDATED": datetime.now().isoformat(),
+            "TPS": round(self.limiter.rate, 4),
+            "THROTTLED": self.limiter.throttled,
+        }
+
     def load_svc_channels(self, channeljson: dict = None) -> None:
         # Check whether the cache needs to be refreshed.
         try:
@@ -543,23 +787,199 @@ class EPGProvider:
         )
         self.req_channels = req_channels
 
-    def write_channels(self, writer: TextIO = None) -> None:
+    def write_channels(self, writer: TextIO = None, outputs: Sequence[OutputProfile] = ()) -> None:
         for ch in self.req_channels:
             if not ch.programs:
                 log.warning("Skipping '%s' because no program entries were found", ch.id)
                 continue
-            ch.to_xml(writer=writer)
+            for out, _ in output_targets(writer, self.cfg, outputs, ch.id):
+                ch.to_xml(writer=out)
 
     def get_programs(self) -> None:
         raise NotImplementedError("The 'get_programs' method must be implemented")
 
-    def write_programs(self, writer: TextIO = None) -> None:
+    def fetch_programs(self, units: Iterable[tuple], fetch: Callable[..., List[EPGProgram]]) -> None:
+        """Call fetch(ch, *args) for each (ch, *args) work unit and extend ch.programs in unit order.
+
+        Units of a channel must be adjacent and in time order so that programs stay sorted by stime.
+        Up to CONCURRENCY units are fetched at once while the shared rate limiter keeps to tps. With a journal,
+        each unit that gave programs is recorded, and units recorded by an interrupted run are resumed from there.
+        (ch, day) units still fresh by REFRESH_POLICY are taken from the previous run, see EPGHandler.plan_refresh.
+        A fetch raising ChannelEnded drops the rest of its channel's units, decided in unit order.
+        """
+        units = list(units)
+        concurrency = max(1, int(self.cfg.get("CONCURRENCY") or 1))
+        journal = self.journal
+        if journal is not None:
+            unjournaled = fetch
+
+            def journaled(_ch: EPGChannel, *args) -> List[EPGProgram]:
+                if (records := journal.get(self.provider_name, _ch.id, args)) is not None:
+                    return [EPGProgram(*x) for x in records]
+                _epgs = unjournaled(_ch, *args)
+                # Failed requests come back empty, so only units that gave programs count as completed.
+                if _epgs:
+                    journal.put(self.provider_name, _ch.id, args, _epgs)
+                return _epgs
+
+            fetch = journaled
+
+        reused = set()
+        if self.refresh_plan:
+            unplanned = fetch
+
+            def planned(_ch: EPGChannel, *args) -> List[EPGProgram]:
+                key = _day_unit(_ch, args)
+                if (plan := self.refresh_plan.pop(key, None)) is None:
+                    return unplanned(_ch, *args)
+                reused.add(key)
+                self.fetched_units[key], _epgs = plan
+                return _epgs
+
+            fetch = planned
+
+        ended = set()
+        unended = fetch
+
+        def fetch_unit(_ch: EPGChannel, *args) -> Union[List[EPGProgram], ChannelEnded]:
+            # Units of an ended channel that were not started yet are not requested at all.
+            if _ch.id in ended:
+                return []
+            try:
+                return unended(_ch, *args)
+            except ChannelEnded as e:
+                return e
+
+        fetch = fetch_unit
+
+        def results() -> Iterator[Union[List[EPGProgram], ChannelEnded]]:
+            if concurrency == 1:
+                for unit in units:
+                    yield fetch(*unit)
+                return
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=self.provider_name) as exe:
+                it = iter(units)
+                # Keep a bounded window of units in flight and consume them in submission order.
+                pending = deque(exe.submit(fetch, *unit) for unit in islice(it, concurrency * 2))
+                while pending:
+                    future = pending.popleft()
+                    for unit in islice(it, 1):
+                        pending.append(exe.submit(fetch, *unit))
+                    yield future.result()
+
+        current, num_ch = None, 0
+        for idx, (unit, _epgs) in enumerate(zip(units, results())):
+            _ch = unit[0]
+            if _ch is not current:
+                current, num_ch = _ch, num_ch + 1
+                self.log.info("%03d/%03d %s", num_ch, len(self.req_channels), _ch)
+            if _ch.id in ended:
+                # Fetched while an earlier unit of the channel was in flight.
+                _epgs = []
+            elif isinstance(_epgs, ChannelEnded):
+                self.log.warning("%s", _epgs)
+                ended.add(_ch.id)
+                _epgs = []
+            _ch.programs.extend(_epgs)
+            if _epgs and (key := _day_unit(_ch, unit[1:])) is not None and key not in reused:
+                stimes = [p.stime for p in _epgs]
+                self.fetched_units[key] = FetchedUnit(datetime.now(), min(stimes), max(stimes))
+            if idx + 1 == len(units) or units[idx + 1][0] is not _ch:
+                self.channel_done(_ch)
+
+    def parse(self, func: Callable[..., List[EPGProgram]], *args) -> List[EPGProgram]:
+        """Call the parser func(*args), in a worker process of parse_pool if one is set.
+
+        func must be a module-level function taking picklable arguments. Programs come back from workers as
+        plain field tuples, which pickle much smaller than the objects themselves.
+        """
+        if self.parse_pool is None:
+            return func(*args)
+        return [EPGProgram(*x) for x in self.parse_pool.submit(_parse_records, func, *args).result()]
+
+    def channel_done(self, ch: EPGChannel) -> None:
+        """Hand a channel whose programs are complete over to a running iter_programs()."""
+        if self.__channel_done is not None:
+            self.__channel_done(ch)
+
+    def iter_programs(self, maxsize: int = 8) -> Iterator[EPGChannel]:
+        """Run get_programs() in the background and yield each requested channel once its programs are complete.
+
+        Channels filled through fetch_programs() come out as soon as their last unit is fetched, the others when
+        get_programs() returns. At most maxsize channels wait for the consumer, and the programs of a yielded
+        channel are cleared when the consumer moves on, so only a few schedules are held at once. The work starts
+        right away rather than on the first next(), so that several providers can be iterated side by side.
+        """
+        done = queue.Queue(maxsize=maxsize)
+        stop = threading.Event()
+        emitted = set()
+        fills_etime = getattr(self.get_programs, "no_endtime", False)
+
+        def put(item: Any) -> None:
+            while not stop.is_set():
+                try:
+                    done.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    pass
+            raise _StreamClosed
+
+        def complete(ch: EPGChannel) -> None:
+            if id(ch) in emitted:
+                return
+            emitted.add(id(ch))
+            if fills_etime:
+                ch.set_etime()
+            put(ch)
+
+        def work() -> None:
+            try:
+                self.get_programs()
+                for ch in self.req_channels:
+                    complete(ch)
+                put(None)
+            except _StreamClosed:
+                pass
+            except Exception as e:  # pylint: disable=broad-except
+                with suppress(_StreamClosed):
+                    put(e)
+            finally:
+                self.__channel_done = None
+
+        def channels() -> Iterator[EPGChannel]:
+            try:
+                while (item := done.get()) is not None:
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+                    item.programs.clear()  # for memory efficiency
+            finally:
+                stop.set()
+
+        self.__channel_done = complete
+        threading.Thread(target=work, name=f"{self.provider_name}-programs", daemon=True).start()
+        return channels()
+
+    def write_programs(self, writer: TextIO = None, outputs: Sequence[OutputProfile] = ()) -> None:
         for ch in self.req_channels:
+            targets = output_targets(writer, self.cfg, outputs, ch.id)
             for prog in ch.programs:
-                prog.to_xml(self.cfg, writer=writer)
+                prog.write_xml(targets, cache=self.xml_cache)
             ch.programs.clear()  # for memory efficiency
 
 
+def _day_unit(ch: EPGChannel, args: tuple) -> Optional[Tuple[str, date]]:
+    """The (channelid, day) of a fetch_programs() unit that covers a single day, None for other units."""
+    if len(args) == 1 and isinstance(args[0], date):
+        return ch.id, args[0]
+    return None
+
+
+def _parse_records(func: Callable[..., List[EPGProgram]], *args) -> List[tuple]:
+    names = [f.name for f in fields(EPGProgram)]
+    return [tuple(getattr(p, name) for name in names) for p in func(*args)]
+
+
 def no_endtime(func):
     @wraps(func)
     def wrapped(self: EPGProvider, *args, **kwargs):
@@ -567,6 +987,8 @@ def no_endtime(func):
         for ch in self.req_channels:
             ch.set_etime()
 
+    # Tells iter_programs() to complete endtimes of a channel before handing it over.
+    wrapped.no_endtime = True
     return wrapped
 
 
@@ -592,8 +1014,8 @@ class EPGHandler:
     def load_channels(self, channelfile: str, parallel: bool = False) -> None:
         try:
             log.debug("Trying to load cached channels from JSON")
-            with open(channelfile, "r", encoding="utf-8") as fp:
-                channeljson = json.load(fp)
+            with open(channelfile, "rb") as fp:
+                channeljson = json_loads(fp.read())
         except (json.decoder.JSONDecodeError, ValueError, FileNotFoundError) as e:
             log.debug("Failed to load cached channels from JSON: %s", e)
             channeljson = {}
@@ -625,6 +1047,61 @@ class EPGHandler:
         if len(cids) != len(set(cids)):
             raise DuplicateChannelIdError(f"Duplicate channel IDs: { {k:v for k,v in Counter(cids).items() if v > 1} }")
 
+    def set_http_cache(self, cache: HTTPCache) -> None:
+        for p in self.providers:
+            p.http_cache = cache
+
+    def set_xml_cache(self, cache: FragmentCache) -> None:
+        for p in self.providers:
+            p.xml_cache = cache
+
+    def set_journal(self, journal: Journal) -> None:
+        for p in self.providers:
+            p.journal = journal
+
+    def set_parse_pool(self, pool: Executor) -> None:
+        for p in self.providers:
+            p.parse_pool = pool
+
+    def record(self, archive_dir: PathLike) -> None:
+        """Capture all provider traffic into per-provider archives under archive_dir."""
+        Path(archive_dir).mkdir(exist_ok=True)
+        for p in self.providers:
+            p.sess = RecordingSession(p.sess, archive_path(archive_dir, p.provider_name))
+
+    def replay(self, archive_dir: PathLike) -> None:
+        """Serve all provider traffic from archives under archive_dir without touching the network."""
+        for p in self.providers:
+            p.sess.close()
+            p.sess = ReplaySession(archive_path(archive_dir, p.provider_name))
+            # Nothing to be polite to, so replay as fast as the pipeline goes.
+            p.limiter.max_tps = float("inf")
+            p.limiter.set_rate(1e6)
+
+    def close_sessions(self) -> None:
+        for p in self.providers:
+            p.sess.close()
+
+    def load_rates(self, ratefile: PathLike) -> None:
+        try:
+            with open(ratefile, "rb") as fp:
+                ratejson = json_loads(fp.read())
+        except (json.decoder.JSONDecodeError, ValueError, FileNotFoundError) as e:
+            log.debug("Failed to load request rates from JSON: %s", e)
+            ratejson = {}
+        for p in self.providers:
+            p.load_rate(ratejson.get(p.provider_name.upper()))
+
+    def save_rates(self, ratefile: PathLike) -> None:
+        try:
+            with open(ratefile, "rb") as fp:
+                ratejson = json_loads(fp.read())
+        except (json.decoder.JSONDecodeError, ValueError, FileNotFoundError):
+            ratejson = {}
+        for p in self.providers:
+            ratejson[p.provider_name.upper()] = p.dump_rate()
+        dump_json(ratefile, ratejson)
+
     def get_programs(self, parallel: bool = False):
         if parallel:
             with ThreadPoolExecutor() as exe:
@@ -635,21 +1112,133 @@ class EPGHandler:
             for p in self.providers:
                 p.get_programs()
 
-    def to_xml(self, writer: TextIO = None):
-        writer = writer or sys.stdout
+    @staticmethod
+    def write_head(writer: TextIO) -> None:
         writer.write('<?xml version="1.0" encoding="UTF-8"?>\n')
         writer.write('<!DOCTYPE tv SYSTEM "xmltv.dtd">\n\n')
         writer.write(f'<tv generator-info-name="{__title__} v{__version__}">\n')
 
-        log.debug("Writing channels...")
-        for p in self.providers:
-            p.write_channels(writer=writer)
+    def to_xml(self, writer: TextIO = None, dbfile: PathLike = None, outputs: Sequence[OutputProfile] = ()):
+        """Write loaded channels and programs, or with dbfile, stream the programs stored there.
 
-        log.debug("Writing programs...")
-        for p in self.providers:
-            p.write_programs(writer=writer)
+        Streaming reads the programs of each provider in a single ordered scan and writes them as they come,
+        so memory stays bounded however large dbfile is. Extra outputs are written in the same pass.
+        Without a fragment cache, which is keyed on EPGProgram, the rows are read without the converters and
+        written through ProgramRow.
+        """
+        writer = writer or sys.stdout
+        for out in (writer, *(o.writer for o in outputs)):
+            self.write_head(out)
 
-        writer.write("</tv>\n")
+        if dbfile is None:
+            log.debug("Writing channels...")
+            for p in self.providers:
+                p.write_channels(writer=writer, outputs=outputs)
+
+            log.debug("Writing programs...")
+            for p in self.providers:
+                p.write_programs(writer=writer, outputs=outputs)
+        else:
+            raw = not any(p.xml_cache is not None for p in self.providers)
+            with SQLite(dbfile, "r", **({"detect_types": 0} if raw else {})) as db:
+                num_programs = db.count_programs()
+                log.debug("Writing channels...")
+                for p in self.providers:
+                    p.req_channels = db.select_channels(p.provider_name)
+                    for ch in p.req_channels:
+                        if not num_programs.get(ch.id):
+                            log.warning("Skipping '%s' because no program entries were found", ch.id)
+                            continue
+                        for out, _ in output_targets(writer, p.cfg, outputs, ch.id):
+                            ch.to_xml(writer=out)
+
+                log.debug("Writing programs...")
+                for p in self.providers:
+                    channelid = targets = None
+                    if raw:
+                        programs = map(ProgramRow.from_row, db.iter_program_rows(p.provider_name))
+                    else:
+                        programs = db.iter_programs(p.provider_name)
+                    for prog in programs:
+                        if prog.channelid != channelid:
+                            channelid, targets = prog.channelid, output_targets(writer, p.cfg, outputs, prog.channelid)
+                        prog.write_xml(targets, cache=p.xml_cache)
+
+        for out in (writer, *(o.writer for o in outputs)):
+            out.write("</tv>\n")
+
+    def stream_xml(
+        self,
+        writer: TextIO = None,
+        dbfile: PathLike = None,
+        incremental: bool = False,
+        parallel: bool = False,
+        outputs: Sequence[OutputProfile] = (),
+    ) -> None:
+        """Get programs and write them channel by channel as each one completes, instead of after all providers.
+
+        All requested channels are written up front, including those that turn out to have no programs. With
+        parallel, providers are fetched side by side and written in order. Programs also go to dbfile if given,
+        and to the extra outputs.
+        """
+        writer = writer or sys.stdout
+        writers = (writer, *(o.writer for o in outputs))
+
+        def flush() -> None:
+            for out in writers:
+                getattr(out, "flush", lambda: None)()
+
+        with ExitStack() as stack:
+            db = None
+            if dbfile is not None:
+                db = stack.enter_context(SQLite(dbfile, "a" if incremental else "w"))
+            num_channels = num_written = num_deleted = 0
+
+            for out in writers:
+                self.write_head(out)
+            log.debug("Writing channels...")
+            for p in self.providers:
+                for ch in p.req_channels:
+                    for out, _ in output_targets(writer, p.cfg, outputs, ch.id):
+                        ch.to_xml(writer=out)
+            flush()
+            if db is not None:
+                if incremental:
+                    num_channels = db.upsert_channels(self.all_channels)
+                else:
+                    db.insert_channels(self.all_channels)
+
+            log.debug("Writing programs...")
+            streams = (p.iter_programs() for p in self.providers)
+            if parallel:
+                streams = list(streams)
+            for p, stream in zip(self.providers, streams):
+                for ch in stream:
+                    if not ch.programs:
+                        log.warning("No program entries were found for '%s'", ch.id)
+                        continue
+                    if db is not None:
+                        if incremental:
+                            written, deleted = db.upsert_programs(ch.id, ch.programs)
+                            num_written, num_deleted = num_written + written, num_deleted + deleted
+                        else:
+                            db.insert_programs(ch.programs)
+                    targets = output_targets(writer, p.cfg, outputs, ch.id)
+                    for prog in ch.programs:
+                        prog.write_xml(targets, cache=p.xml_cache)
+                    flush()
+            if db is not None:
+                db.upsert_fetched(self.all_fetched_units)
+
+            for out in writers:
+                out.write("</tv>\n")
+        if db is not None and incremental:
+            log.info(
+                "Updated dbfile: %d channels and %d programs written, %d programs deleted",
+                num_channels,
+                num_written,
+                num_deleted,
+            )
 
     @property
     def all_channels(self) -> Iterator:
@@ -661,17 +1250,67 @@ class EPGHandler:
         """Return an iterator over all programs across providers."""
         return chain.from_iterable(ch.programs for ch in self.all_channels)
 
-    def to_db(self, dbfile: PathLike) -> None:
-        with SQLite(dbfile, "w") as db:
-            db.insert_channels(self.all_channels)
-            db.insert_programs(self.all_programs)
+    @property
+    def all_fetched_units(self) -> Iterator:
+        """Return an iterator over the ((channelid, day), FetchedUnit) items across providers."""
+        return chain.from_iterable(p.fetched_units.items() for p in self.providers)
+
+    def plan_refresh(self, dbfile: PathLike) -> None:
+        """Take the (channel, day) units still fresh by REFRESH_POLICY from the previous run stored in dbfile.
+
+        Must be called before dbfile is written again. fetch_programs() merges them in unit order with the
+        units it fetches, and their fetch times are written back to dbfile so that they age across runs.
+        """
+        providers = [p for p in self.providers if p.refresh_policy is not None]
+        if not providers or not Path(dbfile).exists():
+            return
+        now = datetime.now()
+        with SQLite(dbfile, "r") as db:
+            fetched = db.select_fetched()
+            for p in providers:
+                req_ids = {ch.id for ch in p.req_channels}
+                fills_etime = getattr(p.get_programs, "no_endtime", False)
+                p.refresh_plan.clear()
+                for (channelid, day), unit in fetched.items():
+                    if channelid not in req_ids or not p.refresh_policy.is_fresh(day, unit.fetched, now):
+                        continue
+                    if not (programs := db.select_programs(channelid, (unit.first, unit.last))):
+                        continue
+                    if fills_etime:
+                        # Completed again together with the units around them.
+                        for prog in programs:
+                            prog.etime = None
+                    p.refresh_plan[(channelid, day)] = (unit, programs)
+                p.log.info("Reusing %d (channel, day) units of the previous run by REFRESH_POLICY", len(p.refresh_plan))
+
+    def to_db(self, dbfile: PathLike, incremental: bool = False) -> None:
+        if not incremental:
+            with SQLite(dbfile, "w") as db:
+                db.insert_channels(self.all_channels)
+                db.insert_programs(self.all_programs)
+                db.upsert_fetched(self.all_fetched_units)
+            return
+        with SQLite(dbfile, "a") as db:
+            num_channels = db.upsert_channels(self.all_channels)
+            num_written = num_deleted = 0
+            for ch in self.all_channels:
+                written, deleted = db.upsert_programs(ch.id, ch.programs)
+                num_written, num_deleted = num_written + written, num_deleted + deleted
+            db.upsert_fetched(self.all_fetched_units)
+        log.info(
+            "Updated dbfile: %d channels and %d programs written, %d programs deleted",
+            num_channels,
+            num_written,
+            num_deleted,
+        )
 
     def from_db(self, dbfile: PathLike) -> None:
         with SQLite(dbfile, "r") as db:
             for p in self.providers:
-                for ch in db.select_channels(p.provider_name):
-                    ch.programs = db.select_programs(ch.id)
-                    p.req_channels.append(ch)
+                channels = {ch.id: ch for ch in db.select_channels(p.provider_name)}
+                for prog in db.iter_programs(p.provider_name):
+                    channels[prog.channelid].programs.append(prog)
+                p.req_channels.extend(channels.values())
 
 
 sqlite3.register_adapter(bool, int)
@@ -695,14 +1334,14 @@ class SQLite:
         kwargs.setdefault("detect_types", sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
         self.conn = sqlite3.connect(dbfile, **kwargs)
         self.mode = mode
-        if mode == "w":
+        if mode in ("w", "a"):
             self.__db_init()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is None and self.mode == "w":
+        if exc_type is None and self.mode in ("w", "a"):
             self.conn.commit()
         self.conn.close()
 
@@ -715,10 +1354,28 @@ class SQLite:
                 PRIMARY KEY (Id)
                 );
                 CREATE TABLE IF NOT EXISTS epgprogram ({', '.join(cols)});
+                CREATE TABLE IF NOT EXISTS epgfetch (
+                channelid TEXT, day TEXT, fetched TIMESTAMP, first TIMESTAMP, last TIMESTAMP,
+                PRIMARY KEY (channelid, day)
+                );
                 CREATE INDEX IF NOT EXISTS idx_epgchannel_source ON epgchannel (Source);
-                CREATE INDEX IF NOT EXISTS idx_epgprogram_channelid_stime ON epgprogram (channelid, stime);
-                DELETE FROM epgchannel; DELETE FROM epgprogram;"""
+                CREATE INDEX IF NOT EXISTS idx_epgprogram_channelid_stime ON epgprogram (channelid, stime);"""
             )
+            if self.mode == "w":
+                # Not through executescript(), which commits: the previous content is only replaced along with
+                # the inserts that follow, and survives a run that fails or is interrupted before then.
+                for table in ("epgchannel", "epgprogram", "epgfetch"):
+                    c.execute(f"DELETE FROM {table}")
+                c.execute("DROP INDEX IF EXISTS uq_epgprogram_channelid_stime")
+            else:
+                # Upserts are keyed on (channelid, stime), so drop duplicates left by earlier full exports.
+                c.executescript(
+                    """DELETE FROM epgprogram WHERE rowid NOT IN (
+                        SELECT max(rowid) FROM epgprogram GROUP BY channelid, stime
+                    );
+                    CREATE UNIQUE INDEX IF NOT EXISTS uq_epgprogram_channelid_stime ON epgprogram (channelid, stime);
+                    CREATE TEMP TABLE IF NOT EXISTS refreshed (stime TIMESTAMP PRIMARY KEY);"""
+                )
 
     def insert_channels(self, channels: List[EPGChannel]) -> None:
         cols = [f.name for f in fields(EPGChannel)]
@@ -732,6 +1389,69 @@ class SQLite:
         with closing(self.conn.cursor()) as c:
             c.executemany(sql, (tuple(getattr(p, col) for col in cols) for p in programs))
 
+    def upsert_channels(self, channels: Iterable[EPGChannel]) -> int:
+        """Insert or update channels by id, writing only rows that changed. Returns the number of rows written."""
+        cols = [f.name for f in fields(EPGChannel)]
+        values = ", ".join(EPGChannel.columns[1:])
+        excluded = ", ".join(f"excluded.{x}" for x in EPGChannel.columns[1:])
+        sql = (
+            f"INSERT INTO epgchannel VALUES ({','.join('?'*len(cols))}) "
+            f"ON CONFLICT (Id) DO UPDATE SET ({values}) = ({excluded}) WHERE ({values}) IS NOT ({excluded})"
+        )
+        before = self.conn.total_changes
+        with closing(self.conn.cursor()) as c:
+            c.executemany(sql, (tuple(getattr(h, col) for col in cols) for h in channels))
+        return self.conn.total_changes - before
+
+    def upsert_programs(self, channelid: str, programs: List[EPGProgram]) -> Tuple[int, int]:
+        """Refresh the programs of a channel within the time window they cover.
+
+        Rows are keyed on (channelid, stime) and only written when their content changed. Stored programs
+        inside the window that are not in `programs` anymore are deleted, while those outside are kept.
+        Returns the numbers of rows written and deleted.
+        """
+        if not programs:
+            return 0, 0
+        cols = [f.name for f in fields(EPGProgram)]
+        # Quoted as some of them are SQL keywords, e.g. cast.
+        values = ", ".join(f'"{x}"' for x in cols if x not in ("channelid", "stime"))
+        excluded = ", ".join(f'excluded."{x}"' for x in cols if x not in ("channelid", "stime"))
+        sql = (
+            f"INSERT INTO epgprogram VALUES ({','.join('?'*len(cols))}) "
+            f"ON CONFLICT (channelid, stime) DO UPDATE SET ({values}) = ({excluded}) "
+            f"WHERE ({values}) IS NOT ({excluded})"
+        )
+        with closing(self.conn.cursor()) as c:
+            before = self.conn.total_changes
+            c.executemany(sql, (tuple(getattr(p, col) for col in cols) for p in programs))
+            written = self.conn.total_changes - before
+
+            c.execute("DELETE FROM temp.refreshed")
+            c.executemany("INSERT OR IGNORE INTO temp.refreshed VALUES (?)", ((p.stime,) for p in programs))
+            c.execute(
+                """DELETE FROM epgprogram WHERE channelid = ? AND stime BETWEEN ? AND ?
+                AND stime NOT IN (SELECT stime FROM temp.refreshed)""",
+                (channelid, min(p.stime for p in programs), max(p.stime for p in programs)),
+            )
+            return written, c.rowcount
+
+    def upsert_fetched(self, units: Iterable[Tuple[Tuple[str, date], FetchedUnit]]) -> None:
+        """Record when (channelid, day) units were fetched, forgetting the days that are past."""
+        with closing(self.conn.cursor()) as c:
+            c.executemany(
+                "INSERT OR REPLACE INTO epgfetch VALUES (?, ?, ?, ?, ?)",
+                ((channelid, day.isoformat(), *unit) for (channelid, day), unit in units),
+            )
+            c.execute("DELETE FROM epgfetch WHERE day < ?", (date.today().isoformat(),))
+
+    def select_fetched(self) -> Dict[Tuple[str, date], FetchedUnit]:
+        try:
+            rows = self.__fetchall("SELECT * FROM epgfetch")
+        except sqlite3.OperationalError:
+            # Written by a version that did not record fetched units.
+            return {}
+        return {(channelid, date.fromisoformat(day)): FetchedUnit(*x) for channelid, day, *x in rows}
+
     def __fetchall(self, *args, **kwargs) -> List[tuple]:
         with closing(self.conn.cursor()) as c:
             return c.execute(*args, **kwargs).fetchall()
@@ -740,6 +1460,26 @@ class SQLite:
         sql = "SELECT * FROM epgchannel WHERE Source = ? ORDER BY No, Name, Id"
         return [EPGChannel(*x) for x in self.__fetchall(sql, (source,))]
 
-    def select_programs(self, channelid: str) -> List[EPGProgram]:
-        sql = "SELECT * FROM epgprogram WHERE channelid = ? ORDER BY stime, etime, title"
-        return [EPGProgram(*x) for x in self.__fetchall(sql, (channelid,))]
+    def select_programs(self, channelid: str, between: Tuple[datetime, datetime] = None) -> List[EPGProgram]:
+        """Programs of a channel, only those starting within `between` (inclusive) if given."""
+        if between is None:
+            sql = "SELECT * FROM epgprogram WHERE channelid = ? ORDER BY stime, etime, title"
+            return [EPGProgram(*x) for x in self.__fetchall(sql, (channelid,))]
+        sql = "SELECT * FROM epgprogram WHERE channelid = ? AND stime BETWEEN ? AND ? ORDER BY stime, etime, title"
+        return [EPGProgram(*x) for x in self.__fetchall(sql, (channelid, *between))]
+
+    def iter_program_rows(self, source: str) -> Iterator[tuple]:
+        """Yield the epgprogram rows of all channels of a source in one cursor scan, in the order of
+        select_channels and then of select_programs."""
+        sql = """SELECT p.* FROM epgprogram AS p JOIN epgchannel AS c ON p.channelid = c.Id
+        WHERE c.Source = ? ORDER BY c.No, c.Name, c.Id, p.stime, p.etime, p.title"""
+        with closing(self.conn.cursor()) as c:
+            yield from c.execute(sql, (source,))
+
+    def iter_programs(self, source: str) -> Iterator[EPGProgram]:
+        for x in self.iter_program_rows(source):
+            yield EPGProgram(*x)
+
+    def count_programs(self) -> Dict[str, int]:
+        sql = "SELECT channelid, count(*) FROM epgprogram GROUP BY channelid"
+        return dict(self.__fetchall(sql))
@@ -1,8 +1,10 @@
+import re
 from datetime import datetime, timedelta
 from typing import List
 
-from epg2xml.providers import EPGProgram, EPGProvider, no_endtime
+from epg2xml.providers import EPGChannel, EPGProgram, EPGProvider, no_endtime
 from epg2xml.utils import ParserBeautifulSoup as BeautifulSoup
+from epg2xml.utils import strptime
 
 CH_CATE = ["지상파", "종합편성", "케이블", "스카이라이프", "해외위성", "라디오"]
 
@@ -47,62 +49,76 @@ class DAUM(EPGProvider):
 
     @no_endtime
     def get_programs(self) -> None:
-        for idx, _ch in enumerate(self.req_channels):
-            self.log.info("%03d/%03d %s", idx + 1, len(self.req_channels), _ch)
-            url = self.search_url.format(_ch.svcid)
-            data = self.request(url)
-            try:
-                _epgs = self.__epgs_of_days(_ch.id, data)
-            except ValueError as e:
-                self.log.warning("%s: %s", e, _ch)
-            except (AttributeError, IndexError, KeyError, TypeError):
-                self.log.exception("프로그램 파싱 중 예외: %s", _ch)
-            else:
-                _ch.programs.extend(_epgs)
+        self.fetch_programs(((_ch,) for _ch in self.req_channels), self.__fetch_channel)
+
+    def __fetch_channel(self, _ch: EPGChannel) -> List[EPGProgram]:
+        url = self.search_url.format(_ch.svcid)
+        data = self.request(url)
+        try:
+            return self.__epgs_of_days(_ch.id, data)
+        except ValueError as e:
+            self.log.warning("%s: %s", e, _ch)
+        except (AttributeError, IndexError, KeyError, TypeError):
+            self.log.exception("프로그램 파싱 중 예외: %s", _ch)
+        return []
 
     def __epgs_of_days(self, channelid: str, data: str) -> List[EPGProgram]:
-        soup = BeautifulSoup(data)
-        if not soup.find_all(attrs={"disp-attr": "B3T"}):
-            raise ValueError("EPG 정보가 없거나 없는 채널입니다")
-        days = soup.select('div[class="tbl_head head_type2"] > span > span[class="date"]')
-        if not days:
-            raise ValueError("방송 일자 정보를 찾지 못했습니다")
+        return self.parse(epgs_of_days, channelid, data, self.title_regex)
+
+
+def epgs_of_days(channelid: str, data: str, title_regex: re.Pattern) -> List[EPGProgram]:
+    # --parse-workers로 다른 프로세스에서 실행될 수 있도록 모듈 수준에 둔다.
+    soup = BeautifulSoup(data)
+    if not soup.find_all(attrs={"disp-attr": "B3T"}):
+        raise ValueError("EPG 정보가 없거나 없는 채널입니다")
+    days = soup.select('div[class="tbl_head head_type2"] > span > span[class="date"]')
+    if not days:
+        raise ValueError("방송 일자 정보를 찾지 못했습니다")
+
+    # 연도 추정
+    currdate = datetime.now()  # 언제나 basedate보다 미래
+    basedate = strptime(days[0].text.strip(), "%m.%d").replace(year=currdate.year)
+    if (basedate - currdate).days > 0:
+        basedate = basedate.replace(year=basedate.year - 1)
 
-        # 연도 추정
-        currdate = datetime.now()  # 언제나 basedate보다 미래
-        basedate = datetime.strptime(days[0].text.strip(), "%m.%d").replace(year=currdate.year)
-        if (basedate - currdate).days > 0:
-            basedate = basedate.replace(year=basedate.year - 1)
+    # 표를 한 번만 훑으면서 각 행(시간)의 칸을 날짜 열로 나눠 담는다.
+    columns = [[] for _ in days]
+    for wrap in soup.find_all(id="tvProgramListWrap"):
+        for table in wrap.find_all("table", recursive=False):
+            for tbody in table.find_all("tbody", recursive=False):
+                for tr in tbody.find_all("tr", recursive=False):
+                    for column, td in zip(columns, tr.find_all("td", recursive=False)):
+                        column.append(td)
 
-        _epgs = []
-        for nd, _ in enumerate(days):
-            hours = soup.select(f'[id="tvProgramListWrap"] > table > tbody > tr > td:nth-of-type({nd+1})')
-            if len(hours) != 24:
-                raise ValueError(f"24개의 시간 행이 있어야 합니다: 현재: {len(hours):d}")
-            for nh, hour in enumerate(hours):
-                for dl in hour.select("dl"):
-                    _epg = EPGProgram(channelid)
-                    nm = int(dl.select("dt")[0].text.strip())
-                    _epg.stime = basedate + timedelta(days=nd, hours=nh, minutes=nm)
-                    for atag in dl.select("dd > a"):
-                        _epg.title = atag.text.strip()
-                    for span in dl.select("dd > span"):
-                        class_val = " ".join(span["class"])
-                        if class_val == "":
-                            _epg.title = span.text.strip()
-                        elif "ico_re" in class_val:
-                            _epg.rebroadcast = True
-                        elif "ico_rate" in class_val:
-                            _epg.rating = int(class_val.split("ico_rate")[1].strip())
-                        else:
-                            # ico_live ico_hd ico_subtitle ico_hand ico_uhd ico_talk ico_st
-                            _epg.add_extra(span.text)
-                    if m := self.title_regex.search(_epg.title):
-                        _epg.title = m.group("title")
-                        _epg.part_num = m.group("part")
-                        _epg.ep_num = m.group("epnum")
-                        _epg.title_sub = m.group("subname2") or m.group("subname1")
-                        if _epg.part_num:
-                            _epg.title += f" {_epg.part_num}부"
-                    _epgs.append(_epg)
-        return _epgs
+    _epgs = []
+    for nd, hours in enumerate(columns):
+        if len(hours) != 24:
+            raise ValueError(f"24개의 시간 행이 있어야 합니다: 현재: {len(hours):d}")
+        for nh, hour in enumerate(hours):
+            for dl in hour.find_all("dl"):
+                _epg = EPGProgram(channelid)
+                nm = int(dl.find("dt").text.strip())
+                _epg.stime = basedate + timedelta(days=nd, hours=nh, minutes=nm)
+                dds = dl.find_all("dd")
+                for atag in (x for dd in dds for x in dd.find_all("a", recursive=False)):
+                    _epg.title = atag.text.strip()
+                for span in (x for dd in dds for x in dd.find_all("span", recursive=False)):
+                    class_val = " ".join(span["class"])
+                    if class_val == "":
+                        _epg.title = span.text.strip()
+                    elif "ico_re" in class_val:
+                        _epg.rebroadcast = True
+                    elif "ico_rate" in class_val:
+                        _epg.rating = int(class_val.split("ico_rate")[1].strip())
+                    else:
+                        # ico_live ico_hd ico_subtitle ico_hand ico_uhd ico_talk ico_st
+                        _epg.add_extra(span.text)
+                if m := title_regex.search(_epg.title):
+                    _epg.title = m.group("title")
+                    _epg.part_num = m.group("part")
+                    _epg.ep_num = m.group("epnum")
+                    _epg.title_sub = m.group("subname2") or m.group("subname1")
+                    if _epg.part_num:
+                        _epg.title += f" {_epg.part_num}부"
+                _epgs.append(_epg)
+    return _epgs
@@ -1,10 +1,10 @@
 import json
 import re
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from typing import List
 
 from epg2xml.providers import EPGProgram, EPGProvider
-from epg2xml.utils import norm_text, time_to_td
+from epg2xml.utils import norm_text, strptime, time_to_td
 
 
 class KBS(EPGProvider):
@@ -139,7 +139,7 @@ class KBS(EPGProvider):
 
     def __epg_of_program(self, channelid: str, sch: dict) -> EPGProgram:
         _epg = EPGProgram(channelid)
-        program_date = datetime.strptime(sch["program_planned_date"], "%Y%m%d")
+        program_date = strptime(sch["program_planned_date"], "%Y%m%d")
         _epg.stime = program_date + time_to_td(sch["program_planned_start_time"])
         _epg.etime = program_date + time_to_td(sch["program_planned_end_time"])
         if _epg.etime < _epg.stime:
@@ -1,12 +1,14 @@
 import re
-from datetime import date, datetime, timedelta
-from typing import List
+from datetime import date, timedelta
+from html.parser import HTMLParser
+from typing import List, Tuple
 from urllib.parse import unquote
 
 from bs4 import SoupStrainer
 
-from epg2xml.providers import EPGProgram, EPGProvider, no_endtime
+from epg2xml.providers import EPGChannel, EPGProgram, EPGProvider, no_endtime
 from epg2xml.utils import ParserBeautifulSoup as BeautifulSoup
+from epg2xml.utils import strptime
 
 CH_CATE = [
     # 0은 전체 채널
@@ -68,46 +70,160 @@ class KT(EPGProvider):
 
     @no_endtime
     def get_programs(self) -> None:
+        days = [date.today() + timedelta(days=nd) for nd in range(int(self.cfg["FETCH_LIMIT"]))]
+        self.fetch_programs(((_ch, day) for _ch in self.req_channels for day in days), self.__fetch_day)
+
+    def __fetch_day(self, _ch: EPGChannel, day: date) -> List[EPGProgram]:
         url = "https://tv.kt.com/tv/channel/pSchedule.asp"
         params = {
             "ch_type": "1",  # 1: live 2: skylife 3: uhd live 4: uhd skylife
             "view_type": "1",  # 1: daily 2: weekly
-            "service_ch_no": "SVCID",
-            "seldate": "EPGDATE",
+            "service_ch_no": _ch.svcid,
+            "seldate": day.strftime("%Y%m%d"),
         }
-        for idx, _ch in enumerate(self.req_channels):
-            self.log.info("%03d/%03d %s", idx + 1, len(self.req_channels), _ch)
-            for nd in range(int(self.cfg["FETCH_LIMIT"])):
-                day = date.today() + timedelta(days=nd)
-                params.update({"service_ch_no": _ch.svcid, "seldate": day.strftime("%Y%m%d")})
-                data = self.request(url, method="POST", data=params)
-                try:
-                    _epgs = self.__epgs_of_day(_ch.id, data, day)
-                except (AttributeError, IndexError, KeyError, TypeError, ValueError):
-                    self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
-                else:
-                    _ch.programs.extend(_epgs)
+        data = self.request(url, method="POST", data=params)
+        try:
+            return self.__epgs_of_day(_ch.id, data, day)
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+            self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
+            return []
 
     def __epgs_of_day(self, channelid: str, data: str, day: date) -> List[EPGProgram]:
-        _epgs = []
-        soup = BeautifulSoup(unquote(data), parse_only=SoupStrainer("tbody"))
-        for row in soup.find_all("tr"):
-            cell = row.find_all("td")
-            hour = cell[0].text.strip()
-            for minute, program, category in zip(*[c.find_all("p") for c in cell[1:]]):
-                _epg = EPGProgram(channelid)
-                _epg.stime = datetime.strptime(f"{day} {hour}:{minute.text.strip()}", "%Y-%m-%d %H:%M")
-                _epg.title = program.text.replace("방송중 ", "").strip()
-                if m := self.title_regex.match(_epg.title):
-                    _epg.title = m.group("title")
-                    if part_num := m.group("part"):
-                        _epg.part_num = part_num
-                        _epg.title += f" ({_epg.part_num}부)"
-                _epg.add_category(category.text)
-                for image in program.find_all("img", alt=True):
-                    if "시청 가능" not in (alt := image["alt"]):
-                        continue
-                    grade = PTN_RATING.match(alt)
-                    _epg.rating = int(grade.group(1)) if grade else 0
-                _epgs.append(_epg)
-        return _epgs
+        return self.parse(epgs_of_day, channelid, data, day, self.title_regex)
+
+
+def epgs_of_day(channelid: str, data: str, day: date, title_regex: re.Pattern) -> List[EPGProgram]:
+    # --parse-workers로 다른 프로세스에서 실행될 수 있도록 모듈 수준에 둔다.
+    markup = unquote(data)
+    try:
+        rows = ScheduleTableParser.rows_of(markup)
+    except UnexpectedMarkup:
+        # 표 구조가 예상과 다르면 느리지만 관대한 bs4로 다시 읽는다.
+        rows = schedule_rows_bs4(markup)
+
+    _epgs = []
+    for hour, programs in rows:
+        for minute, title, category, alts in programs:
+            _epg = EPGProgram(channelid)
+            _epg.stime = strptime(f"{day} {hour}:{minute.strip()}", "%Y-%m-%d %H:%M")
+            _epg.title = title.replace("방송중 ", "").strip()
+            if m := title_regex.match(_epg.title):
+                _epg.title = m.group("title")
+                if part_num := m.group("part"):
+                    _epg.part_num = part_num
+                    _epg.title += f" ({_epg.part_num}부)"
+            _epg.add_category(category)
+            for alt in alts:
+                if "시청 가능" not in alt:
+                    continue
+                grade = PTN_RATING.match(alt)
+                _epg.rating = int(grade.group(1)) if grade else 0
+            _epgs.append(_epg)
+    return _epgs
+
+
+# (시, [(분, 제목, 장르, 제목 칸의 img alt 목록), ...])
+ScheduleRow = Tuple[str, List[Tuple[str, str, str, List[str]]]]
+
+
+class UnexpectedMarkup(ValueError):
+    """Raised by ScheduleTableParser on markup it does not read the same way as bs4."""
+
+
+class ScheduleTableParser(HTMLParser):
+    """Single pass over the <tbody> rows of a KT schedule page without building a tree.
+
+    Each row is a <td> of the hour followed by three <td>s of <p>s for minutes, titles and categories.
+    Anything else inside <tbody> (nested rows, cells or paragraphs, unclosed tags, other column counts)
+    raises UnexpectedMarkup so that the caller can fall back to bs4.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[List[Tuple[List[str], List[Tuple[str, List[str]]]]]] = []
+        self.in_tbody = False
+        self.row = None  # cells of the open <tr>
+        self.cell = None  # (text parts, paragraphs) of the open <td>
+        self.para = None  # (text parts, img alts) of the open <p>
+
+    @classmethod
+    def rows_of(cls, markup: str) -> List[ScheduleRow]:
+        parser = cls()
+        parser.feed(markup)
+        parser.close()
+        if parser.in_tbody or parser.row is not None:
+            raise UnexpectedMarkup("unclosed <tbody> or <tr>")
+        rows = []
+        for cells in parser.rows:
+            if len(cells) not in (1, 4):
+                raise UnexpectedMarkup(f"{len(cells)} cells in a row")
+            hour = "".join(cells[0][0]).strip()
+            columns = [[("".join(texts), alts) for texts, alts in paras] for _, paras in cells[1:]]
+            rows.append((hour, [(m, t, c, alts) for (m, _), (t, alts), (c, _) in zip(*columns)]))
+        return rows
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tbody":
+            if self.in_tbody:
+                raise UnexpectedMarkup("nested <tbody>")
+            self.in_tbody = True
+        elif not self.in_tbody:
+            return
+        elif tag == "tr":
+            if self.row is not None:
+                raise UnexpectedMarkup("nested <tr>")
+            self.row = []
+        elif tag == "td":
+            if self.row is None or self.cell is not None:
+                raise UnexpectedMarkup("<td> outside of <tr> or nested")
+            self.cell = ([], [])
+        elif tag == "p":
+            if self.cell is None or self.para is not None:
+                raise UnexpectedMarkup("<p> outside of <td> or nested")
+            self.para = ([], [])
+        elif tag == "img" and self.para is not None:
+            for name, value in attrs:
+                if name == "alt":
+                    self.para[1].append(value or "")
+                    break
+
+    def handle_endtag(self, tag):
+        if not self.in_tbody:
+            return
+        if tag == "p" and self.para is not None:
+            self.cell[1].append(self.para)
+            self.para = None
+        elif tag in ("td", "tr", "tbody") and self.para is not None:
+            raise UnexpectedMarkup("unclosed <p>")
+        elif tag == "td" and self.cell is not None:
+            self.row.append(self.cell)
+            self.cell = None
+        elif tag in ("tr", "tbody") and self.cell is not None:
+            raise UnexpectedMarkup("unclosed <td>")
+        elif tag == "tr" and self.row is not None:
+            self.rows.append(self.row)
+            self.row = None
+        elif tag == "tbody":
+            if self.row is not None:
+                raise UnexpectedMarkup("unclosed <tr>")
+            self.in_tbody = False
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell[0].append(data)
+        if self.para is not None:
+            self.para[0].append(data)
+
+
+def schedule_rows_bs4(markup: str) -> List[ScheduleRow]:
+    rows = []
+    soup = BeautifulSoup(markup, parse_only=SoupStrainer("tbody"))
+    for row in soup.find_all("tr"):
+        cell = row.find_all("td")
+        hour = cell[0].text.strip()
+        programs = []
+        for minute, program, category in zip(*[c.find_all("p") for c in cell[1:]]):
+            alts = [image["alt"] for image in program.find_all("img", alt=True)]
+            programs.append((minute.text, program.text, category.text, alts))
+        rows.append((hour, programs))
+    return rows
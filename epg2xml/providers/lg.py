@@ -1,7 +1,8 @@
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from typing import List
 
-from epg2xml.providers import EPGProgram, EPGProvider, no_endtime
+from epg2xml.providers import ChannelEnded, EPGChannel, EPGProgram, EPGProvider, no_endtime
+from epg2xml.utils import strptime
 
 G_CODE = {"0": 0, "1": 7, "2": 12, "3": 15, "4": 19}
 P_CATE = {
@@ -72,24 +73,22 @@ class LG(EPGProvider):
                 self.provider_name,
                 max_ndays,
             )
+        days = [date.today() + timedelta(days=nd) for nd in range(min(int(self.cfg["FETCH_LIMIT"]), max_ndays))]
+        self.fetch_programs(((_ch, day) for _ch in self.req_channels for day in days), self.__fetch_day)
+
+    def __fetch_day(self, _ch: EPGChannel, day: date) -> List[EPGProgram]:
         url = "https://www.lguplus.com/uhdc/fo/prdv/chnlgid/v1/tv-schedule-list"
-        params = {"urcBrdCntrTvChnlId": "SVCID", "brdCntrTvChnlBrdDt": "EPGDATE"}
-        for idx, _ch in enumerate(self.req_channels):
-            self.log.info("%03d/%03d %s", idx + 1, len(self.req_channels), _ch)
-            for nd in range(min(int(self.cfg["FETCH_LIMIT"]), max_ndays)):
-                day = date.today() + timedelta(days=nd)
-                params.update({"urcBrdCntrTvChnlId": _ch.svcid, "brdCntrTvChnlBrdDt": day.strftime("%Y%m%d")})
-                data = self.request(url, params=params) or {}
-                data = data.get("brdCntTvSchIDtoList", [])
-                if not data:
-                    self.log.warning("EPG 정보가 없거나 없는 채널입니다: %s %s", _ch, day)
-                    break  # 오늘 없으면 내일도 없는 채널로 간주
-                try:
-                    _epgs = self.__epgs_of_day(_ch.id, data)
-                except (KeyError, TypeError, ValueError):
-                    self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
-                else:
-                    _ch.programs.extend(_epgs)
+        params = {"urcBrdCntrTvChnlId": _ch.svcid, "brdCntrTvChnlBrdDt": day.strftime("%Y%m%d")}
+        data = self.request(url, params=params) or {}
+        data = data.get("brdCntTvSchIDtoList", [])
+        if not data:
+            # 오늘 없으면 내일도 없는 채널로 간주
+            raise ChannelEnded(f"EPG 정보가 없거나 없는 채널입니다: {_ch} {day}")
+        try:
+            return self.__epgs_of_day(_ch.id, data)
+        except (KeyError, TypeError, ValueError):
+            self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
+            return []
 
     def __epgs_of_day(self, channelid: str, data: list) -> List[EPGProgram]:
         _epgs = []
@@ -97,7 +96,7 @@ class LG(EPGProvider):
             _epg = EPGProgram(channelid)
             _epg.title = p["brdPgmTitNm"]
             _epg.desc = p.get("brdPgmDscr")  # 프로그램 상세 설명이 없는 채널도 있음
-            _epg.stime = datetime.strptime(p["brdCntrTvChnlBrdDt"] + p["epgStrtTme"], "%Y%m%d%H:%M:%S")
+            _epg.stime = strptime(p["brdCntrTvChnlBrdDt"] + p["epgStrtTme"], "%Y%m%d%H:%M:%S")
             _epg.rating = G_CODE.get(p["brdWtchAgeGrdCd"], 0)
             _epg.add_extra(p["brdPgmRsolNm"])  # 화질
             if p["subtBrdYn"] == "Y":
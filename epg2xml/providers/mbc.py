@@ -1,9 +1,9 @@
 import re
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from typing import Callable, List, Optional, Tuple
 
-from epg2xml.providers import EPGProgram, EPGProvider
-from epg2xml.utils import norm_text, time_to_td
+from epg2xml.providers import EPGChannel, EPGProgram, EPGProvider
+from epg2xml.utils import norm_text, strptime, time_to_td
 
 
 class MBC(EPGProvider):
@@ -64,7 +64,7 @@ class MBC(EPGProvider):
         params = {"sDate": day.strftime("%Y%m%d"), "sType": stype}
         return endpoint, params, self.__get_parser(parser_key)
 
-    def __epg_of_day(self, ch, day: date) -> List[EPGProgram]:
+    def __epg_of_day(self, ch: EPGChannel, day: date) -> List[EPGProgram]:
         endpoint, params, parser = self.__request_spec(ch.svcid, day)
         data = self.request(endpoint, params=params)
         if not isinstance(data, list):
@@ -93,28 +93,27 @@ class MBC(EPGProvider):
         return _epgs
 
     def get_programs(self) -> None:
-        for idx, _ch in enumerate(self.req_channels):
-            self.log.info("%03d/%03d %s", idx + 1, len(self.req_channels), _ch)
-            for nd in range(int(self.cfg["FETCH_LIMIT"])):
-                day = date.today() + timedelta(days=nd)
-                try:
-                    _epgs = self.__epg_of_day(_ch, day)
-                except (KeyError, TypeError, ValueError):
-                    self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
-                else:
-                    _ch.programs.extend(_epgs)
+        days = [date.today() + timedelta(days=nd) for nd in range(int(self.cfg["FETCH_LIMIT"]))]
+        self.fetch_programs(((_ch, day) for _ch in self.req_channels for day in days), self.__fetch_day)
+
+    def __fetch_day(self, _ch: EPGChannel, day: date) -> List[EPGProgram]:
+        try:
+            return self.__epg_of_day(_ch, day)
+        except (KeyError, TypeError, ValueError):
+            self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
+            return []
 
     def __epg_of_tv(self, channelid: str, item: dict, _sdate: str) -> EPGProgram:
         _epg = self.__base_epg(channelid, item, "Title")
         _epg.rating = self.__parse_rating(norm_text(item.get("AgeRange")))
-        day = datetime.strptime(item["ScheduleDay"], "%Y%m%d")
+        day = strptime(item["ScheduleDay"], "%Y%m%d")
         _epg.stime = day + time_to_td(item["StartTime"])
         _epg.etime = day + time_to_td(item["EndTime"])
         return _epg
 
     def __epg_of_radio(self, channelid: str, item: dict, _sdate: str) -> EPGProgram:
         _epg = self.__base_epg(channelid, item, "Title")
-        day = datetime.strptime(item["BroadDate"], "%Y-%m-%d")
+        day = strptime(item["BroadDate"], "%Y-%m-%d")
         _epg.stime = day + time_to_td(item["StartTime"])
         _epg.etime = day + time_to_td(item["EndTime"])
         return _epg
@@ -122,7 +121,7 @@ class MBC(EPGProvider):
     def __epg_of_mbcplus(self, channelid: str, item: dict, sdate: str) -> EPGProgram:
         _epg = self.__base_epg(channelid, item, "ProgramTitle")
         _epg.rating = self.__parse_rating(norm_text(item.get("TargetAge")))
-        day = datetime.strptime(sdate, "%Y%m%d")
+        day = strptime(sdate, "%Y%m%d")
         _epg.stime = day + time_to_td(item["StartTime"])
         _epg.etime = day + time_to_td(item["EndTime"])
         return _epg
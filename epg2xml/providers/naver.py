@@ -1,9 +1,10 @@
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from typing import List
 from xml.sax.saxutils import unescape
 
-from epg2xml.providers import EPGProgram, EPGProvider, no_endtime
+from epg2xml.providers import EPGChannel, EPGProgram, EPGProvider, no_endtime
 from epg2xml.utils import ParserBeautifulSoup as BeautifulSoup
+from epg2xml.utils import html_parser_backend, parse_lxml_html, strptime
 
 today = date.today()
 
@@ -61,44 +62,84 @@ class NAVER(EPGProvider):
 
     @no_endtime
     def get_programs(self) -> None:
-        params = {"key": "SingleChannelDailySchedule", "where": "m", "pkid": "66", "u1": "SVCID", "u2": "EPGDATE"}
+        days = [today + timedelta(days=nd) for nd in range(int(self.cfg["FETCH_LIMIT"]))]
+        self.fetch_programs(((_ch, day) for _ch in self.req_channels for day in days), self.__fetch_day)
 
-        for idx, _ch in enumerate(self.req_channels):
-            self.log.info("%03d/%03d %s", idx + 1, len(self.req_channels), _ch)
-            for nd in range(int(self.cfg["FETCH_LIMIT"])):
-                day = today + timedelta(days=nd)
-                params.update({"u1": _ch.svcid, "u2": day.strftime("%Y%m%d")})
-                data = self.request(self.search_url, params=params)
-                if data["statusCode"].lower() != "success":
-                    self.log.error("유효한 응답이 아닙니다: %s %s", _ch, data["statusCode"])
-                    continue
-                try:
-                    _epgs = self.__epgs_of_day(_ch.id, data, day)
-                except (AttributeError, IndexError, KeyError, TypeError, ValueError):
-                    self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
-                else:
-                    _ch.programs.extend(_epgs)
+    def __fetch_day(self, _ch: EPGChannel, day: date) -> List[EPGProgram]:
+        params = {
+            "key": "SingleChannelDailySchedule",
+            "where": "m",
+            "pkid": "66",
+            "u1": _ch.svcid,
+            "u2": day.strftime("%Y%m%d"),
+        }
+        data = self.request(self.search_url, params=params)
+        if data["statusCode"].lower() != "success":
+            self.log.error("유효한 응답이 아닙니다: %s %s", _ch, data["statusCode"])
+            return []
+        try:
+            return self.__epgs_of_day(_ch.id, data, day)
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+            self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
+            return []
 
     def __epgs_of_day(self, channelid: str, data: dict, day: date) -> List[EPGProgram]:
-        _epgs = []
-        soup = BeautifulSoup("".join(data["dataHtml"]))
-        for row in soup.find_all("li", {"class": "list"}):
-            cell = row.find_all("div")
-            _epg = EPGProgram(channelid)
-            _epg.title = unescape(cell[4].text.strip())
-            _epg.stime = datetime.strptime(f"{str(day)} {cell[1].text.strip()}", "%Y-%m-%d %H:%M")
-            for span in cell[3].find_all("span"):
-                span_classes = span.get("class", [])
-                span_txt = span.text.strip()
-                if "ico_age" in span_classes:
-                    _epg.rating = int(span_txt.rstrip("세"))
-                elif "re" in span_classes:
-                    _epg.rebroadcast = True
-                else:
-                    _epg.add_extra(span_txt)
-            try:
-                _epg.title_sub = cell[5].text
-            except IndexError:
-                pass
-            _epgs.append(_epg)
+        return self.parse(epgs_of_day, channelid, data, day)
+
+
+def epgs_of_day(channelid: str, data: dict, day: date) -> List[EPGProgram]:
+    # --parse-workers로 다른 프로세스에서 실행될 수 있도록 모듈 수준에 둔다.
+    if html_parser_backend.name == "lxml.html":
+        return epgs_of_day_lxml(channelid, data, day)
+    _epgs = []
+    soup = BeautifulSoup("".join(data["dataHtml"]))
+    for row in soup.find_all("li", {"class": "list"}):
+        cell = row.find_all("div")
+        _epg = EPGProgram(channelid)
+        _epg.title = unescape(cell[4].text.strip())
+        _epg.stime = strptime(f"{str(day)} {cell[1].text.strip()}", "%Y-%m-%d %H:%M")
+        for span in cell[3].find_all("span"):
+            span_classes = span.get("class", [])
+            span_txt = span.text.strip()
+            if "ico_age" in span_classes:
+                _epg.rating = int(span_txt.rstrip("세"))
+            elif "re" in span_classes:
+                _epg.rebroadcast = True
+            else:
+                _epg.add_extra(span_txt)
+        try:
+            _epg.title_sub = cell[5].text
+        except IndexError:
+            pass
+        _epgs.append(_epg)
+    return _epgs
+
+
+def epgs_of_day_lxml(channelid: str, data: dict, day: date) -> List[EPGProgram]:
+    """epgs_of_day() on lxml's own API for --htmlparser lxml.html, which skips building a bs4 tree."""
+    _epgs = []
+    markup = "".join(data["dataHtml"])
+    if not markup.strip():
         return _epgs
+    for row in parse_lxml_html(markup).iter("li"):
+        if "list" not in (row.get("class") or "").split():
+            continue
+        cell = list(row.iter("div"))
+        _epg = EPGProgram(channelid)
+        _epg.title = unescape(cell[4].text_content().strip())
+        _epg.stime = strptime(f"{str(day)} {cell[1].text_content().strip()}", "%Y-%m-%d %H:%M")
+        for span in cell[3].iter("span"):
+            span_classes = (span.get("class") or "").split()
+            span_txt = span.text_content().strip()
+            if "ico_age" in span_classes:
+                _epg.rating = int(span_txt.rstrip("세"))
+            elif "re" in span_classes:
+                _epg.rebroadcast = True
+            else:
+                _epg.add_extra(span_txt)
+        try:
+            _epg.title_sub = cell[5].text_content()
+        except IndexError:
+            pass
+        _epgs.append(_epg)
+    return _epgs
@@ -52,16 +52,15 @@ class SBS(EPGProvider):
 
     @no_endtime
     def get_programs(self) -> None:
-        for idx, ch in enumerate(self.req_channels):
-            self.log.info("%03d/%03d %s", idx + 1, len(self.req_channels), ch)
-            for nd in range(int(self.cfg["FETCH_LIMIT"])):
-                day = date.today() + timedelta(days=nd)
-                try:
-                    epgs = self.__epgs_of_day(ch, day)
-                except (KeyError, TypeError, ValueError):
-                    self.log.exception("프로그램 파싱 중 예외: %s, %s", ch, day)
-                    continue
-                ch.programs.extend(epgs)
+        days = [date.today() + timedelta(days=nd) for nd in range(int(self.cfg["FETCH_LIMIT"]))]
+        self.fetch_programs(((ch, day) for ch in self.req_channels for day in days), self.__fetch_day)
+
+    def __fetch_day(self, ch: EPGChannel, day: date) -> List[EPGProgram]:
+        try:
+            return self.__epgs_of_day(ch, day)
+        except (KeyError, TypeError, ValueError):
+            self.log.exception("프로그램 파싱 중 예외: %s, %s", ch, day)
+            return []
 
     def __epgs_of_day(self, ch: EPGChannel, day: date) -> List[EPGProgram]:
         url = self.schedule_url.format(
@@ -1,8 +1,9 @@
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from typing import List
 from xml.sax.saxutils import unescape
 
-from epg2xml.providers import EPGProgram, EPGProvider
+from epg2xml.providers import EPGChannel, EPGProgram, EPGProvider
+from epg2xml.utils import strptime
 
 GENRE_CODE = {
     "1": "드라마",
@@ -66,27 +67,27 @@ class SK(EPGProvider):
                 self.provider_name,
                 max_ndays,
             )
-        url = "https://www.bworld.co.kr/myb/core-prod/product/btv-channel/week-frmt-list"
-        params = {"idSvc": "SVCID", "stdDt": "EPGDATE", "gubun": "week"}
+        ndays = min(int(self.cfg["FETCH_LIMIT"]), max_ndays)
+        self.fetch_programs(((_ch, ndays) for _ch in self.req_channels), self.__fetch_channel)
 
-        for idx, _ch in enumerate(self.req_channels):
-            self.log.info("%03d/%03d %s", idx + 1, len(self.req_channels), _ch)
-            params.update({"idSvc": _ch.svcid, "stdDt": date.today().strftime("%Y%m%d")})
+    def __fetch_channel(self, _ch: EPGChannel, ndays: int) -> List[EPGProgram]:
+        url = "https://www.bworld.co.kr/myb/core-prod/product/btv-channel/week-frmt-list"
+        params = {"idSvc": _ch.svcid, "stdDt": date.today().strftime("%Y%m%d"), "gubun": "week"}
+        try:
+            infolist = self.request(url, params=params)["result"]["chnlFrmtInfoList"]
+            if not isinstance(infolist, list):
+                raise ValueError("chnlFrmtInfoList must be a list")
+        except (KeyError, TypeError, ValueError):
+            self.log.exception("예상치 못한 응답: %s", params)
+            return []
+        _epgs = []
+        for nd in range(ndays):
+            day = date.today() + timedelta(days=nd)
             try:
-                infolist = self.request(url, params=params)["result"]["chnlFrmtInfoList"]
-                if not isinstance(infolist, list):
-                    raise ValueError("chnlFrmtInfoList must be a list")
+                _epgs.extend(self.__epgs_of_day(_ch.id, infolist, day))
             except (KeyError, TypeError, ValueError):
-                self.log.exception("예상치 못한 응답: %s", params)
-                continue
-            for nd in range(min(int(self.cfg["FETCH_LIMIT"]), max_ndays)):
-                day = date.today() + timedelta(days=nd)
-                try:
-                    _epgs = self.__epgs_of_day(_ch.id, infolist, day)
-                except (KeyError, TypeError, ValueError):
-                    self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
-                else:
-                    _ch.programs.extend(_epgs)
+                self.log.exception("프로그램 파싱 중 예외: %s, %s", _ch, day)
+        return _epgs
 
     def __epgs_of_day(self, channelid: str, data: list, day: date) -> List[EPGProgram]:
         _epgs = []
@@ -101,8 +102,8 @@ class SK(EPGProvider):
                 _epg.rebroadcast = bool(m.group(7))
                 _epg.ep_num = m.group(3)
             _epg.rating = int(info.get("cdRating") or "0")
-            _epg.stime = datetime.strptime(info["dtEventStart"], "%Y%m%d%H%M%S")
-            _epg.etime = datetime.strptime(info["dtEventEnd"], "%Y%m%d%H%M%S")
+            _epg.stime = strptime(info["dtEventStart"], "%Y%m%d%H%M%S")
+            _epg.etime = strptime(info["dtEventEnd"], "%Y%m%d%H%M%S")
             if genre := GENRE_CODE.get(info["cdGenre"]):
                 _epg.add_category(genre)
             _epg.desc = info["nmSynop"]
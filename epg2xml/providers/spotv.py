@@ -1,8 +1,8 @@
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from typing import List
 
 from epg2xml.providers import EPGProgram, EPGProvider
-from epg2xml.utils import time_to_td
+from epg2xml.utils import strptime, time_to_td
 
 
 class SPOTV(EPGProvider):
@@ -84,12 +84,12 @@ class SPOTV(EPGProvider):
             _epg = EPGProgram(channelid)
             _epg.title = p["title"]
             start_day, start_time = p["startTime"].split(" ", maxsplit=1)
-            _epg.stime = datetime.strptime(start_day, "%Y-%m-%d") + time_to_td(start_time)
+            _epg.stime = strptime(start_day, "%Y-%m-%d") + time_to_td(start_time)
             # 끝나는 시간이 없으면 해당일 자정으로 강제
             end_time = None
             if p["endTime"]:
                 end_day, end_time = p["endTime"].split(" ", maxsplit=1)
-                end_time = datetime.strptime(end_day, "%Y-%m-%d") + time_to_td(end_time)
+                end_time = strptime(end_day, "%Y-%m-%d") + time_to_td(end_time)
             _epg.etime = end_time or (_epg.stime.replace(hour=0, minute=0) + timedelta(days=1))
             if _epg.stime == _epg.etime:
                 continue
@@ -8,6 +8,7 @@ except ImportError:
     import requests
 
 from epg2xml.providers import EPGProgram, EPGProvider
+from epg2xml.utils import strptime
 
 today = date.today()
 
@@ -151,8 +152,8 @@ class TVING(EPGProvider):
         for sch in schedules:
             _epg = EPGProgram(channelid)
             # 공통
-            _epg.stime = datetime.strptime(str(sch["broadcast_start_time"]), "%Y%m%d%H%M%S")
-            _epg.etime = datetime.strptime(str(sch["broadcast_end_time"]), "%Y%m%d%H%M%S")
+            _epg.stime = strptime(str(sch["broadcast_start_time"]), "%Y%m%d%H%M%S")
+            _epg.etime = strptime(str(sch["broadcast_end_time"]), "%Y%m%d%H%M%S")
             _epg.rebroadcast = sch["rerun_yn"] == "Y"
 
             get_from = "movie" if sch["movie"] else "program"
@@ -3,6 +3,7 @@ from typing import List
 from xml.sax.saxutils import unescape
 
 from epg2xml.providers import EPGProgram, EPGProvider
+from epg2xml.utils import strptime
 
 today = date.today()
 
@@ -77,8 +78,8 @@ class WAVVE(EPGProvider):
 
     def __epg_of_program(self, channelid: str, data: dict) -> EPGProgram:
         _epg = EPGProgram(channelid)
-        _epg.stime = datetime.strptime(data["starttime"], "%Y-%m-%d %H:%M")
-        _epg.etime = datetime.strptime(data["endtime"], "%Y-%m-%d %H:%M")
+        _epg.stime = strptime(data["starttime"], "%Y-%m-%d %H:%M")
+        _epg.etime = strptime(data["endtime"], "%Y-%m-%d %H:%M")
         # 채널이름은 그대로 들어오고 프로그램 제목은 escape되어 들어옴
         _epg.title = unescape(data["title"])
         if m := self.title_regex.match(_epg.title):
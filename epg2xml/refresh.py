@@ -0,0 +1,65 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*([smhd]?)")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+_OFFSET = re.compile(r"(\d+)(\+?)")
+
+
+class FetchedUnit(NamedTuple):
+    """When a (channel, day) unit was fetched, and the stimes of the first and last programs it gave."""
+
+    fetched: datetime
+    first: datetime
+    last: datetime
+
+
+def parse_duration(value: Any) -> timedelta:
+    """Seconds as a number, or a number with an s/m/h/d suffix such as '90m' or '12h'."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return timedelta(seconds=value)
+    if isinstance(value, str) and (m := _DURATION.fullmatch(value.strip().lower())):
+        return timedelta(seconds=float(m.group(1)) * _UNITS[m.group(2)])
+    raise ValueError(f"Invalid duration: {value!r}")
+
+
+class RefreshPolicy:
+    """How long the programs of a day stay fresh, by how many days from today it is.
+
+    Built from a REFRESH_POLICY mapping such as {"0": "1h", "1": "3h", "2+": "12h"}, where "N" is day N
+    and "N+" is day N and all days after it unless given by itself. Days not covered are fetched every run.
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.days: Dict[int, timedelta] = {}
+        self.from_days: List[Tuple[int, timedelta]] = []
+        for key, value in rules.items():
+            if not (m := _OFFSET.fullmatch(str(key).strip())):
+                raise ValueError(f"Invalid REFRESH_POLICY day: {key!r}")
+            if m.group(2):
+                self.from_days.append((int(m.group(1)), parse_duration(value)))
+            else:
+                self.days[int(m.group(1))] = parse_duration(value)
+        self.from_days.sort(reverse=True)
+
+    @classmethod
+    def from_config(cls, value: Optional[Dict[str, Any]]) -> Optional["RefreshPolicy"]:
+        if value is None:
+            return None
+        if not isinstance(value, dict):
+            raise ValueError(f"REFRESH_POLICY must be a mapping of days to durations: {value!r}")
+        return cls(value)
+
+    def max_age(self, nd: int) -> timedelta:
+        if nd in self.days:
+            return self.days[nd]
+        for start, age in self.from_days:
+            if nd >= start:
+                return age
+        return timedelta(0)
+
+    def is_fresh(self, day: date, fetched: datetime, now: datetime) -> bool:
+        """Whether the programs of day fetched at `fetched` can be used as they are at `now`."""
+        nd = (day - now.date()).days
+        return nd >= 0 and now - fetched < self.max_age(nd)
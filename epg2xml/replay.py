@@ -0,0 +1,171 @@
+import gzip
+import json
+import logging
+import re
+import threading
+from collections import defaultdict, deque
+from datetime import date, timedelta
+from os import PathLike
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Set
+
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from curl_cffi import requests
+except ImportError:
+    import requests
+
+log = logging.getLogger("REPLAY")
+
+# Dates as providers put them in URLs, params and form data: 20240105, 2024-01-05, 2024.01.05 or 2024/1/5.
+PTN_DATE = re.compile(r"(?<!\d)(\d{4})(?:([-./])(\d{1,2})\2(\d{1,2})|(\d{2})(\d{2}))(?!\d)")
+# Only dates this close to the day of the request are taken for days of the schedule.
+DATE_WINDOW = timedelta(days=31)
+
+
+def archive_path(archive_dir: PathLike, provider_name: str) -> Path:
+    return Path(archive_dir).joinpath(f"{provider_name.upper()}.jsonl.gz")
+
+
+def request_key(method: str, url: str, params: Any = None, data: Any = None) -> str:
+    return json.dumps([method.upper(), url, params, data], sort_keys=True, default=str, ensure_ascii=False)
+
+
+def shift_dates(text: str, delta: timedelta, today: date) -> str:
+    """Move the dates in text that lie within DATE_WINDOW of today by delta, keeping their format."""
+
+    def shift(m: re.Match) -> str:
+        year, sep, month, day = m.group(1), m.group(2) or "", m.group(3) or m.group(5), m.group(4) or m.group(6)
+        try:
+            d = date(int(year), int(month), int(day))
+        except ValueError:
+            return m.group(0)
+        if abs(d - today) > DATE_WINDOW:
+            return m.group(0)
+        d += delta
+        return f"{d.year:04d}{sep}{d.month:0{len(month)}d}{sep}{d.day:0{len(day)}d}"
+
+    return PTN_DATE.sub(shift, text)
+
+
+class RecordingSession:
+    """Session wrapper appending every request and its response to a gzipped JSONL archive."""
+
+    def __init__(self, sess: Any, archive: PathLike):
+        self.sess = sess
+        self.archive = Path(archive)
+        self.fp = gzip.open(self.archive, "wt", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.sess, name)
+
+    def request(self, method: str = "GET", url: str = None, **kwargs) -> Any:
+        record = {
+            "method": method.upper(),
+            "url": url,
+            "params": kwargs.get("params"),
+            "data": kwargs.get("data"),
+            "day": date.today().isoformat(),
+        }
+        # Serialize before the call as callers may reuse and mutate their params.
+        record = json.loads(json.dumps(record, default=str, ensure_ascii=False))
+        try:
+            r = self.sess.request(method=method, url=url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            record["error"] = str(e)
+            self.__write(record)
+            raise
+        record.update(status=r.status_code, headers=dict(r.headers), text=r.text)
+        self.__write(record)
+        return r
+
+    def __write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            self.fp.write(line + "\n")
+            self.count += 1
+
+    def close(self) -> None:
+        self.fp.close()
+        self.sess.close()
+        log.info("Recorded %d requests into '%s'", self.count, self.archive)
+
+
+class ReplayResponse:
+    """Minimal response object rebuilt from an archived record."""
+
+    def __init__(self, record: dict):
+        self.url = record["url"]
+        self.status_code = record["status"]
+        self.headers = CaseInsensitiveDict(record["headers"])
+        self.text = record["text"]
+
+    @property
+    def content(self) -> bytes:
+        return self.text.encode("utf-8")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class ReplaySession:
+    """Session stand-in answering requests from an archive written by RecordingSession.
+
+    A request is matched exactly by method, URL, params and form data. Failing that, the dates in it are
+    moved back to the day the archive was recorded on and it is matched exactly again, so an archive stays
+    usable after the days of the schedule moved on and the same request always gets the same response,
+    whatever order the requests come in. Unmatched requests fail as a connection error.
+    """
+
+    def __init__(self, archive: PathLike):
+        self.archive = Path(archive)
+        self.exact: Dict[str, Deque[dict]] = defaultdict(deque)
+        self.days: Set[date] = set()
+        self.lock = threading.Lock()
+        self.headers = {}
+        self.proxies = {}
+        self.misses = 0
+        try:
+            with gzip.open(self.archive, "rt", encoding="utf-8") as fp:
+                for line in fp:
+                    record = json.loads(line)
+                    key = request_key(record["method"], record["url"], record["params"], record["data"])
+                    self.exact[key].append(record)
+                    if "day" in record:
+                        self.days.add(date.fromisoformat(record["day"]))
+        except FileNotFoundError:
+            log.warning("No archive to replay: '%s'", self.archive)
+
+    def request(self, method: str = "GET", url: str = None, **kwargs) -> ReplayResponse:
+        params, data = json.loads(json.dumps([kwargs.get("params"), kwargs.get("data")], default=str))
+        key = request_key(method, url, params, data)
+        with self.lock:
+            record = self.__pop(key)
+            if record is None:
+                today = date.today()
+                for day in sorted(self.days - {today}):
+                    if (record := self.__pop(shift_dates(key, day - today, today))) is not None:
+                        break
+            if record is None:
+                self.misses += 1
+                raise requests.exceptions.ConnectionError(f"Not found in archive: {method.upper()} {url}")
+        if "error" in record:
+            raise requests.exceptions.ConnectionError(record["error"])
+        return ReplayResponse(record)
+
+    def __pop(self, key: str) -> Optional[dict]:
+        # Identical requests get the responses recorded for them in order.
+        if records := self.exact.get(key):
+            return records.popleft()
+        return None
+
+    def close(self) -> None:
+        if self.misses:
+            log.warning("%d requests were not found in '%s'", self.misses, self.archive)
@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import logging
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from epg2xml import __title__, __version__
+
+log = logging.getLogger("HTTPD")
+
+TAIL = b"</tv>\n"
+
+# (channelid, <channel> element, <programme> elements) of a channel, as the daemon renders them.
+ChannelFragment = Tuple[str, str, str]
+
+
+class Snapshot:
+    """A published XMLTV document as it is served: UTF-8 body, its gzip and a strong ETag.
+
+    The byte ranges of each channel's <channel> and <programme> elements are kept, so that a document
+    filtered by provider or channel id is put together from slices of the body without rendering again.
+    """
+
+    def __init__(
+        self,
+        head: str,
+        providers: Sequence[Tuple[str, Sequence[ChannelFragment]]],
+        updated: float,
+        compresslevel: int = 6,
+    ):
+        self.head = head.encode("utf-8")
+        self.updated = updated
+        # channelid -> (provider, (start, end) of <channel>, (start, end) of <programme>s)
+        self.channels: Dict[str, Tuple[str, Tuple[int, int], Tuple[int, int]]] = {}
+        parts, offset, ranges = [self.head], len(self.head), []
+        for index in (1, 2):
+            for _, fragments in providers:
+                for fragment in fragments:
+                    data = fragment[index].encode("utf-8")
+                    parts.append(data)
+                    ranges.append((offset, offset + len(data)))
+                    offset += len(data)
+        parts.append(TAIL)
+        num = len(ranges) // 2
+        names = [(name, fragment[0]) for name, fragments in providers for fragment in fragments]
+        for (name, channelid), channel, programs in zip(names, ranges[:num], ranges[num:]):
+            self.channels[channelid] = (name, channel, programs)
+        self.body = b"".join(parts)
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=16).hexdigest()}"'
+        # A fixed mtime keeps the output reproducible.
+        self.gzipped = gzip.compress(self.body, compresslevel=compresslevel, mtime=0)
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.updated, usegmt=True)
+
+    def select(self, providers: Set[str], channels: Set[str]) -> bytes:
+        """The document with only the channels of the given providers and ids, where an empty set takes all."""
+        view = memoryview(self.body)
+        selected = [
+            (channel, programs)
+            for channelid, (name, channel, programs) in self.channels.items()
+            if (not providers or name in providers) and (not channels or channelid in channels)
+        ]
+        parts = [self.head]
+        parts.extend(view[start:end] for (start, end), _ in selected)
+        parts.extend(view[start:end] for _, (start, end) in selected)
+        parts.append(TAIL)
+        return b"".join(parts)
+
+
+def _query_values(query: Dict[str, List[str]], name: str) -> Set[str]:
+    return {x.strip() for value in query.get(name, []) for x in value.split(",") if x.strip()}
+
+
+def _accepts_gzip(header: str) -> bool:
+    for coding in header.lower().split(","):
+        name, _, params = coding.partition(";")
+        if name.strip() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [x.strip() for x in header.split(",")]
+    return "*" in tags or any((x[2:] if x.startswith("W/") else x) == etag for x in tags)
+
+
+class XMLTVRequestHandler(BaseHTTPRequestHandler):
+    """Serve the latest snapshot at /xmltv.xml, gzip-encoded when accepted, and pre-compressed at /xmltv.xml.gz.
+
+    `provider` and `channel` query parameters, repeated or comma-separated, filter the document.
+    """
+
+    server_version = f"{__title__}/{__version__}"
+    paths = ("/", "/xmltv.xml", "/xmltv.xml.gz")
+
+    def do_GET(self) -> None:
+        self.respond(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self.respond(send_body=False)
+
+    def respond(self, send_body: bool) -> None:
+        url = urlsplit(self.path)
+        if url.path not in self.paths:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        snapshot: Optional[Snapshot] = self.server.get_snapshot()
+        if snapshot is None:
+            self.send_response(HTTPStatus.SERVICE_UNAVAILABLE)
+            self.send_header("Retry-After", "60")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        query = parse_qs(url.query)
+        providers = {x.upper() for x in _query_values(query, "provider")}
+        channels = _query_values(query, "channel")
+        as_file = url.path.endswith(".gz")
+        gzipped = as_file or _accepts_gzip(self.headers.get("Accept-Encoding", ""))
+
+        etag = snapshot.etag
+        if providers or channels:
+            digest = hashlib.blake2b(repr((sorted(providers), sorted(channels))).encode(), digest_size=8)
+            etag = f'{etag[:-1]}-{digest.hexdigest()}"'
+        if gzipped and not as_file:
+            # Another representation of the same resource needs its own strong ETag.
+            etag = f'{etag[:-1]}-gzip"'
+
+        if self.not_modified(etag, snapshot.updated):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_common_headers(etag, snapshot)
+            self.end_headers()
+            return
+
+        if providers or channels:
+            body = snapshot.select(providers, channels)
+            if gzipped:
+                body = gzip.compress(body, compresslevel=6, mtime=0)
+        else:
+            body = snapshot.gzipped if gzipped else snapshot.body
+
+        self.send_response(HTTPStatus.OK)
+        self.send_common_headers(etag, snapshot)
+        if as_file:
+            self.send_header("Content-Type", "application/gzip")
+        else:
+            self.send_header("Content-Type", "application/xml; charset=utf-8")
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def not_modified(self, etag: str, updated: float) -> bool:
+        if (if_none_match := self.headers.get("If-None-Match")) is not None:
+            return _etag_matches(if_none_match, etag)
+        if (if_modified_since := self.headers.get("If-Modified-Since")) is not None:
+            try:
+                return int(updated) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def send_common_headers(self, etag: str, snapshot: Snapshot) -> None:
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", snapshot.last_modified)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=redefined-builtin
+        log.debug("%s - %s", self.address_string(), format % args)
+
+
+class XMLTVServer(ThreadingHTTPServer):
+    """HTTP server of the snapshots returned by get_snapshot, running on a daemon thread once started."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], get_snapshot: Callable[[], Optional[Snapshot]]):
+        super().__init__(address, XMLTVRequestHandler)
+        self.get_snapshot = get_snapshot
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.serve_forever, name="httpd", daemon=True)
+        self.thread.start()
+        log.info("Serving XMLTV on http://%s:%d/xmltv.xml", *self.server_address[:2])
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -1,15 +1,26 @@
+import bz2
+import gzip
+import hashlib
+import io
 import json
 import logging
+import lzma
+import os
 import re
 import sys
+import tempfile
 import threading
 import time
 import xml.etree.ElementTree as ET
-from datetime import timedelta
-from functools import wraps
+from collections import Counter
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
+from functools import lru_cache, wraps
+from importlib.util import find_spec
 from math import floor
 from pathlib import Path
-from typing import Any, Callable, Optional, Union
+from queue import Queue
+from typing import Any, BinaryIO, Callable, Optional, Union
 
 _YAML_BOOL_TAG = "tag:yaml.org,2002:bool"
 _YAML_BOOL_PATTERN = re.compile(r"^(?:true|True|TRUE|false|False|FALSE)$")
@@ -28,7 +39,12 @@ try:
 except ImportError:
     yaml = None
 
-from bs4 import BeautifulSoup, FeatureNotFound
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from bs4 import BeautifulSoup
 
 log = logging.getLogger("UTILS")
 
@@ -133,7 +149,36 @@ def strip_json_comments(text: str) -> str:
 
 def load_json(path: Union[Path, str]):
     txt = Path(path).read_text(encoding="utf-8")
-    return json.loads(strip_json_comments(txt))
+    return json_loads(strip_json_comments(txt))
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """json.loads on orjson if it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # NaN, integers over 64 bits and the like, which json still takes
+    return json.loads(data)
+
+
+# Media types answered with JSON; other bodies are only decoded when they look like it.
+_JSON_MEDIA_TYPE = re.compile(r"\s*(application/([\w.+-]*\+)?json|text/(json|javascript))\b", re.I)
+_JSON_START = re.compile(r"\s*[{\[]")
+
+
+def decode_body(text: str, content_type: Optional[str] = None) -> Any:
+    """The decoded JSON of a response body, or the body itself if it is not JSON.
+
+    HTML pages skip the JSON parse altogether. Some APIs label JSON as text/html or text/plain though,
+    so a body not declared as JSON is still decoded when it starts like an object or an array.
+    """
+    if not (content_type and _JSON_MEDIA_TYPE.match(content_type)) and not _JSON_START.match(text):
+        return text
+    try:
+        return json_loads(text)
+    except ValueError:
+        return text
 
 
 def norm_text(value) -> Optional[str]:
@@ -168,6 +213,105 @@ def time_to_td(value) -> Optional[timedelta]:
     return timedelta(hours=hour, minutes=minute, seconds=second)
 
 
+# Widths of the zero-padded numeric directives a fixed-width format may consist of.
+_FIXED_WIDTHS = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+
+
+class FixedWidthFormat:
+    """A strptime format of only zero-padded numeric fields and literals, parsed by slicing.
+
+    Providers parse the same few formats for every program, and datetime.strptime goes through
+    locale aware regular expressions each time. Here fields are sliced at fixed offsets and the
+    date part, shared by the programs of a day, is validated once and memoized.
+    """
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.literals = []
+        self.fields = {}
+        pos = 0
+        chars = iter(fmt)
+        for ch in chars:
+            if ch != "%":
+                self.literals.append((pos, ch))
+                pos += 1
+                continue
+            directive = next(chars, "")
+            if directive not in _FIXED_WIDTHS or directive in self.fields:
+                raise ValueError(f"Not a fixed-width format: {fmt!r}")
+            self.fields[directive] = (pos, pos + _FIXED_WIDTHS[directive])
+            pos += _FIXED_WIDTHS[directive]
+        self.length = pos
+        date_spans = [self.fields[x] for x in "Ymd" if x in self.fields]
+        self.date_span = (min(x[0] for x in date_spans), max(x[1] for x in date_spans)) if date_spans else (0, 0)
+        self.time_spans = [self.fields.get(x) for x in "HMS"]
+        self.date_of = lru_cache(maxsize=512)(self._date_of)
+
+    def _date_of(self, text: str) -> date:
+        start = self.date_span[0]
+        values = []
+        for directive, default in (("Y", 1900), ("m", 1), ("d", 1)):
+            if (span := self.fields.get(directive)) is None:
+                values.append(default)
+                continue
+            digits = text[span[0] - start : span[1] - start]
+            if not digits.isdigit():
+                raise ValueError(f"time data {text!r} does not match format {self.fmt!r}")
+            values.append(int(digits))
+        return date(*values)
+
+    def parse(self, text: str) -> datetime:
+        if len(text) != self.length or not text.isascii():
+            raise ValueError(f"time data {text!r} does not match format {self.fmt!r}")
+        for pos, ch in self.literals:
+            if text[pos] != ch:
+                raise ValueError(f"time data {text!r} does not match format {self.fmt!r}")
+        day = self.date_of(text[self.date_span[0] : self.date_span[1]])
+        values = []
+        for span in self.time_spans:
+            if span is None:
+                values.append(0)
+                continue
+            digits = text[span[0] : span[1]]
+            if not digits.isdigit():
+                raise ValueError(f"time data {text!r} does not match format {self.fmt!r}")
+            values.append(int(digits))
+        return datetime(day.year, day.month, day.day, *values)
+
+
+@lru_cache(maxsize=None)
+def _fixed_width_format(fmt: str) -> Optional[FixedWidthFormat]:
+    try:
+        return FixedWidthFormat(fmt)
+    except ValueError:
+        return None
+
+
+def strptime(text: str, fmt: str) -> datetime:
+    """Same as datetime.strptime, with a fast path for fixed-width numeric formats like '%Y%m%d%H%M%S'.
+
+    Anything the fast path does not take, e.g. fields without zero padding, goes to datetime.strptime,
+    so the result and the errors raised are the same.
+    """
+    if (parser := _fixed_width_format(fmt)) is not None:
+        try:
+            return parser.parse(text)
+        except ValueError:
+            pass
+    return datetime.strptime(text, fmt)
+
+
+@lru_cache(maxsize=512)
+def _xmltv_date(year: int, month: int, day: int) -> str:
+    return f"{year:04d}{month:02d}{day:02d}"
+
+
+def xmltv_time(value: datetime, offset: str = "+0900") -> str:
+    """Same as value.strftime('%Y%m%d%H%M%S +0900'), the time format of XMLTV programmes."""
+    ymd = _xmltv_date(value.year, value.month, value.day)
+    return f"{ymd}{value.hour:02d}{value.minute:02d}{value.second:02d} {offset}"
+
+
 # https://stackoverflow.com/a/22273639
 _illegal_unichrs = [
     (0x00, 0x08),
@@ -248,6 +392,190 @@ class Element(ET.Element):
         return _illegal_xml_chars_RE.sub("", space * level + ET.tostring(self, encoding="unicode"))
 
 
+COMPRESSIONS = {".gz": "gzip", ".xz": "xz", ".bz2": "bz2"}
+
+
+def compression_of(path: Union[Path, str]) -> Optional[str]:
+    """Return the compression implied by the file extension, e.g. 'gzip' for 'xmltv.xml.gz'."""
+    return COMPRESSIONS.get(Path(path).suffix.lower())
+
+
+class CompressedWriter:
+    """Text writer that compresses into a binary stream on a background thread.
+
+    Text is buffered up to `bufsize` characters and handed over in chunks, so that compression,
+    which releases the GIL, overlaps with whoever keeps writing. The binary stream is closed with the writer.
+    """
+
+    def __init__(self, raw: BinaryIO, compression: str, level: int = None, bufsize: int = 1024**2):
+        if compression == "gzip":
+            # A fixed mtime keeps the output reproducible.
+            self.fp = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9 if level is None else level, mtime=0)
+        elif compression == "xz":
+            self.fp = lzma.LZMAFile(raw, "wb", preset=level)
+        elif compression == "bz2":
+            self.fp = bz2.BZ2File(raw, "wb", compresslevel=9 if level is None else level)
+        else:
+            raise ValueError(f"Unsupported compression: {compression!r}")
+        self.raw = raw
+        self.bufsize = bufsize
+        self.buffer = []
+        self.buffered = 0
+        self.error = None
+        self.queue = Queue(maxsize=4)
+        self.thread = threading.Thread(target=self.__compress, name="compress", daemon=True)
+        self.thread.start()
+
+    def __compress(self) -> None:
+        while (chunk := self.queue.get()) is not None:
+            if self.error is None:
+                try:
+                    self.fp.write(chunk)
+                except (OSError, ValueError) as e:
+                    self.error = e
+
+    def __flush_buffer(self) -> None:
+        if self.error is not None:
+            raise self.error
+        if self.buffer:
+            self.queue.put("".join(self.buffer).encode("utf-8"))
+            self.buffer, self.buffered = [], 0
+
+    def write(self, text: str) -> int:
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.bufsize:
+            self.__flush_buffer()
+        return len(text)
+
+    def close(self) -> None:
+        if not self.thread.is_alive():
+            return
+        try:
+            self.__flush_buffer()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
+            try:
+                self.fp.close()
+            finally:
+                self.raw.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def compress_bytes(data: bytes, compression: str, level: int = None) -> bytes:
+    """Compress data in one go, with the same defaults as CompressedWriter."""
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    if compression == "xz":
+        return lzma.compress(data, preset=level)
+    if compression == "bz2":
+        return bz2.compress(data, compresslevel=9 if level is None else level)
+    raise ValueError(f"Unsupported compression: {compression!r}")
+
+
+class _HashingFile(io.RawIOBase):
+    """Binary stream that hashes what is written through it."""
+
+    def __init__(self, fp: BinaryIO):
+        super().__init__()
+        self.fp = fp
+        self.hash = hashlib.blake2b()
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.hash.update(b)
+        self.size += len(b)
+        return self.fp.write(b)
+
+    def flush(self) -> None:
+        self.fp.flush()
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                super().close()
+            finally:
+                self.fp.close()
+
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.blake2b()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024**2):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class AtomicOutput:
+    """Context manager of a binary stream that replaces `path` on a clean exit, only if the content changed.
+
+    Data goes into a temporary file in the same directory and is hashed as it is written, so that readers
+    never see a partial file and an unchanged output keeps the previous file, mtime included.
+    Paths that are not regular files, such as /dev/stdout or a FIFO, are written directly.
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        self.path = Path(path)
+        self.tmp: Optional[Path] = None
+        self.raw: Optional[_HashingFile] = None
+        self.changed: Optional[bool] = None
+
+    def __enter__(self) -> BinaryIO:
+        if self.path.exists() and not self.path.is_file():
+            self.raw = _HashingFile(open(self.path, "wb"))
+            return self.raw
+        fd, tmp = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        self.tmp = Path(tmp)
+        self.raw = _HashingFile(os.fdopen(fd, "wb"))
+        return self.raw
+
+    def __exit__(self, exc_type, *_):
+        try:
+            self.raw.close()
+            if self.tmp is not None and exc_type is None:
+                self.__replace()
+        finally:
+            if self.tmp is not None and self.tmp.exists():
+                self.tmp.unlink()
+
+    def __replace(self) -> None:
+        self.changed = not (
+            self.path.is_file()
+            and self.path.stat().st_size == self.raw.size
+            and _file_digest(self.path) == self.raw.hash.hexdigest()
+        )
+        if not self.changed:
+            log.info("'%s' is unchanged, keeping the previous file", self.path)
+            return
+        if self.path.exists():
+            os.chmod(self.tmp, self.path.stat().st_mode & 0o7777)
+        else:
+            # mkstemp creates the file for the owner only, unlike open() would.
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(self.tmp, 0o666 & ~umask)
+        os.replace(self.tmp, self.path)
+
+
+def open_output(stack: ExitStack, path: Union[Path, str], compression: Optional[str], level: int = None):
+    """Open a text writer into `path` on stack, replaced as AtomicOutput does and compressed if given."""
+    raw = stack.enter_context(AtomicOutput(path))
+    if compression:
+        return stack.enter_context(CompressedWriter(raw, compression, level))
+    return stack.enter_context(io.TextIOWrapper(io.BufferedWriter(raw), encoding="utf-8"))
+
+
 class PrefixLogger(logging.LoggerAdapter):
     def __init__(self, logger, prefix):
         super().__init__(logger, {})
@@ -257,8 +585,57 @@ class PrefixLogger(logging.LoggerAdapter):
         return f"{self.prefix} {msg}", kwargs
 
 
+# HTML parsers that can be selected, with the module each one needs. lxml.html is lxml's own API in the
+# providers that support it (see parse_lxml_html) and the lxml tree builder of bs4 everywhere else.
+HTML_PARSERS = {"lxml": "lxml", "html.parser": None, "html5lib": "html5lib", "lxml.html": "lxml"}
+
+
+class HTMLParserBackend:
+    """The bs4 tree builder used by ParserBeautifulSoup, and the time spent parsing with each backend.
+
+    lxml is picked when installed, else html.parser. This is looked up once instead of on every parse.
+    Pages parsed in --parse-workers processes are not counted here.
+    """
+
+    def __init__(self):
+        self.name = "lxml" if find_spec("lxml") else "html.parser"
+        self.lock = threading.Lock()
+        self.pages = Counter()
+        self.seconds = Counter()
+
+    def select(self, name: str) -> None:
+        if name not in HTML_PARSERS:
+            raise ValueError(f"Unknown HTML parser: '{name}'")
+        if (module := HTML_PARSERS[name]) is not None and find_spec(module) is None:
+            log.error("HTML parser '%s' is not installed. Install it with: pip install %s", name, module)
+            raise OptionalDependencyError(f"HTML parser '{name}' requires {module}")
+        self.name = name
+
+    @property
+    def bs4_name(self) -> str:
+        """The bs4 tree builder for the selected parser."""
+        return "lxml" if self.name == "lxml.html" else self.name
+
+    def record(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.pages[name] += 1
+            self.seconds[name] += seconds
+
+    def log_stats(self) -> None:
+        for name, pages in self.pages.items():
+            seconds = self.seconds[name]
+            log.info("HTML parser %s: %d pages in %.2fs (%.1f ms/page)", name, pages, seconds, 1e3 * seconds / pages)
+
+
+html_parser_backend = HTMLParserBackend()
+
+
+def select_html_parser(name: str) -> None:
+    html_parser_backend.select(name)
+
+
 class ParserBeautifulSoup(BeautifulSoup):
-    """A ``bs4.BeautifulSoup`` that picks the first available parser."""
+    """A ``bs4.BeautifulSoup`` on the selected HTML parser backend."""
 
     def insert_before(self, *args):
         pass
@@ -267,75 +644,125 @@ class ParserBeautifulSoup(BeautifulSoup):
         pass
 
     def __init__(self, markup, **kwargs):
-        # Pick the first available parser.
-        for parser in ["lxml", "html.parser"]:
-            try:
-                super().__init__(markup, parser, **kwargs)
-                return
-            except FeatureNotFound:
-                pass
+        name = html_parser_backend.bs4_name
+        stime = time.perf_counter()
+        super().__init__(markup, name, **kwargs)
+        html_parser_backend.record(name, time.perf_counter() - stime)
+
 
-        raise FeatureNotFound
+def parse_lxml_html(markup: str) -> Any:
+    """Parse into an lxml.html tree without bs4, for providers that take lxml's API with --htmlparser lxml.html."""
+    try:
+        from lxml import html as lxml_html  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        raise OptionalDependencyError(
+            "lxml.html parsing requires lxml. Install it with: pip install epg2xml[lxml]"
+        ) from None
+    stime = time.perf_counter()
+    tree = lxml_html.fromstring(markup)
+    html_parser_backend.record("lxml.html", time.perf_counter() - stime)
+    return tree
 
 
 class RateLimiter:
-    """Based on the original implementation by tomasbasham/ratelimit."""
+    """Token bucket rate limiter, originally based on tomasbasham/ratelimit.
+
+    Tokens refill at calls/period per second and up to ``burst`` of them can be spent at once.
+    Each call only reserves its slot under the lock and then sleeps and runs outside of it, so
+    a waiting or slow call never blocks other threads sharing the limiter and several calls can
+    be in flight together while the average rate stays put.
+    """
 
     try:
         now: Callable = time.monotonic  # Use monotonic time if available
     except AttributeError:
         now: Callable = time.time  # otherwise fall back to the system clock
 
-    def __init__(self, calls: int = 15, period: float = 900.0, tps: float = None):
+    def __init__(self, calls: int = 15, period: float = 900.0, tps: float = None, burst: int = None):
         if tps is not None:
             if tps <= 0.0:
                 raise ValueError("tps must be positive")
             calls, period = 1, 1 / tps
+        if period <= 0.0:
+            raise ValueError("period must be positive")
         self.max_calls = max(1, min(sys.maxsize, floor(calls)))
         self.period = period
-
-        # Initialise the decorator state.
-        self.last_reset = self.now()
-        self.num_calls = 0
-
-        # Add thread safety.
-        self.lock = threading.RLock()
+        self.burst = self.max_calls if burst is None else max(1, int(burst))
+        # Seconds per token, and the theoretical time the next token is due (GCRA form).
+        self.interval = period / self.max_calls
+        self.next_slot = self.now()
+
+        self.lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Average number of calls per second."""
+        return 1.0 / self.interval
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before it may be used."""
+        with self.lock:
+            now = self.now()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+            # Up to (burst - 1) tokens may be spent ahead of schedule.
+            return max(0.0, slot - (self.burst - 1) * self.interval - now)
 
     def __call__(self, func: Callable) -> Callable:
         """
-        Return a wrapped function that prevents further function invocations if
-        previously called within a specified period of time.
+        Return a wrapped function that delays each invocation until the limiter hands out a
+        token for it.
         """
 
         @wraps(func)
         def wrapper(*args, **kargs):
-            """
-            Extend the behaviour of the decorated function, forwarding function
-            invocations previously called no sooner than a specified period of
-            time. The decorator will raise an exception if the function cannot
-            be called so the caller may implement a retry strategy such as an
-            exponential backoff.
-            """
-            with self.lock:
-                period_remaining = self.__period_remaining()
-
-                # If the time window has elapsed then reset.
-                if period_remaining <= 0:
-                    self.num_calls = 0
-                    self.last_reset = self.now()
-
-                # Increase the number of attempts to call the function.
-                self.num_calls += 1
-
-                # If the number of attempts to call the function exceeds the maximum
-                if self.num_calls > self.max_calls:
-                    self.last_reset = self.now() + period_remaining  # for future call
-                    time.sleep(period_remaining)
-                    return func(*args, **kargs)
+            if (delay := self.reserve()) > 0:
+                time.sleep(delay)
             return func(*args, **kargs)
 
         return wrapper
 
-    def __period_remaining(self) -> float:
-        elapsed = self.now() - self.last_reset
-        return self.period - elapsed
+
+class AdaptiveRateLimiter(RateLimiter):
+    """RateLimiter whose rate is steered by AIMD (additive increase, multiplicative decrease).
+
+    Healthy responses raise the rate by ``increase`` tps per second of traffic up to ``max_tps``;
+    push-back from the server cuts it by ``decrease`` down to ``min_tps``, and a Retry-After hint
+    holds back every caller until it has passed.
+    """
+
+    def __init__(
+        self,
+        tps: float,
+        min_tps: float = None,
+        max_tps: float = None,
+        increase: float = 0.1,
+        decrease: float = 0.5,
+        burst: int = None,
+    ):
+        super().__init__(tps=tps, burst=burst)
+        self.min_tps = min(tps, min_tps or tps / 10)
+        self.max_tps = max(tps, max_tps or tps)
+        self.increase = increase
+        self.decrease = decrease
+        self.throttled = 0
+
+    def set_rate(self, tps: float) -> None:
+        with self.lock:
+            self.interval = 1.0 / max(self.min_tps, min(self.max_tps, tps))
+
+    def success(self) -> None:
+        """Grow the rate after a healthy response."""
+        with self.lock:
+            rate = 1.0 / self.interval
+            if rate < self.max_tps:
+                # Spread the increase over the calls made in a second to keep it additive in time.
+                self.interval = 1.0 / min(self.max_tps, rate + self.increase / rate)
+
+    def backoff(self, delay: float = None) -> None:
+        """Cut the rate after push-back and hold back all callers for `delay` seconds if given."""
+        with self.lock:
+            self.throttled += 1
+            self.interval = 1.0 / max(self.min_tps, self.decrease / self.interval)
+            if delay:
+                self.next_slot = max(self.next_slot, self.now() + delay + (self.burst - 1) * self.interval)
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import marshal
+import sqlite3
+import threading
+import time
+from collections import Counter
+from operator import attrgetter
+from os import PathLike
+from typing import Any, Dict, List, Optional
+
+from epg2xml import __version__
+from epg2xml.xmltv import render_programme
+
+log = logging.getLogger("XMLCACHE")
+
+# Provider config keys that change how a program is rendered.
+OUTPUT_KEYS = ("ADD_DESCRIPTION", "ADD_EPNUM_TO_TITLE", "ADD_REBROADCAST_TO_TITLE", "ADD_XMLTV_NS")
+
+# EPGProgram fields of plain values, see FragmentCache.program_content for the others.
+_plain_fields = attrgetter(
+    "channelid",
+    "title",
+    "title_sub",
+    "part_num",
+    "ep_num",
+    "categories",
+    "rebroadcast",
+    "rating",
+    "desc",
+    "poster_url",
+    "extras",
+    "keywords",
+)
+
+
+def _credits(values: Optional[list]) -> Optional[list]:
+    return values and [(x.name, x.title, x.role) for x in values]
+
+
+class FragmentCache:
+    """SQLite store of rendered <programme> fragments keyed by program content and output config.
+
+    Most programs of a 7-day EPG are the same as in the previous run. Their fragments are written from
+    here instead of being validated and rendered again. The key also covers the epg2xml version, so an
+    upgrade that changes rendering starts over. New and reused fragments are written every `batch_size`
+    programs, and fragments not used for `max_age` seconds are dropped on close.
+    """
+
+    def __init__(self, dbfile: PathLike, max_age: float = 7 * 86400, batch_size: int = 1000):
+        self.conn = sqlite3.connect(dbfile, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS fragment (
+            key BLOB PRIMARY KEY, xml TEXT NOT NULL, used REAL NOT NULL
+            )"""
+        )
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.used: List[bytes] = []
+        self.added: Dict[bytes, str] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def program_content(prog: Any) -> bytes:
+        """Stable bytes of a program as given by its provider, to be taken before rendering sanitizes it."""
+        # marshal version 2 writes no back-references, so equal values give equal bytes whatever their identity.
+        values = (_plain_fields(prog), str(prog.stime), str(prog.etime), _credits(prog.cast), _credits(prog.crew))
+        return marshal.dumps((__version__, values), 2)
+
+    @staticmethod
+    def program_key(content: bytes, cfg: dict) -> bytes:
+        """Digest of program_content and the output config it is rendered under."""
+        raw = content + marshal.dumps(tuple(cfg[k] for k in OUTPUT_KEYS), 2)
+        return hashlib.blake2b(raw, digest_size=16).digest()
+
+    def render(self, prog: Any, cfg: dict, content: bytes = None) -> str:
+        """The <programme> fragment of prog, sanitized, validated and rendered only if it is not cached yet.
+
+        A program rendered under several output configs is changed by the first rendering, so its content
+        should be taken once beforehand and given for each of them.
+        """
+        key = self.program_key(self.program_content(prog) if content is None else content, cfg)
+        with self.lock:
+            if (xml := self.added.get(key)) is None:
+                row = self.conn.execute("SELECT xml FROM fragment WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    xml = row[0]
+                    self.used.append(key)
+                    if len(self.used) >= self.batch_size:
+                        self.__flush()
+            if xml is not None:
+                self.stats["hits"] += 1
+                return xml
+        xml = render_programme(prog.xml_data(cfg))
+        with self.lock:
+            self.stats["misses"] += 1
+            self.added[key] = xml
+            if len(self.added) >= self.batch_size:
+                self.__flush()
+        return xml
+
+    def __flush(self) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("UPDATE fragment SET used = ? WHERE key = ?", ((now, k) for k in self.used))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO fragment (key, xml, used) VALUES (?, ?, ?)",
+                ((k, xml, now) for k, xml in self.added.items()),
+            )
+        self.used.clear()
+        self.added.clear()
+
+    def close(self) -> None:
+        with self.lock:
+            self.__flush()
+            with self.conn:
+                cursor = self.conn.execute("DELETE FROM fragment WHERE used < ?", (time.time() - self.max_age,))
+                self.stats["evicted"] += cursor.rowcount
+            self.conn.close()
+
+    def log_stats(self) -> None:
+        log.info(
+            "XML cache: %d hits, %d misses, %d evicted",
+            self.stats["hits"],
+            self.stats["misses"],
+            self.stats["evicted"],
+        )
@@ -0,0 +1,155 @@
+"""XMLTV serialization of channels and programmes.
+
+`render_channel` and `render_programme` write the indented XML straight from plain field tuples. Their
+output is byte-identical to building `utils.Element` trees and calling `Element.tostring`, which is kept
+as `channel_element`/`programme_element` for reference and comparison.
+"""
+
+import xml.etree.ElementTree as ET
+from typing import List, NamedTuple, Optional, Tuple
+
+from epg2xml.utils import Element, _illegal_xml_chars_RE
+
+INDENT = "  "
+
+
+def _probe_escapes(render) -> Tuple[Tuple[str, str], ...]:
+    # Ask ElementTree how it escapes each special character, so that the output keeps matching it
+    # across Python versions. "&" comes first to avoid escaping the other entities twice, and CR LF is
+    # probed as a whole before CR and LF, since Python 3.8 folds it into a single LF in attributes.
+    return tuple((c, e) for c in ("&", "<", ">", '"', "\r\n", "\r", "\n", "\t") if (e := render(c)) != c)
+
+
+TEXT_ESCAPES = _probe_escapes(lambda c: ET.tostring(Element("x", c), encoding="unicode")[3:-4])
+ATTR_ESCAPES = _probe_escapes(lambda c: ET.tostring(Element("x", a=c), encoding="unicode")[6:-4])
+
+
+def escape_text(text: str) -> str:
+    for c, e in TEXT_ESCAPES:
+        if c in text:
+            text = text.replace(c, e)
+    return _illegal_xml_chars_RE.sub("", text)
+
+
+def escape_attr(text: str) -> str:
+    for c, e in ATTR_ESCAPES:
+        if c in text:
+            text = text.replace(c, e)
+    # Illegal characters go after escaping, as in Element.tostring, which matters to CR LF split by them.
+    return _illegal_xml_chars_RE.sub("", text)
+
+
+class ChannelData(NamedTuple):
+    id: str
+    display_names: List[str]
+    icon: Optional[str]
+
+
+class ProgrammeData(NamedTuple):
+    start: str
+    stop: str
+    channel: str
+    title: str
+    title_sub: Optional[str]
+    desc: Optional[str]
+    credits: List[Tuple[str, str, Optional[str]]]  # (tag, name, role)
+    categories: List[Tuple[str, str]]  # (text, lang)
+    keywords: List[str]
+    icon: Optional[str]
+    episode: Optional[Tuple[str, str]]  # (text, system)
+    previously_shown: bool
+    rating: Optional[str]
+
+
+def _element(indent: str, tag: str, text: Optional[str], attrs: str = "") -> str:
+    # Empty text makes ElementTree write a short empty element.
+    if text:
+        return f"{indent}<{tag}{attrs}>{escape_text(text)}</{tag}>"
+    return f"{indent}<{tag}{attrs} />"
+
+
+def render_channel(ch: ChannelData) -> str:
+    child = "\n" + INDENT * 2
+    parts = [f'{INDENT}<channel id="{escape_attr(ch.id)}">']
+    parts.extend(_element(child, "display-name", name) for name in ch.display_names)
+    if ch.icon:
+        parts.append(f'{child}<icon src="{escape_attr(ch.icon)}" />')
+    parts.append(f"\n{INDENT}</channel>")
+    return "".join(parts)
+
+
+def render_programme(p: ProgrammeData) -> str:
+    child, grandchild = "\n" + INDENT * 2, "\n" + INDENT * 3
+    parts = [
+        f'{INDENT}<programme start="{escape_attr(p.start)}" stop="{escape_attr(p.stop)}"'
+        f' channel="{escape_attr(p.channel)}">',
+        _element(child, "title", p.title, ' lang="ko"'),
+    ]
+    if p.title_sub:
+        parts.append(_element(child, "sub-title", p.title_sub, ' lang="ko"'))
+    if p.desc is not None:
+        parts.append(_element(child, "desc", p.desc, ' lang="ko"'))
+    if p.credits:
+        parts.append(f"{child}<credits>")
+        for tag, name, role in p.credits:
+            attrs = "" if role is None else f' role="{escape_attr(role)}"'
+            parts.append(_element(grandchild, tag, name, attrs))
+        parts.append(f"{child}</credits>")
+    for text, lang in p.categories:
+        parts.append(_element(child, "category", text, f' lang="{lang}"'))
+    for keyword in p.keywords:
+        parts.append(_element(child, "keyword", keyword, ' lang="ko"'))
+    if p.icon:
+        parts.append(f'{child}<icon src="{escape_attr(p.icon)}" />')
+    if p.episode:
+        text, system = p.episode
+        parts.append(_element(child, "episode-num", text, f' system="{system}"'))
+    if p.previously_shown:
+        parts.append(f"{child}<previously-shown />")
+    if p.rating:
+        # 한국 TV 프로그램 시청등급은 영화·비디오물 쪽 제도인 KMRB 표기로 적기 어렵다.
+        # KCSC(방심위)도 검토했지만, 실제 등급 표시는 방송사/플랫폼의 자체 분류에 가깝고
+        # 방심위는 기준 설정·조정 역할이어서 특정 기관명을 system 값으로 단정하기 애매하다.
+        # 그래서 여기서는 가장 중립적인 국가 단위 표기인 KR을 사용한다.
+        parts.append(f'{child}<rating system="KR">{_element(grandchild, "value", p.rating)}{child}</rating>')
+    parts.append(f"\n{INDENT}</programme>")
+    return "".join(parts)
+
+
+def channel_element(ch: ChannelData) -> Element:
+    chel = Element("channel", id=ch.id)
+    for name in ch.display_names:
+        chel.append(Element("display-name", name))
+    if ch.icon:
+        chel.append(Element("icon", src=ch.icon))
+    return chel
+
+
+def programme_element(p: ProgrammeData) -> Element:
+    _p = Element("programme", start=p.start, stop=p.stop, channel=p.channel)
+    _p.append(Element("title", p.title, lang="ko"))
+    if p.title_sub:
+        _p.append(Element("sub-title", p.title_sub, lang="ko"))
+    if p.desc is not None:
+        _p.append(Element("desc", p.desc, lang="ko"))
+    if p.credits:
+        _c = Element("credits")
+        for tag, name, role in p.credits:
+            _c.append(Element(tag, name, **({} if role is None else {"role": role})))
+        _p.append(_c)
+    for text, lang in p.categories:
+        _p.append(Element("category", text, lang=lang))
+    for keyword in p.keywords:
+        _p.append(Element("keyword", keyword, lang="ko"))
+    if p.icon:
+        _p.append(Element("icon", src=p.icon))
+    if p.episode:
+        text, system = p.episode
+        _p.append(Element("episode-num", text, system=system))
+    if p.previously_shown:
+        _p.append(Element("previously-shown"))
+    if p.rating:
+        _r = Element("rating", system="KR")
+        _r.append(Element("value", p.rating))
+        _p.append(_r)
+    return _p
@@ -0,0 +1,134 @@
+import argparse
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import List
+
+from epg2xml.providers import EPGProgram, daum
+from epg2xml.utils import ParserBeautifulSoup as BeautifulSoup
+from scripts.bench_parse_workers import load_calls
+
+
+def epgs_of_days_select(channelid: str, data: str, title_regex: re.Pattern) -> List[EPGProgram]:
+    """The DAUM parser before it walked the table once, selecting each day column with CSS selectors."""
+    soup = BeautifulSoup(data)
+    if not soup.find_all(attrs={"disp-attr": "B3T"}):
+        raise ValueError("EPG 정보가 없거나 없는 채널입니다")
+    days = soup.select('div[class="tbl_head head_type2"] > span > span[class="date"]')
+    if not days:
+        raise ValueError("방송 일자 정보를 찾지 못했습니다")
+
+    currdate = datetime.now()
+    basedate = datetime.strptime(days[0].text.strip(), "%m.%d").replace(year=currdate.year)
+    if (basedate - currdate).days > 0:
+        basedate = basedate.replace(year=basedate.year - 1)
+
+    _epgs = []
+    for nd, _ in enumerate(days):
+        hours = soup.select(f'[id="tvProgramListWrap"] > table > tbody > tr > td:nth-of-type({nd+1})')
+        if len(hours) != 24:
+            raise ValueError(f"24개의 시간 행이 있어야 합니다: 현재: {len(hours):d}")
+        for nh, hour in enumerate(hours):
+            for dl in hour.select("dl"):
+                _epg = EPGProgram(channelid)
+                nm = int(dl.select("dt")[0].text.strip())
+                _epg.stime = basedate + timedelta(days=nd, hours=nh, minutes=nm)
+                for atag in dl.select("dd > a"):
+                    _epg.title = atag.text.strip()
+                for span in dl.select("dd > span"):
+                    class_val = " ".join(span["class"])
+                    if class_val == "":
+                        _epg.title = span.text.strip()
+                    elif "ico_re" in class_val:
+                        _epg.rebroadcast = True
+                    elif "ico_rate" in class_val:
+                        _epg.rating = int(class_val.split("ico_rate")[1].strip())
+                    else:
+                        _epg.add_extra(span.text)
+                if m := title_regex.search(_epg.title):
+                    _epg.title = m.group("title")
+                    _epg.part_num = m.group("part")
+                    _epg.ep_num = m.group("epnum")
+                    _epg.title_sub = m.group("subname2") or m.group("subname1")
+                    if _epg.part_num:
+                        _epg.title += f" {_epg.part_num}부"
+                _epgs.append(_epg)
+    return _epgs
+
+
+def synthetic_page(seed: int = 0, ndays: int = 7) -> str:
+    """A search result page shaped like DAUM's 7-day timetable of a channel."""
+    rng = random.Random(seed)
+    basedate = datetime.now() - timedelta(days=1)
+    dates = "".join(
+        f'<span><span class="date">{(basedate + timedelta(days=nd)).strftime("%m.%d")}</span></span>'
+        for nd in range(ndays)
+    )
+    rows = []
+    for _ in range(24):
+        cells = []
+        for _ in range(ndays):
+            dls = []
+            for minute in sorted(rng.sample(range(60), rng.randint(1, 3))):
+                icons = ['<span class="ico_re">재</span>', '<span class="ico_hd">HD</span>']
+                spans = rng.sample(icons, rng.randint(0, 2))
+                spans.append(f'<span class="ico_rate {rng.choice([7, 12, 15])}">등급</span>')
+                title = rng.choice(["뉴스", "드라마 2부 <부제> 12회", "시사 매거진 <특집>"])
+                dls.append(f"<dl><dt>{minute:02d}</dt><dd><a href='#'>{title}</a>{''.join(spans)}</dd></dl>")
+            cells.append(f"<td>{''.join(dls)}</td>")
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    return (
+        '<html><body><div disp-attr="B3T">'
+        f'<div class="tbl_head head_type2">{dates}</div>'
+        f'<div id="tvProgramListWrap"><table><tbody>{"".join(rows)}</tbody></table></div>'
+        "</div></body></html>"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_daum_parser",
+        description="Compare the single-pass DAUM timetable parser against the per-day CSS selector one",
+    )
+    parser.add_argument(
+        "fixture_dir", type=Path, nargs="?", help="fixtures of 'bench_parsers capture' (default: synthetic pages)"
+    )
+    parser.add_argument("--pages", type=int, default=20, help="number of synthetic 7-day pages")
+    parser.add_argument("--rounds", type=int, default=3, help="timed rounds, the best one counts")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.fixture_dir is None:
+        pages = [synthetic_page(seed) for seed in range(args.pages)]
+    else:
+        pages = [c_args[1] for c_args, _ in load_calls("DAUM", args.fixture_dir)]
+    title_regex = re.compile(daum.DAUM.title_regex)
+
+    results, elapsed = [], []
+    for parse in (epgs_of_days_select, daum.epgs_of_days):
+        best = float("inf")
+        for _ in range(args.rounds):
+            stime = timer()
+            programs = []
+            for page in pages:
+                try:
+                    programs.append(parse("bench.daum", page, title_regex))
+                except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+                    programs.append(type(e).__name__)
+            best = min(best, timer() - stime)
+        results.append(programs)
+        elapsed.append(best)
+
+    num_programs = sum(len(x) for x in results[0] if isinstance(x, list))
+    same = sum(a == b for a, b in zip(*results))
+    print(f"{'':>12} {'pages/s':>9} {'prog/s':>10}")
+    for name, seconds in zip(("select", "single-pass"), elapsed):
+        print(f"{name:>12} {len(pages) / seconds:>9.1f} {num_programs / seconds:>10.1f}")
+    print(f"speedup {elapsed[0] / elapsed[1]:.2f}x, identical {same}/{len(pages)}")
+    return 0 if same == len(pages) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+import argparse
+import gzip
+import json
+import random
+import sys
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import List, Optional, Tuple
+from unittest.mock import patch
+
+from epg2xml import utils
+from epg2xml.replay import archive_path
+from scripts.bench_parse_workers import synthetic_kt_pages
+
+# (body, Content-Type) of a response
+Payload = Tuple[str, Optional[str]]
+
+
+def recorded_payloads(archive_dir: Path, providers: List[str]) -> List[Payload]:
+    """Response bodies of archives written by 'epg2xml run --record DIR'."""
+    payloads = []
+    for name in providers:
+        try:
+            with gzip.open(archive_path(archive_dir, name), "rt", encoding="utf-8") as fp:
+                for line in fp:
+                    record = json.loads(line)
+                    if "text" in record:
+                        headers = {k.lower(): v for k, v in record["headers"].items()}
+                        payloads.append((record["text"], headers.get("content-type")))
+        except FileNotFoundError:
+            pass
+    return payloads
+
+
+def synthetic_payloads(num: int, seed: int = 0) -> List[Payload]:
+    """Large JSON pages like WAVVE's limit=500 ones, mixed with HTML pages like KT's."""
+    rng = random.Random(seed)
+    payloads = []
+    for n in range(num):
+        items = [
+            {
+                "channelid": f"K{n:02d}",
+                "starttime": f"2024-01-01 {h % 24:02d}:{m:02d}",
+                "title": rng.choice(["뉴스", "주말 드라마", "세계의 명소"]),
+                "targetage": rng.choice(["0", "12", "15"]),
+                "list": [{"programid": str(rng.randrange(10**6))} for _ in range(3)],
+            }
+            for h in range(24)
+            for m in (0, 20, 40)
+        ]
+        payloads.append((json.dumps({"list": items * 7}, ensure_ascii=False), "application/json;charset=UTF-8"))
+    payloads.extend((c_args[1], "text/html;charset=UTF-8") for c_args, _ in synthetic_kt_pages(num))
+    return payloads
+
+
+def decode_always(text: str, content_type: Optional[str] = None) -> object:
+    """The decoding before: a stdlib JSON parse tried on every body, HTML included."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_json",
+        description="Compare response decoding: always stdlib JSON, content-type aware, and with orjson",
+    )
+    parser.add_argument(
+        "archive_dir", type=Path, nargs="?", help="archives of 'epg2xml run --record' (default: synthetic payloads)"
+    )
+    parser.add_argument("--providers", nargs="+", type=str.upper, default=["WAVVE", "KBS", "SPOTV", "KT", "DAUM"])
+    parser.add_argument("--pages", type=int, default=50, help="number of synthetic JSON and HTML pages each")
+    parser.add_argument("--rounds", type=int, default=3, help="timed rounds, the best one counts")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.archive_dir is None:
+        payloads = synthetic_payloads(args.pages)
+    else:
+        payloads = recorded_payloads(args.archive_dir, args.providers)
+    if not payloads:
+        print("No recorded responses found", file=sys.stderr)
+        return 1
+
+    variants = [("always json", decode_always, None)]
+    variants.append(("content-type", utils.decode_body, patch.object(utils, "orjson", None)))
+    if utils.orjson is not None:
+        variants.append(("+ orjson", utils.decode_body, None))
+
+    size = sum(len(text.encode("utf-8")) for text, _ in payloads) / 1e6
+    print(f"{len(payloads)} responses, {size:.1f} MB")
+    print(f"{'':>14} {'MB/s':>8} {'speedup':>8} identical")
+    results, base = None, None
+    for name, decode, context in variants:
+        best = float("inf")
+        for _ in range(args.rounds):
+            if context is not None:
+                context.start()
+            try:
+                stime = timer()
+                decoded = [decode(text, content_type) for text, content_type in payloads]
+                best = min(best, timer() - stime)
+            finally:
+                if context is not None:
+                    context.stop()
+        results, base = results or decoded, base or best
+        print(f"{name:>14} {size / best:>8.1f} {base / best:>7.2f}x {decoded == results}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+import argparse
+import re
+import sys
+from pathlib import Path
+from timeit import default_timer as timer
+from unittest.mock import patch
+from urllib.parse import unquote
+
+from epg2xml.providers import kt
+from scripts.bench_parse_workers import load_calls, synthetic_kt_pages
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_kt_extract",
+        description="Compare the html.parser fast path for KT schedule pages against bs4",
+    )
+    parser.add_argument(
+        "fixture_dir", type=Path, nargs="?", help="fixtures of 'bench_parsers capture' (default: synthetic KT pages)"
+    )
+    parser.add_argument("--pages", type=int, default=400, help="number of synthetic pages")
+    parser.add_argument("--rounds", type=int, default=3, help="timed rounds, the best one counts")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.fixture_dir is None:
+        calls = synthetic_kt_pages(args.pages)
+    else:
+        calls = load_calls("KT", args.fixture_dir)
+    pages = [unquote(c_args[1]) for c_args, _ in calls]
+
+    results, elapsed = [], []
+    for extract in (kt.schedule_rows_bs4, kt.ScheduleTableParser.rows_of):
+        best = float("inf")
+        for _ in range(args.rounds):
+            stime = timer()
+            rows = []
+            for page in pages:
+                try:
+                    rows.append(extract(page))
+                except (kt.UnexpectedMarkup, IndexError, ValueError) as e:
+                    rows.append(type(e).__name__)
+            best = min(best, timer() - stime)
+        results.append(rows)
+        elapsed.append(best)
+
+    fallbacks = sum(x == "UnexpectedMarkup" for x in results[1])
+    same = sum(a == b for a, b in zip(*results) if b != "UnexpectedMarkup")
+    num_programs = sum(len(p) for rows in results[0] if isinstance(rows, list) for _, p in rows)
+    print(f"{'':>12} {'pages/s':>9} {'prog/s':>10}")
+    for name, seconds in zip(("bs4", "html.parser"), elapsed):
+        print(f"{name:>12} {len(pages) / seconds:>9.1f} {num_programs / seconds:>10.1f}")
+    print(f"speedup {elapsed[0] / elapsed[1]:.2f}x, identical {same}/{len(pages) - fallbacks}, fallbacks {fallbacks}")
+
+    # The full parser on top of both should agree as well.
+    title_regex = re.compile(kt.KT.title_regex)
+    for (c_args, _), rows in zip(calls, results[0]):
+        if isinstance(rows, list):
+            channelid, data, day = c_args
+            assert kt.epgs_of_day(channelid, data, day, title_regex) == _programs_bs4(channelid, data, day, title_regex)
+    return 0 if same == len(pages) - fallbacks else 1
+
+
+def _programs_bs4(channelid, data, day, title_regex):
+    with patch.object(kt.ScheduleTableParser, "rows_of", side_effect=kt.UnexpectedMarkup):
+        return kt.epgs_of_day(channelid, data, day, title_regex)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+import argparse
+import gzip
+import os
+import pickle
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from multiprocessing import get_context
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import Any, List, Tuple
+
+from scripts.bench_parsers import PARSERS, fixture_path, mangled
+from scripts.check_provider import build_provider
+
+# Providers whose parsers can run in worker processes, see EPGProvider.parse.
+PROVIDERS = ("KT", "NAVER", "DAUM")
+
+
+def synthetic_kt_pages(num: int, seed: int = 0) -> List[Tuple[tuple, dict]]:
+    """Parser inputs shaped like KT daily schedule pages, for when no captured fixture is at hand."""
+    rng = random.Random(seed)
+    calls = []
+    for n in range(num):
+        rows = []
+        for hour in range(24):
+            progs = [(f"{m:02d}", rng.choice(["뉴스", "드라마 (2부)", "다큐 스페셜"])) for m in (0, 20, 40)]
+            cells = [
+                "".join(f"<p>{m}</p>" for m, _ in progs),
+                "".join(f'<p>{t}<img alt="{rng.choice([0, 12, 15])}세 이상 시청 가능" src="x.png"/></p>' for _, t in progs),
+                "".join("<p>교양</p>" for _ in progs),
+            ]
+            rows.append(f"<tr><td>{hour:02d}</td>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+        page = "<html><body><table><tbody>" + "".join(rows) + "</tbody></table></body></html>"
+        calls.append(((f"{n}.kt", page, date(2024, 1, 1)), {}))
+    return calls
+
+
+def load_calls(provider_name: str, fixture_dir: Path) -> List[Tuple[tuple, dict]]:
+    with gzip.open(fixture_path(fixture_dir, provider_name), "rb") as fp:
+        return [pickle.loads(x) for x in pickle.load(fp)["calls"]]
+
+
+def bench(provider_name: str, calls: List[Tuple[tuple, dict]], workers: int, threads: int) -> Tuple[float, int]:
+    provider = build_provider(provider_name)
+    parse = getattr(provider, mangled(provider, PARSERS[provider_name]))
+
+    def call(args_kwargs: Tuple[tuple, dict]) -> Any:
+        args, kwargs = args_kwargs
+        return parse(*args, **kwargs)
+
+    pool = None
+    if workers:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        # Start the workers before timing, as a run would have done while fetching the first pages.
+        list(pool.map(abs, range(workers * 4)))
+        provider.parse_pool = pool
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as exe:
+            stime = timer()
+            num_programs = sum(len(x) for x in exe.map(call, calls))
+            elapsed = timer() - stime
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return elapsed, num_programs
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_parse_workers",
+        description="Parse throughput of HTML providers by number of --parse-workers processes",
+    )
+    parser.add_argument(
+        "fixture_dir", type=Path, nargs="?", help="fixtures of 'bench_parsers capture' (default: synthetic KT pages)"
+    )
+    parser.add_argument("--providers", nargs="+", type=str.upper, choices=PROVIDERS, default=list(PROVIDERS))
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--threads", type=int, default=8, help="fetching threads handing pages to the parser")
+    parser.add_argument("--pages", type=int, default=400, help="number of synthetic pages")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.fixture_dir is None:
+        inputs = {"KT": synthetic_kt_pages(args.pages)}
+    else:
+        inputs = {
+            name: load_calls(name, args.fixture_dir)
+            for name in args.providers
+            if fixture_path(args.fixture_dir, name).exists()
+        }
+
+    print(f"{'':>6} {'workers':>7} {'pages':>6} {'pages/s':>9} {'prog/s':>10} {'speedup':>8}")
+    for provider_name, calls in inputs.items():
+        base = None
+        for workers in sorted(set(args.workers)):
+            elapsed, num_programs = bench(provider_name, calls, workers, args.threads)
+            base = base or elapsed
+            print(
+                f"{provider_name:>6} {workers:>7d} {len(calls):>6d} {len(calls) / elapsed:>9.1f} "
+                f"{num_programs / elapsed:>10.1f} {base / elapsed:>7.2f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
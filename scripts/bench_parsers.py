@@ -0,0 +1,233 @@
+import argparse
+import gc
+import gzip
+import json
+import pickle
+import platform
+import sys
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import Any, Dict, List
+
+from epg2xml import __version__
+from epg2xml.replay import ReplaySession, archive_path, request_key
+from scripts.check_provider import build_provider
+
+# Private parser of each provider, called with recorded inputs.
+PARSERS = {
+    "KT": "__epgs_of_day",
+    "NAVER": "__epgs_of_day",
+    "DAUM": "__epgs_of_days",
+    "TVING": "__epgs_of_channel",
+    "KBS": "__epg_of_program",
+    "MBC": "__epg_of_day",
+    "SK": "__epgs_of_day",
+    "SPOTV": "__epgs_of_channel",
+    "WAVVE": "__epg_of_program",
+    "SBS": "__epg_of_program",
+    "LG": "__epgs_of_day",
+}
+
+# Lower is better for these, higher for programs_per_sec.
+COST_METRICS = ("alloc_blocks", "alloc_kib", "peak_kib")
+
+
+def fixture_path(fixture_dir: Path, provider_name: str) -> Path:
+    return fixture_dir.joinpath(f"{provider_name}.pickle.gz")
+
+
+def mangled(provider: Any, method: str) -> str:
+    return f"_{provider.__class__.__name__}{method}"
+
+
+def capture(provider_name: str, archive_dir: Path, fixture_dir: Path, channelfile: Path = None) -> int:
+    """Replay a recorded run of a provider and keep the inputs of each call to its parser."""
+    provider = build_provider(provider_name)
+    provider.sess = ReplaySession(archive_path(archive_dir, provider_name))
+    provider.retry_attempts = 1
+    provider.limiter.max_tps = float("inf")
+    provider.limiter.set_rate(1e6)
+
+    name = mangled(provider, PARSERS[provider_name])
+    parse, request = getattr(provider, name), provider.request
+    calls, responses, depth = [], {}, [0]
+
+    def parse_and_capture(*args, **kwargs):
+        calls.append(pickle.dumps((args, kwargs)))
+        depth[0] += 1
+        try:
+            return parse(*args, **kwargs)
+        finally:
+            depth[0] -= 1
+
+    def request_and_capture(url, method="GET", **kwargs):
+        data = request(url, method=method, **kwargs)
+        # Some parsers (MBC) request on their own, so their answers belong to the fixture too.
+        if depth[0]:
+            responses[request_key(method, url, kwargs.get("params"), kwargs.get("data"))] = data
+        return data
+
+    setattr(provider, name, parse_and_capture)
+    provider.request = request_and_capture
+
+    channeljson = None
+    if channelfile is not None:
+        with open(channelfile, "r", encoding="utf-8") as fp:
+            channeljson = json.load(fp)
+    provider.load_svc_channels(channeljson=channeljson)
+    provider.load_req_channels()
+    provider.get_programs()
+    provider.sess.close()
+
+    with gzip.open(fixture_path(fixture_dir, provider_name), "wb") as fp:
+        pickle.dump({"captured": datetime.now().isoformat(), "calls": calls, "responses": responses}, fp)
+    return len(calls)
+
+
+def bench(provider_name: str, fixture: dict, rounds: int) -> Dict[str, Any]:
+    provider = build_provider(provider_name)
+    parse = getattr(provider, mangled(provider, PARSERS[provider_name]))
+    responses = fixture["responses"]
+    provider.request = lambda url, method="GET", **kwargs: responses.get(
+        request_key(method, url, kwargs.get("params"), kwargs.get("data"))
+    )
+
+    def run_round() -> List[Any]:
+        results = []
+        for args, kwargs in inputs:
+            try:
+                results.append(parse(*args, **kwargs))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                results.append(None)
+        return results
+
+    best = float("inf")
+    for _ in range(rounds):
+        inputs = [pickle.loads(x) for x in fixture["calls"]]
+        gc.collect()
+        stime = timer()
+        results = run_round()
+        best = min(best, timer() - stime)
+
+    num_programs = sum(len(x) if isinstance(x, list) else 1 for x in results if x is not None)
+    num_errors = sum(x is None for x in results)
+    del results
+
+    inputs = [pickle.loads(x) for x in fixture["calls"]]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        # Python 3.8 has no reset_peak(), so restart tracing to drop the snapshot from the peak.
+        tracemalloc.stop()
+        tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    results = run_round()
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    alloc_blocks = sum(x.count_diff for x in after.compare_to(before, "filename"))
+    del results
+
+    return {
+        "calls": len(inputs),
+        "programs": num_programs,
+        "errors": num_errors,
+        "seconds": round(best, 6),
+        "programs_per_sec": round(num_programs / best, 1) if best else 0.0,
+        "alloc_blocks": alloc_blocks,
+        "alloc_kib": round((current - base) / 1024, 1),
+        "peak_kib": round((peak - base) / 1024, 1),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Return a line for every metric that got worse than the baseline by more than threshold."""
+    regressions = []
+    for provider_name, res in results.items():
+        if (base := baseline.get(provider_name)) is None:
+            continue
+        if base["programs_per_sec"] and res["programs_per_sec"] < base["programs_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{provider_name}: programs_per_sec {base['programs_per_sec']} -> {res['programs_per_sec']}"
+            )
+        for metric in COST_METRICS:
+            if base[metric] > 0 and res[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{provider_name}: {metric} {base[metric]} -> {res[metric]}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_parsers",
+        description="Offline benchmark of provider parsers on fixtures captured from recorded traffic",
+    )
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_capture = sub.add_parser("capture", help="build parser fixtures from an archive of 'run --record DIR'")
+    p_capture.add_argument("archive_dir", type=Path)
+    p_capture.add_argument("fixture_dir", type=Path)
+    p_capture.add_argument("--channelfile", type=Path, help="service channels to use instead of recorded ones")
+    p_run = sub.add_parser("run", help="benchmark parsers on captured fixtures")
+    p_run.add_argument("fixture_dir", type=Path)
+    p_run.add_argument("--rounds", type=int, default=5, help="timed rounds, the best one counts")
+    p_run.add_argument("--save-baseline", type=Path, metavar="FILE", help="write results as a baseline JSON")
+    p_run.add_argument("--compare", type=Path, metavar="FILE", help="compare results against a baseline JSON")
+    p_run.add_argument("--threshold", type=float, default=0.1, help="allowed relative regression (default: 0.1)")
+    for p in (p_capture, p_run):
+        p.add_argument("--providers", nargs="+", type=str.upper, choices=list(PARSERS), default=list(PARSERS))
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.cmd == "capture":
+        args.fixture_dir.mkdir(parents=True, exist_ok=True)
+        for provider_name in args.providers:
+            if not archive_path(args.archive_dir, provider_name).exists():
+                continue
+            num_calls = capture(provider_name, args.archive_dir, args.fixture_dir, args.channelfile)
+            print(f"{provider_name:>6}: {num_calls} parser calls captured")
+        return 0
+
+    results = {}
+    print(
+        f"{'':>6} {'calls':>6} {'programs':>8} {'errors':>6} {'prog/s':>10} "
+        f"{'blocks':>8} {'alloc KiB':>10} {'peak KiB':>9}"
+    )
+    for provider_name in args.providers:
+        path = fixture_path(args.fixture_dir, provider_name)
+        if not path.exists():
+            continue
+        with gzip.open(path, "rb") as fp:
+            fixture = pickle.load(fp)
+        res = results[provider_name] = bench(provider_name, fixture, args.rounds)
+        print(
+            f"{provider_name:>6} {res['calls']:>6d} {res['programs']:>8d} {res['errors']:>6d} "
+            f"{res['programs_per_sec']:>10.1f} {res['alloc_blocks']:>8d} {res['alloc_kib']:>10.1f} "
+            f"{res['peak_kib']:>9.1f}"
+        )
+
+    if args.save_baseline:
+        baseline = {
+            "created": datetime.now().isoformat(),
+            "version": __version__,
+            "python": platform.python_version(),
+            "results": results,
+        }
+        args.save_baseline.write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved: {args.save_baseline}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if regressions := compare(results, baseline["results"], args.threshold):
+            print(f"Regressions beyond {args.threshold:.0%} against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
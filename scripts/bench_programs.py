@@ -0,0 +1,91 @@
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from dataclasses import field, fields, make_dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, List
+
+from epg2xml.providers import CAT_KO2EN, EPGProgram
+
+# EPGProgram as it was before: a plain dataclass with a per-instance __dict__ and no interning.
+PlainProgram = make_dataclass("PlainProgram", [(f.name, f.type, field(default=f.default)) for f in fields(EPGProgram)])
+
+
+def parsed_values(num: int, seed: int = 0) -> List[dict]:
+    """Field values as a provider parser would see them: fresh string objects decoded from a response."""
+    rng = random.Random(seed)
+    categories = list(CAT_KO2EN)
+    stime = datetime(2024, 1, 1)
+    values = []
+    for n in range(num):
+        etime = stime + timedelta(minutes=rng.choice([10, 30, 60, 90]))
+        values.append(
+            {
+                "channelid": f"{n % 1000}.bench",
+                "stime": stime,
+                "etime": etime,
+                "title": rng.choice(["뉴스", "주말 드라마", "세계의 명소", "스포츠 중계"]),
+                "ep_num": rng.choice([None, str(rng.randint(1, 200))]),
+                "rating": rng.choice([0, 7, 12, 15, 19]),
+                "categories": [rng.choice(categories)],
+                "extras": rng.sample(["HD", "자막", "수화", "생방송"], rng.randint(0, 2)),
+            }
+        )
+        stime = etime
+    return json.loads(json.dumps(values, default=str, ensure_ascii=False))
+
+
+def build_plain(values: dict) -> Any:
+    prog = PlainProgram(values["channelid"], values["stime"], values["etime"])
+    prog.title, prog.ep_num, prog.rating = values["title"], values["ep_num"], values["rating"]
+    prog.categories = values["categories"] or None
+    prog.extras = values["extras"] or None
+    return prog
+
+
+def build_program(values: dict) -> EPGProgram:
+    prog = EPGProgram(values["channelid"], values["stime"], values["etime"])
+    prog.title, prog.ep_num, prog.rating = values["title"], values["ep_num"], values["rating"]
+    for category in values["categories"]:
+        prog.add_category(category)
+    for extra in values["extras"]:
+        prog.add_extra(extra)
+    return prog
+
+
+def bytes_per_program(build: Callable[[dict], Any], num: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    # Decode the input while tracing, as the programs keep some of its strings and lists alive.
+    values = parsed_values(num)
+    programs = [build(x) for x in values]
+    del values
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del programs
+    return used / num
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_programs",
+        description="Measure memory held per EPGProgram against a plain unslotted dataclass",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    print(f"{'programs':>10} {'plain B/prog':>13} {'EPGProgram B/prog':>18} {'saved':>7}")
+    for size in args.sizes:
+        plain = bytes_per_program(build_plain, size)
+        slotted = bytes_per_program(build_program, size)
+        print(f"{size:>10d} {plain:>13.1f} {slotted:>18.1f} {1 - slotted / plain:>7.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,83 @@
+import argparse
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from timeit import default_timer as timer
+
+import requests
+
+from epg2xml.utils import RateLimiter
+
+
+def start_stub(latency: float) -> ThreadingHTTPServer:
+    """Start a local HTTP server that answers every GET after `latency` seconds."""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            sleep(latency)
+            body = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(url: str, threads: int, num_requests: int, tps: float, burst: int) -> float:
+    local = threading.local()
+
+    @RateLimiter(tps=tps, burst=burst)
+    def fetch():
+        if not hasattr(local, "sess"):
+            local.sess = requests.Session()
+        r = local.sess.get(url, timeout=10)
+        r.raise_for_status()
+        return r.json()
+
+    stime = timer()
+    with ThreadPoolExecutor(max_workers=threads) as exe:
+        for future in [exe.submit(fetch) for _ in range(num_requests)]:
+            future.result()
+    return timer() - stime
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_ratelimit",
+        description="RateLimiter throughput against a local stub server",
+    )
+    parser.add_argument("--tps", type=float, default=20.0, help="target requests per second")
+    parser.add_argument("--burst", type=int, default=1, help="token bucket size")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub response latency in seconds")
+    parser.add_argument("--requests", type=int, default=200, help="requests per run")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 16, 32])
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    server = start_stub(args.latency)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        print(f"tps={args.tps} burst={args.burst} latency={args.latency}s requests={args.requests}")
+        print(f"{'threads':>8} {'elapsed':>9} {'rps':>8} {'of tps':>7}")
+        for threads in args.threads:
+            elapsed = run(url, threads, args.requests, args.tps, args.burst)
+            rps = args.requests / elapsed
+            print(f"{threads:>8d} {elapsed:>8.2f}s {rps:>8.2f} {rps / args.tps:>7.1%}")
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
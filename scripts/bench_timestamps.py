@@ -0,0 +1,58 @@
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+from timeit import default_timer as timer
+from typing import List
+
+from epg2xml.utils import strptime, xmltv_time
+
+# Formats the providers parse for every program.
+FORMATS = ("%Y%m%d%H%M%S", "%Y-%m-%d %H:%M", "%Y%m%d%H:%M:%S", "%Y%m%d", "%Y-%m-%d")
+
+
+def sample_times(num: int, seed: int = 0) -> List[datetime]:
+    """Program start times of a week, as a run sees them."""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    return [base + timedelta(minutes=rng.randrange(7 * 24 * 60)) for _ in range(num)]
+
+
+def best_of(rounds: int, func, items) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        stime = timer()
+        for item in items:
+            func(item)
+        best = min(best, timer() - stime)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_timestamps",
+        description="Compare epg2xml.utils.strptime/xmltv_time against datetime.strptime/strftime",
+    )
+    parser.add_argument("--num", type=int, default=100_000, help="timestamps per format")
+    parser.add_argument("--rounds", type=int, default=3, help="timed rounds, the best one counts")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    times = sample_times(args.num)
+    print(f"{'':>18} {'stdlib/s':>10} {'utils/s':>10} {'speedup':>8} identical")
+    for fmt in FORMATS:
+        texts = [x.strftime(fmt) for x in times]
+        same = all(strptime(x, fmt) == datetime.strptime(x, fmt) for x in texts)
+        base = best_of(args.rounds, lambda x, fmt=fmt: datetime.strptime(x, fmt), texts)
+        fast = best_of(args.rounds, lambda x, fmt=fmt: strptime(x, fmt), texts)
+        print(f"{fmt:>18} {len(texts) / base:>10.0f} {len(texts) / fast:>10.0f} {base / fast:>7.2f}x {same}")
+
+    xmltv_fmt = "%Y%m%d%H%M%S +0900"
+    same = all(xmltv_time(x) == x.strftime(xmltv_fmt) for x in times)
+    base = best_of(args.rounds, lambda x: x.strftime(xmltv_fmt), times)
+    fast = best_of(args.rounds, xmltv_time, times)
+    print(f"{'xmltv_time':>18} {len(times) / base:>10.0f} {len(times) / fast:>10.0f} {base / fast:>7.2f}x {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,54 @@
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import List, Tuple
+
+from epg2xml.providers import EPGProgram
+from epg2xml.xmlcache import FragmentCache
+from scripts.bench_xmltv import CFG, HashSink, sample_programs
+
+
+def programs_of_run(num: int, changed: float) -> List[EPGProgram]:
+    """The programmes of a run, where the given share changed since the previous one."""
+    programs = sample_programs(num)
+    for prog in programs[: int(num * changed)]:
+        prog.title += " (수정)"
+    return programs
+
+
+def write(programs: List[EPGProgram], cache: FragmentCache = None) -> Tuple[float, HashSink]:
+    sink = HashSink()
+    stime = timer()
+    for prog in programs:
+        prog.to_xml(CFG, writer=sink, cache=cache)
+    return timer() - stime, sink
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_xmlcache",
+        description="Time writing programmes with the --xmlcache fragment cache after a previous run",
+    )
+    parser.add_argument("--num", type=int, default=50_000, help="programmes per run")
+    parser.add_argument("--changed", type=float, nargs="+", default=[0.0, 0.05, 0.2], help="share changed since")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    print(f"{'changed':>8} {'render':>8} {'cached':>8} {'speedup':>8} identical")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for changed in args.changed:
+            dbfile = Path(tmpdir) / f"xmlcache-{changed}.db"
+            with FragmentCache(dbfile) as cache:
+                write(programs_of_run(args.num, 0.0), cache)
+
+            elapsed, plain = write(programs_of_run(args.num, changed))
+            with FragmentCache(dbfile) as cache:
+                elapsed_cached, cached = write(programs_of_run(args.num, changed), cache)
+            same = plain.digest.digest() == cached.digest.digest()
+            print(f"{changed:>8.0%} {elapsed:>7.2f}s {elapsed_cached:>7.2f}s {elapsed / elapsed_cached:>7.2f}x {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+import argparse
+import hashlib
+import random
+import sys
+from datetime import datetime, timedelta
+from itertools import cycle, islice
+from timeit import default_timer as timer
+from typing import List
+
+from epg2xml.providers import CAT_KO2EN, EPGProgram
+from epg2xml.xmltv import programme_element, render_programme
+
+CFG = {
+    "ADD_EPNUM_TO_TITLE": True,
+    "ADD_REBROADCAST_TO_TITLE": False,
+    "ADD_DESCRIPTION": True,
+    "ADD_XMLTV_NS": False,
+}
+
+
+class HashSink:
+    """Writer that only digests what it is given, so that both writers pay the same for output."""
+
+    def __init__(self):
+        self.digest = hashlib.blake2b()
+        self.size = 0
+
+    def write(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.digest.update(data)
+        self.size += len(data)
+
+
+def sample_programs(num: int, seed: int = 0) -> List[EPGProgram]:
+    rng = random.Random(seed)
+    categories = list(CAT_KO2EN)
+    stime = datetime(2024, 1, 1)
+    programs = []
+    for n in range(num):
+        etime = stime + timedelta(minutes=rng.choice([10, 30, 60, 90]))
+        prog = EPGProgram(f"{n % 50}.bench", stime, etime)
+        prog.title = rng.choice(["뉴스 & 날씨", "주말 드라마 <특별편> (2부)", "세계의 <명소>", "Live \"Sports\""])
+        prog.title_sub = rng.choice([None, "부제목", "스페셜"])
+        prog.ep_num = rng.choice([None, str(rng.randint(1, 200))])
+        prog.rebroadcast = rng.random() < 0.3
+        prog.rating = rng.choice([0, 7, 12, 15, 19])
+        prog.desc = rng.choice([None, "줄거리 " * rng.randint(5, 40)])
+        prog.poster_url = rng.choice([None, f"https://img.example.com/poster/{n}.jpg?w=300&h=400"])
+        prog.add_category(rng.choice(categories))
+        prog.add_cast(f"배우{rng.randint(1, 99)}" for _ in range(rng.randint(0, 4)))
+        prog.add_crew([f"감독{rng.randint(1, 9)}"], "director")
+        programs.append(prog)
+        stime = etime
+    return programs
+
+
+def write_elementtree(programs, writer) -> None:
+    for prog in programs:
+        writer.write(programme_element(prog.xml_data(CFG)).tostring(level=1))
+        writer.write("\n")
+
+
+def write_direct(programs, writer) -> None:
+    for prog in programs:
+        writer.write(render_programme(prog.xml_data(CFG)))
+        writer.write("\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.bench_xmltv",
+        description="Compare the ElementTree based and the direct XMLTV programme writers",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--pool", type=int, default=2000, help="distinct programmes cycled through")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    pool = sample_programs(args.pool)
+    print(f"{'programmes':>10} {'elementtree':>12} {'direct':>9} {'speedup':>8} {'MB':>8} identical")
+    for size in args.sizes:
+        elapsed, digests = [], []
+        for write in (write_elementtree, write_direct):
+            sink = HashSink()
+            stime = timer()
+            write(islice(cycle(pool), size), sink)
+            elapsed.append(timer() - stime)
+            digests.append(sink.digest.hexdigest())
+        print(
+            f"{size:>10d} {elapsed[0]:>11.2f}s {elapsed[1]:>8.2f}s {elapsed[0] / elapsed[1]:>7.2f}x "
+            f"{sink.size / 1e6:>8.1f} {digests[0] == digests[1]}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
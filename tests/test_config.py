@@ -56,6 +56,9 @@ class DummyYamlModule:
         del allow_unicode, sort_keys
         lines = []
         for section, values in data.items():
+            if not isinstance(values, dict):
+                lines.append(f"{section}: {values}")
+                continue
             lines.append(f"{section}:")
             for key, value in values.items():
                 lines.append(f"  {key}: {value}")
@@ -118,6 +121,33 @@ class TestConfig(unittest.TestCase):
 
         self.assertEqual(strip_json_comments(source), source)
 
+    def test_load_takes_outputs_apart_from_providers(self):
+        outputs = [{"PATH": "plain.xml", "ADD_DESCRIPTION": False, "CHANNELS": ["*.kt"]}]
+        with patch.object(Config, "parse_args", return_value={"cmd": "run"}), patch.object(
+            Config, "get_settings", return_value={}
+        ):
+            config = Config()
+        config.load_with_hidden({**Config.base_config, "OUTPUTS": outputs})
+
+        self.assertEqual(config.outputs, outputs)
+        self.assertNotIn("OUTPUTS", config.configs)
+        self.assertFalse(config.configs["KT"]["ADD_XMLTV_NS"])
+        for invalid in ({}, {"PATH": "a.xml", "ADD_DESC": False}, {"PATH": "a.xml", "CHANNELS": "kt"}):
+            with self.subTest(profile=invalid), self.assertRaises(ValueError):
+                Config.load_outputs([invalid])
+
+    def test_load_checks_refresh_policy_of_each_provider(self):
+        with patch.object(Config, "parse_args", return_value={"cmd": "run"}), patch.object(
+            Config, "get_settings", return_value={}
+        ):
+            config = Config()
+        policy = {"0": "1h", "2+": "12h"}
+        config.load_with_hidden({**Config.base_config, "KT": {"MY_CHANNELS": [], "REFRESH_POLICY": policy}})
+        self.assertEqual(config.configs["KT"]["REFRESH_POLICY"], policy)
+        self.assertIsNone(config.configs["SK"]["REFRESH_POLICY"])
+        with self.assertRaises(ValueError):
+            config.load_with_hidden({**Config.base_config, "KT": {"REFRESH_POLICY": {"0": "soon"}}})
+
     def test_load_json_accepts_comments(self):
         source = '{\n  "a": 1, // comment\n  "url": "http://a//b",\n  /* block */ "b": 2\n}'
 
@@ -223,6 +253,42 @@ class TestConfig(unittest.TestCase):
 
         self.assertTrue(config.settings["parallel"])
 
+    def test_get_settings_coerces_integer_env_values(self):
+        args = {"cmd": "run"}
+        args.update({name: None for name in Config.base_settings})
+        with patch.object(Config, "parse_args", return_value=args), patch.dict(
+            os.environ,
+            {"EPG2XML_HTTP_CACHE_TTL": "600", "EPG2XML_HTTP_CACHE_SIZE": "lots"},
+            clear=False,
+        ):
+            config = Config()
+
+        self.assertEqual(config.settings["http_cache_ttl"], 600)
+        self.assertEqual(config.settings["http_cache_size"], Config.base_settings["http_cache_size"]["default"])
+
+    def test_get_settings_ignores_invalid_choice_env_values(self):
+        args = {"cmd": "run"}
+        args.update({name: None for name in Config.base_settings})
+        with patch.object(Config, "parse_args", return_value=args), patch.dict(
+            os.environ,
+            {"EPG2XML_HTMLPARSER": "html.parser", "EPG2XML_XMLCOMPRESS": "zip"},
+            clear=False,
+        ):
+            config = Config()
+
+        self.assertEqual(config.settings["htmlparser"], "html.parser")
+        self.assertIsNone(config.settings["xmlcompress"])
+
+    def test_get_settings_ignores_resume_without_journal(self):
+        args = {"cmd": "run"}
+        args.update({name: None for name in Config.base_settings})
+        args["resume"] = True
+        with patch.object(Config, "parse_args", return_value=args), self.assertLogs(level="WARNING") as logs:
+            config = Config()
+
+        self.assertFalse(config.settings["resume"])
+        self.assertIn("Ignoring resume without a journal", logs.output[0])
+
     def test_load_creates_missing_yaml_config_and_raises_upgrade_required(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             config_path = Path(tmpdir) / "epg2xml.yaml"
@@ -0,0 +1,229 @@
+import gzip
+import io
+import lzma
+import sys
+import tempfile
+import threading
+import types
+import unittest
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+
+bs4 = types.ModuleType("bs4")
+
+
+class DummyBeautifulSoup:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class DummyFeatureNotFound(Exception):
+    pass
+
+
+bs4.BeautifulSoup = DummyBeautifulSoup
+bs4.FeatureNotFound = DummyFeatureNotFound
+sys.modules.setdefault("bs4", bs4)
+
+from epg2xml.daemon import EPGDaemon
+from epg2xml.providers import EPGChannel, EPGHandler, EPGProgram, EPGProvider
+from epg2xml.utils import AtomicOutput
+
+
+CFG = {
+    "ENABLED": True,
+    "FETCH_LIMIT": 2,
+    "ID_FORMAT": "{ServiceId}.{Source.lower()}",
+    "ADD_REBROADCAST_TO_TITLE": False,
+    "ADD_EPNUM_TO_TITLE": True,
+    "ADD_DESCRIPTION": True,
+    "ADD_XMLTV_NS": False,
+    "ADD_CHANNEL_ICON": True,
+    "HTTP_PROXY": None,
+    "CONCURRENCY": 1,
+    "MAX_TPS": None,
+    "REFRESH_INTERVAL": "1h",
+    "MY_CHANNELS": [],
+}
+
+
+class DummySession:
+    def __init__(self, *args, **kwargs):
+        self.headers = {}
+        self.proxies = {}
+
+    def close(self):
+        pass
+
+
+class FakeProvider(EPGProvider):
+    """Two programs a day on one channel, with titles that tell the refreshes apart."""
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        self.refreshes = 0
+        self.blocker = None
+        self.req_channels = [EPGChannel(f"1.{self.provider_name.lower()}", self.provider_name, "1", "CH")]
+
+    def get_svc_channels(self):
+        return []
+
+    def get_programs(self):
+        if self.blocker is not None:
+            self.blocker.wait(5)
+        self.refreshes += 1
+        ch = self.req_channels[0]
+        stime = datetime(2026, 1, 1, 9)
+        ch.programs.extend(
+            EPGProgram(ch.id, stime + timedelta(hours=h), stime + timedelta(hours=h + 1), f"뉴스 {self.refreshes}")
+            for h in (0, 12)
+        )
+
+
+PROVIDERS = {name: type(name, (FakeProvider,), {}) for name in ("AAA", "BBB")}
+
+
+def load_providers(self, cfgs):
+    del self
+    return [PROVIDERS[name](cfg) for name, cfg in cfgs.items() if cfg["ENABLED"]]
+
+
+class FakeConfig:
+    def __init__(self, tmpdir, **configs):
+        self.configs = {name: dict(CFG, **configs.get(name, {})) for name in PROVIDERS}
+        self.settings = {
+            "channelfile": str(Path(tmpdir) / "Channel.json"),
+            "parallel": False,
+            "xmlfile": str(Path(tmpdir) / "xmltv.xml"),
+            "xmlcompress": None,
+            "xmlcompresslevel": None,
+        }
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for target, kwargs in (
+            ("epg2xml.providers.requests.Session", {"new": DummySession}),
+            ("epg2xml.providers.EPGHandler.load_providers", {"new": load_providers}),
+            ("epg2xml.providers.EPGHandler.load_channels", {}),
+            ("epg2xml.providers.EPGHandler.load_req_channels", {}),
+        ):
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.daemon = EPGDaemon(FakeConfig(self.tmpdir.name))
+        self.daemon.executor = ThreadPoolExecutor(max_workers=2)
+        self.daemon.load()
+
+    def tearDown(self):
+        self.daemon.executor.shutdown()
+        self.tmpdir.cleanup()
+
+    def test_document_is_the_one_run_writes(self):
+        for p in self.daemon.handler.providers:
+            self.daemon.refresh(p)
+
+        handler = EPGHandler(self.daemon.conf.configs)
+        handler.get_programs()
+        expected = io.StringIO()
+        handler.to_xml(writer=expected)
+        self.assertEqual(self.daemon.xml, expected.getvalue())
+        self.assertEqual(Path(self.daemon.conf.settings["xmlfile"]).read_text(encoding="utf-8"), self.daemon.xml)
+
+    def test_readers_get_the_previous_document_during_a_refresh(self):
+        aaa = self.daemon.handler.providers[0]
+        self.daemon.refresh(aaa)
+        previous = self.daemon.snapshot
+
+        aaa.blocker = threading.Event()
+        refresh = threading.Thread(target=self.daemon.refresh, args=(aaa,))
+        refresh.start()
+        self.assertIs(self.daemon.snapshot, previous)
+        aaa.blocker.set()
+        refresh.join(5)
+        self.assertIn("뉴스 2", self.daemon.xml)
+        self.assertNotIn("뉴스 1", self.daemon.xml)
+
+    def test_failed_refresh_keeps_the_previous_programs(self):
+        aaa = self.daemon.handler.providers[0]
+        self.daemon.refresh(aaa)
+        previous = self.daemon.snapshot
+        with patch.object(aaa, "get_programs", side_effect=RuntimeError("network down")):
+            with self.assertLogs(level="ERROR"):
+                self.daemon.refresh(aaa)
+        self.assertIs(self.daemon.snapshot, previous)
+        self.assertEqual(aaa.req_channels[0].programs, [])
+
+    def test_providers_are_refreshed_on_their_own_schedule(self):
+        self.daemon.conf.configs["BBB"]["REFRESH_INTERVAL"] = "10m"
+        self.daemon.load()
+        aaa, bbb = self.daemon.handler.providers
+
+        self.daemon.tick(1000.0)
+        wait(list(self.daemon.running.values()))
+        self.assertEqual((aaa.refreshes, bbb.refreshes), (1, 1))
+        self.assertEqual(self.daemon.tick(1000.0 + 300), 300)
+        self.daemon.tick(1000.0 + 600)
+        wait(list(self.daemon.running.values()))
+        self.assertEqual((aaa.refreshes, bbb.refreshes), (1, 2))
+        self.assertEqual(self.daemon.tick(1000.0 + 600), 600)
+
+    def test_reload_keeps_providers_whose_config_did_not_change(self):
+        for p in self.daemon.handler.providers:
+            self.daemon.refresh(p)
+        aaa = self.daemon.handler.providers[0]
+        self.daemon.reload_config = lambda: FakeConfig(self.tmpdir.name, BBB={"ENABLED": False})
+        self.daemon.request_reload()
+        self.daemon.reload()
+
+        self.assertEqual(self.daemon.handler.providers, [aaa])
+        self.assertFalse(self.daemon.reload_requested.is_set())
+        self.assertIn('"1.aaa"', self.daemon.xml)
+        self.assertNotIn('"1.bbb"', self.daemon.xml)
+        self.assertEqual(self.daemon.tick(0.0), 3600)
+
+    def test_xmlfile_is_written_from_the_snapshot_outside_the_publish_lock(self):
+        locked = []
+
+        def atomic_output(path):
+            locked.append(self.daemon.publish_lock.locked())
+            return AtomicOutput(path)
+
+        settings = self.daemon.conf.settings
+        for name, compressed in (
+            ("xmltv.xml.gz", lambda snapshot: snapshot.gzipped),
+            ("xmltv.xml.xz", lambda snapshot: lzma.compress(snapshot.body)),
+        ):
+            settings["xmlfile"] = str(Path(self.tmpdir.name) / name)
+            with self.subTest(name), patch("epg2xml.daemon.AtomicOutput", atomic_output):
+                self.daemon.refresh(self.daemon.handler.providers[0])
+                self.assertEqual(Path(settings["xmlfile"]).read_bytes(), compressed(self.daemon.snapshot))
+        self.assertEqual(gzip.decompress(self.daemon.snapshot.gzipped), self.daemon.snapshot.body)
+        self.assertEqual(locked, [False, False])
+
+    def test_reload_resizes_the_refresh_workers(self):
+        self.daemon.start_executor()
+        executor = self.daemon.executor
+        self.daemon.reload_config = lambda: FakeConfig(self.tmpdir.name)
+        self.daemon.reload()
+        self.assertIs(self.daemon.executor, executor)
+
+        def parallel():
+            conf = FakeConfig(self.tmpdir.name)
+            conf.settings["parallel"] = True
+            return conf
+
+        self.daemon.reload_config = parallel
+        self.daemon.reload()
+        self.assertIsNot(self.daemon.executor, executor)
+        self.assertEqual(self.daemon.executor_workers, 2)
+        with self.assertRaises(RuntimeError):
+            executor.submit(print)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import os
+import sys
+import tempfile
+import time
+import types
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+bs4 = types.ModuleType("bs4")
+
+
+class DummyBeautifulSoup:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class DummyFeatureNotFound(Exception):
+    pass
+
+
+bs4.BeautifulSoup = DummyBeautifulSoup
+bs4.FeatureNotFound = DummyFeatureNotFound
+sys.modules.setdefault("bs4", bs4)
+
+from epg2xml.httpcache import HTTPCache
+from epg2xml.providers import EPGProvider
+
+
+CFG = {
+    "ENABLED": True,
+    "FETCH_LIMIT": 2,
+    "ID_FORMAT": "{ServiceId}.{Source.lower()}",
+    "ADD_REBROADCAST_TO_TITLE": False,
+    "ADD_EPNUM_TO_TITLE": True,
+    "ADD_DESCRIPTION": True,
+    "ADD_XMLTV_NS": False,
+    "ADD_CHANNEL_ICON": True,
+    "HTTP_PROXY": None,
+    "CONCURRENCY": 1,
+    "MAX_TPS": None,
+    "MY_CHANNELS": [],
+}
+
+
+class FAKE(EPGProvider):
+    def get_svc_channels(self):
+        return []
+
+    def get_programs(self):
+        raise NotImplementedError
+
+
+class DummyResponse:
+    def __init__(self, text="", status_code=200, headers=None):
+        self.text = text
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        return None
+
+
+class DummySession:
+    def __init__(self, responses):
+        self.headers = {}
+        self.proxies = {}
+        self.calls = []
+        self.responses = list(responses)
+
+    def request(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0)
+
+
+class TestHTTPCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache_dir = Path(self.tmpdir.name) / "cache"
+
+    def make_provider(self, responses, **cache_kwargs):
+        session = DummySession(responses)
+        with patch("epg2xml.providers.requests.Session", return_value=session):
+            provider = FAKE(dict(CFG, MAX_TPS=1000.0))
+        provider.limiter.set_rate(1000.0)
+        provider.http_cache = HTTPCache(self.cache_dir, **cache_kwargs)
+        return provider, session
+
+    def test_request_key_ignores_params_order(self):
+        self.assertEqual(
+            HTTPCache.request_key("get", "https://a", {"x": 1, "y": 2}),
+            HTTPCache.request_key("GET", "https://a", {"y": 2, "x": 1}),
+        )
+        self.assertNotEqual(
+            HTTPCache.request_key("GET", "https://a", {"x": 1}),
+            HTTPCache.request_key("GET", "https://a", {"x": 2}),
+        )
+
+    def test_fresh_entry_is_served_without_request(self):
+        provider, session = self.make_provider([DummyResponse('{"a": 1}')], ttl=3600)
+
+        self.assertEqual(provider.request("https://example.com", params={"d": 1}), {"a": 1})
+        self.assertEqual(provider.request("https://example.com", params={"d": 1}), {"a": 1})
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(provider.http_cache.stats["hits"], 1)
+
+    def test_stale_entry_is_revalidated_and_304_served_from_disk(self):
+        first = DummyResponse('{"a": 1}', headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+        provider, session = self.make_provider([first, DummyResponse(status_code=304)])
+
+        provider.request("https://example.com")
+        with patch.object(provider.http_cache, "get", wraps=provider.http_cache.get) as get:
+            self.assertEqual(provider.request("https://example.com"), {"a": 1})
+        get.assert_called_once()
+
+        self.assertEqual(session.calls[1]["headers"]["If-None-Match"], '"v1"')
+        self.assertEqual(session.calls[1]["headers"]["If-Modified-Since"], "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.assertEqual(provider.http_cache.stats["revalidated"], 1)
+
+    def test_304_headers_renew_the_entry(self):
+        first = DummyResponse('"v1 body"', headers={"ETag": '"v1"', "Content-Type": "application/json"})
+        renewed = DummyResponse(status_code=304, headers={"ETag": '"v2"', "Cache-Control": "max-age=600"})
+        provider, session = self.make_provider([first, renewed])
+
+        self.assertEqual(provider.request("https://example.com"), "v1 body")
+        self.assertEqual(provider.request("https://example.com"), "v1 body")
+        self.assertEqual(provider.request("https://example.com"), "v1 body")
+
+        self.assertEqual(len(session.calls), 2)
+        self.assertEqual(provider.http_cache.stats, {"misses": 1, "revalidated": 1, "hits": 1})
+        entry = provider.http_cache.get("GET", "https://example.com")
+        self.assertEqual((entry.etag, entry.content_type), ('"v2"', "application/json"))
+        self.assertAlmostEqual(entry.expires - entry.stored, 600)
+
+    def test_expires_sets_the_lifetime(self):
+        cache = HTTPCache(self.cache_dir)
+        headers = {"Date": "Mon, 01 Jan 2024 00:00:00 GMT", "Expires": "Mon, 01 Jan 2024 00:02:00 GMT"}
+        cache.put("GET", "https://example.com", None, DummyResponse("x", headers=headers))
+
+        entry = cache.get("GET", "https://example.com")
+        self.assertAlmostEqual(entry.expires - entry.stored, 120)
+
+    def test_no_store_and_unvalidated_responses_are_not_kept(self):
+        responses = [
+            DummyResponse("x", headers={"ETag": '"v1"', "Cache-Control": "no-store"}),
+            DummyResponse("y"),
+        ]
+        provider, _ = self.make_provider(responses)
+
+        provider.request("https://example.com/1")
+        provider.request("https://example.com/2")
+
+        self.assertEqual(list(self.cache_dir.iterdir()), [])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = HTTPCache(self.cache_dir, ttl=3600, max_size=25)
+        for n, stamp in enumerate([100, 300, 200]):
+            cache.put("GET", f"https://example.com/{n}", None, DummyResponse("0123456789"))
+            os.utime(self.cache_dir / f"{HTTPCache.request_key('GET', f'https://example.com/{n}')}.body", (stamp, stamp))
+        cache.put("GET", "https://example.com/3", None, DummyResponse("0123456789"))
+
+        self.assertIsNone(cache.get("GET", "https://example.com/0"))
+        self.assertIsNone(cache.get("GET", "https://example.com/2"))
+        self.assertIsNotNone(cache.get("GET", "https://example.com/1"))
+        self.assertIsNotNone(cache.get("GET", "https://example.com/3"))
+        self.assertLessEqual(cache.size, 25)
+
+    def test_max_age_extends_ttl(self):
+        cache = HTTPCache(self.cache_dir)
+        cache.put("GET", "https://example.com", None, DummyResponse("x", headers={"Cache-Control": "max-age=60"}))
+
+        entry = cache.get("GET", "https://example.com")
+        self.assertTrue(entry.fresh)
+        self.assertAlmostEqual(entry.expires - entry.stored, 60)
+        self.assertLess(entry.stored, time.time() + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import sys
+import tempfile
+import time
+import types
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+from unittest.mock import patch
+
+
+bs4 = types.ModuleType("bs4")
+
+
+class DummyBeautifulSoup:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class DummyFeatureNotFound(Exception):
+    pass
+
+
+bs4.BeautifulSoup = DummyBeautifulSoup
+bs4.FeatureNotFound = DummyFeatureNotFound
+sys.modules.setdefault("bs4", bs4)
+
+from epg2xml.journal import Journal
+from epg2xml.providers import EPGProgram
+
+
+def make_programs(channelid="1.fake"):
+    prog = EPGProgram(channelid, datetime(2024, 1, 1, 6), title="뉴스", rating=15)
+    prog.add_cast(["배우"])
+    prog.add_crew(["감독"], "연출")
+    return [prog]
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dbfile = Path(self.tmpdir.name) / "journal.db"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_units_come_back_with_their_programs_on_resume(self):
+        with Journal(self.dbfile) as journal:
+            journal.put("KT", "1.fake", (date(2024, 1, 1),), make_programs())
+            self.assertIsNone(journal.get("KT", "1.fake", (date(2024, 1, 1),)))
+
+        with Journal(self.dbfile, resume=True) as journal:
+            records = journal.get("KT", "1.fake", (date(2024, 1, 1),))
+            self.assertEqual([EPGProgram(*x) for x in records], make_programs())
+            self.assertIsNone(journal.get("KT", "1.fake", (date(2024, 1, 2),)))
+            self.assertIsNone(journal.get("MBC", "1.fake", (date(2024, 1, 1),)))
+        self.assertEqual(journal.stats["resumed"], 1)
+
+    def test_journal_starts_over_unless_resumed(self):
+        with Journal(self.dbfile) as journal:
+            journal.put("KT", "1.fake", (), make_programs())
+        with Journal(self.dbfile):
+            pass
+        with Journal(self.dbfile, resume=True) as journal:
+            self.assertIsNone(journal.get("KT", "1.fake", ()))
+
+    def test_stale_or_cleared_units_are_fetched_again(self):
+        with Journal(self.dbfile) as journal:
+            journal.put("KT", "1.fake", (), make_programs())
+            journal.put("KT", "2.fake", (), make_programs("2.fake"))
+        with patch("epg2xml.journal.time.time", return_value=time.time() + 7 * 3600):
+            with Journal(self.dbfile, resume=True) as journal:
+                self.assertIsNone(journal.get("KT", "1.fake", ()))
+
+        with Journal(self.dbfile) as journal:
+            journal.put("KT", "1.fake", (), make_programs())
+            journal.clear()
+        with Journal(self.dbfile, resume=True) as journal:
+            self.assertIsNone(journal.get("KT", "1.fake", ()))
+
+
+if __name__ == "__main__":
+    unittest.main()
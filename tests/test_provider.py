@@ -1,10 +1,17 @@
+import importlib
 import io
+import re
 import sys
 import tempfile
+import threading
+import time
 import types
 import unittest
 import warnings
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from importlib.util import find_spec
+from multiprocessing import get_context
 from pathlib import Path
 from typing import Any
 from unittest.mock import patch
@@ -21,17 +28,39 @@ class DummyFeatureNotFound(Exception):
     pass
 
 
+class DummySoupStrainer:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
 bs4.BeautifulSoup = DummyBeautifulSoup
 bs4.FeatureNotFound = DummyFeatureNotFound
+bs4.SoupStrainer = DummySoupStrainer
 sys.modules.setdefault("bs4", bs4)
+# Another test module may have installed its stub first.
+vars(sys.modules["bs4"]).setdefault("SoupStrainer", DummySoupStrainer)
 
 import epg2xml.providers as providers_module
-from epg2xml.providers import Credit, EPGChannel, EPGHandler, EPGProgram, EPGProvider, SQLite
+from epg2xml.journal import Journal
+from epg2xml.providers import (
+    ChannelEnded,
+    Credit,
+    EPGChannel,
+    EPGHandler,
+    EPGProgram,
+    EPGProvider,
+    OutputProfile,
+    SQLite,
+    daum,
+    kt,
+    naver,
+    no_endtime,
+)
 from epg2xml.providers.all import get_provider_spec
 from epg2xml.providers.mbc import MBC
 from epg2xml.providers.spotv import SPOTV
 from epg2xml.providers.wavve import WAVVE
-from epg2xml.utils import time_to_td
+from epg2xml.utils import html_parser_backend, json_loads, time_to_td
 
 CFG = {
     "ENABLED": True,
@@ -43,6 +72,8 @@ CFG = {
     "ADD_XMLTV_NS": False,
     "ADD_CHANNEL_ICON": True,
     "HTTP_PROXY": None,
+    "CONCURRENCY": 1,
+    "MAX_TPS": None,
     "MY_CHANNELS": [],
 }
 
@@ -61,6 +92,51 @@ class FAKE(EPGProvider):
         raise NotImplementedError
 
 
+class FetchingProvider(FAKE):
+    """Two hourly programs a day per channel without endtimes, fetched day by day."""
+
+    def __init__(self, cfg, wait=None):
+        self.wait = wait or {}
+        super().__init__(cfg)
+
+    @no_endtime
+    def get_programs(self):
+        self.fetch_programs(((ch, day) for ch in self.req_channels for day in (1, 2)), self.fetch_day)
+
+    def fetch_day(self, ch, day):
+        if (event := self.wait.get((ch.id, day))) is not None and not event.wait(5):
+            raise TimeoutError(f"{ch.id} was not streamed before fetching day {day}")
+        return [EPGProgram(ch.id, stime=datetime(2026, 1, day, hour), title=f"{ch.name}{day}") for hour in (9, 21)]
+
+
+class DailyProvider(FAKE):
+    """Like FetchingProvider, but over dates from today as the per-day providers do."""
+
+    def __init__(self, cfg):
+        self.fetched = []
+        super().__init__(cfg)
+
+    @no_endtime
+    def get_programs(self):
+        days = [date.today() + timedelta(days=nd) for nd in range(3)]
+        self.fetch_programs(((ch, day) for ch in self.req_channels for day in days), self.fetch_day)
+
+    def fetch_day(self, ch, day):
+        self.fetched.append((ch.id, (day - date.today()).days))
+        stime = datetime.combine(day, datetime.min.time())
+        return [EPGProgram(ch.id, stime=stime + timedelta(hours=h), title=f"{ch.name}{h}") for h in (9, 21)]
+
+
+def parse_fake_day(channelid, day):
+    programs = []
+    for hour in (9, 21):
+        prog = EPGProgram(channelid, stime=datetime(2026, 1, day, hour), title=f"{channelid} {hour}")
+        prog.add_category("뉴스")
+        prog.add_cast(["배우"])
+        programs.append(prog)
+    return programs
+
+
 class FakeHandlerProvider:
     def __init__(self, error=None):
         self.error = error
@@ -97,25 +173,28 @@ class DummySession:
 
 
 class DummyResponse:
+    text = '{"ok": true}'
+    headers = {"Content-Type": "application/json; charset=utf-8"}
+
     def raise_for_status(self):
         return None
 
-    def json(self):
-        return {"ok": True}
-
 
 class DummyTextResponse(DummyResponse):
     text = "plain text response"
+    headers = {"Content-Type": "text/plain"}
+
 
-    def json(self):
-        raise ValueError("not json")
+class DummyHtmlResponse(DummyResponse):
+    text = "<html><body>[편성표]</body></html>"
+    headers = {"Content-Type": "text/html; charset=utf-8"}
 
 
 class FakeXmlProvider:
-    def write_channels(self, writer=None):
+    def write_channels(self, writer=None, outputs=()):
         writer.write('  <channel id="fake"></channel>\n')
 
-    def write_programs(self, writer=None):
+    def write_programs(self, writer=None, outputs=()):
         writer.write('  <programme channel="fake"></programme>\n')
 
 
@@ -130,6 +209,95 @@ class FakeCacheProvider:
         return None
 
 
+def load_real_bs4():
+    """The installed bs4, which the stub above may be shadowing in sys.modules."""
+    stub = sys.modules.pop("bs4", None)
+    try:
+        return importlib.import_module("bs4")
+    except ImportError:
+        return None
+    finally:
+        if stub is not None:
+            sys.modules["bs4"] = stub
+
+
+real_bs4 = load_real_bs4()
+
+
+def daum_epgs_of_days_select(channelid, data, title_regex, soup_class, currdate):
+    """The DAUM parser before it walked the table once, selecting each day column with CSS selectors."""
+    soup = soup_class(data)
+    days = soup.select('div[class="tbl_head head_type2"] > span > span[class="date"]')
+    basedate = datetime.strptime(days[0].text.strip(), "%m.%d").replace(year=currdate.year)
+    if (basedate - currdate).days > 0:
+        basedate = basedate.replace(year=basedate.year - 1)
+
+    _epgs = []
+    for nd, _ in enumerate(days):
+        hours = soup.select(f'[id="tvProgramListWrap"] > table > tbody > tr > td:nth-of-type({nd+1})')
+        for nh, hour in enumerate(hours):
+            for dl in hour.select("dl"):
+                _epg = EPGProgram(channelid)
+                nm = int(dl.select("dt")[0].text.strip())
+                _epg.stime = basedate + timedelta(days=nd, hours=nh, minutes=nm)
+                for atag in dl.select("dd > a"):
+                    _epg.title = atag.text.strip()
+                for span in dl.select("dd > span"):
+                    class_val = " ".join(span["class"])
+                    if class_val == "":
+                        _epg.title = span.text.strip()
+                    elif "ico_re" in class_val:
+                        _epg.rebroadcast = True
+                    elif "ico_rate" in class_val:
+                        _epg.rating = int(class_val.split("ico_rate")[1].strip())
+                    else:
+                        _epg.add_extra(span.text)
+                if m := title_regex.search(_epg.title):
+                    _epg.title = m.group("title")
+                    _epg.part_num = m.group("part")
+                    _epg.ep_num = m.group("epnum")
+                    _epg.title_sub = m.group("subname2") or m.group("subname1")
+                    if _epg.part_num:
+                        _epg.title += f" {_epg.part_num}부"
+                _epgs.append(_epg)
+    return _epgs
+
+
+def daum_page(dates):
+    """A DAUM timetable of the given "%m.%d" dates, with programs at a few hours of each day."""
+    cells = {
+        0: "<dl><dt>05</dt><dd><a href='#'>심야 뉴스</a><span class=\"ico_re\">재</span></dd></dl>",
+        9: (
+            "<dl><dt>00</dt><dd><a href='#'>아침 드라마 2부 &lt;첫 만남&gt; 12회</a>"
+            '<span class="ico_rate 15">15</span><span class="ico_hd">HD</span></dd></dl>'
+            "<dl><dt>40</dt><dd><span class=\"\">시사 매거진 &lt;특집&gt;</span>"
+            '<span class="ico_live">생</span></dd></dl>'
+        ),
+        23: "<dl><dt>30</dt><dd><a href='#'>영화</a><span class=\"ico_rate 19\">19</span></dd></dl>",
+    }
+    heads = "".join(f'<span><span class="date">{d}</span></span>' for d in dates)
+    rows = "".join(
+        "<tr>" + "".join(f"<td>{cells.get(nh, '')}</td>" for _ in dates) + "</tr>" for nh in range(24)
+    )
+    return (
+        '<html><body><div disp-attr="B3T">'
+        f'<div class="tbl_head head_type2">{heads}</div>'
+        f'<div id="tvProgramListWrap"><table><tbody>{rows}</tbody></table></div>'
+        "</div></body></html>"
+    )
+
+
+NAVER_ITEMS = [
+    (
+        '<li class="list on"><div><div>06:00</div><div><div><span class="ico_age">15세</span>'
+        '<span class="re">재</span><span class="ico_hd"> HD </span></div></div>'
+        "<div>&amp;lt;특집&amp;gt; 아침 &amp; 뉴스</div><div> 첫 회 </div></div></li>"
+    ),
+    '<li class="list_head"><div>편성표</div></li>',
+    '<li class="list"><div><div>07:30</div><div><div></div></div><div>영화</div></div></li>',
+]
+
+
 class FixedDateTime(datetime):
     @classmethod
     def now(cls, tz=None):
@@ -262,6 +430,56 @@ class TestProvider(unittest.TestCase):
         self.assertEqual(len(session.calls), provider.retry_attempts)
         self.assertEqual(sleep.call_count, provider.retry_attempts - 1)
 
+    def test_request_backs_off_and_honors_retry_after_on_429(self):
+        throttled = DummyResponse()
+        throttled.status_code = 429
+        throttled.headers = {"Retry-After": "7"}
+        session = DummySession()
+        session.responses = [
+            providers_module.requests.exceptions.HTTPError("429 Too Many Requests", response=throttled),
+            DummyResponse(),
+        ]
+        with patch("epg2xml.providers.requests.Session", return_value=session):
+            provider = FAKE(dict(CFG, MAX_TPS=4.0))
+
+        with patch("epg2xml.providers.time.sleep") as sleep:
+            response = provider.request("https://example.com")
+
+        self.assertEqual(response, {"ok": True})
+        self.assertEqual(sleep.call_args_list[0].args[0], 7.0)
+        self.assertEqual(provider.limiter.throttled, 1)
+        self.assertLess(provider.limiter.rate, provider.tps)
+
+    def test_request_rate_round_trips_through_rate_state(self):
+        with patch("epg2xml.providers.requests.Session", return_value=DummySession()):
+            provider = FAKE(dict(CFG, MAX_TPS=4.0))
+            warm = FAKE(dict(CFG, MAX_TPS=4.0))
+        provider.limiter.set_rate(2.5)
+
+        warm.load_rate(provider.dump_rate())
+        self.assertAlmostEqual(warm.limiter.rate, 2.5)
+
+        warm.load_rate({"UPDATED": (datetime.now() - timedelta(days=30)).isoformat(), "TPS": 1.5})
+        self.assertAlmostEqual(warm.limiter.rate, 2.5)
+
+    def test_request_rate_ramps_up_above_provider_tps_by_default(self):
+        with patch("epg2xml.providers.requests.Session", return_value=DummySession()):
+            provider = FAKE(dict(CFG))
+        self.assertEqual(provider.limiter.max_tps, provider.tps * provider.max_tps_headroom)
+        for _ in range(100):
+            provider.limiter.success()
+        self.assertGreater(provider.limiter.rate, provider.tps)
+
+        handler = self.make_handler(provider)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ratefile = Path(tmpdir) / "RateLimit.json"
+            handler.save_rates(ratefile)
+            provider.limiter.set_rate(provider.tps)
+            with patch("epg2xml.providers.json_loads", wraps=json_loads) as loads:
+                handler.load_rates(ratefile)
+        loads.assert_called_once()
+        self.assertGreater(provider.limiter.rate, provider.tps)
+
     def test_request_falls_back_to_text_for_non_json_response(self):
         session = DummySession()
         session.responses = [DummyTextResponse()]
@@ -272,6 +490,106 @@ class TestProvider(unittest.TestCase):
 
         self.assertEqual(response, "plain text response")
 
+    def test_request_skips_json_decoding_for_html_but_not_for_mislabelled_json(self):
+        mislabelled = DummyHtmlResponse()
+        mislabelled.text = ' {"schedules": []}'
+        session = DummySession()
+        session.responses = [DummyHtmlResponse(), mislabelled]
+        with patch("epg2xml.providers.requests.Session", return_value=session):
+            provider = FAKE(dict(CFG))
+
+        with patch("epg2xml.utils.json_loads", wraps=json_loads) as loads:
+            self.assertEqual(provider.request("https://example.com"), DummyHtmlResponse.text)
+            loads.assert_not_called()
+            self.assertEqual(provider.request("https://example.com"), {"schedules": []})
+
+    def test_fetch_programs_keeps_unit_order_with_concurrency(self):
+        with patch("epg2xml.providers.requests.Session", DummySession):
+            provider = FAKE(dict(CFG, CONCURRENCY=4))
+        provider.req_channels = [EPGChannel(f"ch{n}.id", "FAKE", f"ch{n}", f"CH{n}") for n in range(3)]
+        base = datetime(2026, 1, 1)
+
+        def fetch(ch, nd):
+            time.sleep(0.01 * ((3 - nd) % 3))  # finish out of submission order
+            return [EPGProgram(ch.id, stime=base + timedelta(days=nd, hours=h)) for h in range(2)]
+
+        units = [(ch, nd) for ch in provider.req_channels for nd in range(3)]
+        provider.fetch_programs(units, fetch)
+
+        for ch in provider.req_channels:
+            self.assertEqual(
+                [p.stime for p in ch.programs],
+                [base + timedelta(days=nd, hours=h) for nd in range(3) for h in range(2)],
+            )
+
+    def test_fetch_programs_drops_units_after_channel_ended(self):
+        with patch("epg2xml.providers.requests.Session", DummySession):
+            provider = FAKE(dict(CFG, CONCURRENCY=4))
+        provider.req_channels = [EPGChannel(f"ch{n}.id", "FAKE", f"ch{n}", f"CH{n}") for n in range(2)]
+        base = datetime(2026, 1, 1)
+        later_days_fetched = threading.Event()
+
+        def fetch(ch, nd):
+            if ch.id == "ch0.id" and nd == 1:
+                # The later days of the channel are already in flight, and done, when this one ends it.
+                later_days_fetched.wait(5)
+                raise ChannelEnded(f"no programs: {ch.id} {nd}")
+            if ch.id == "ch0.id" and nd == 2:
+                later_days_fetched.set()
+            return [EPGProgram(ch.id, stime=base + timedelta(days=nd))]
+
+        with self.assertLogs(provider.log.logger, level="WARNING") as logs:
+            provider.fetch_programs([(ch, nd) for ch in provider.req_channels for nd in range(3)], fetch)
+
+        ch0, ch1 = provider.req_channels
+        self.assertEqual([p.stime for p in ch0.programs], [base])
+        self.assertEqual([p.stime for p in ch1.programs], [base + timedelta(days=nd) for nd in range(3)])
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("no programs: ch0.id 1", logs.output[0])
+
+    def test_fetch_programs_propagates_fetch_exceptions(self):
+        with patch("epg2xml.providers.requests.Session", DummySession):
+            provider = FAKE(dict(CFG, CONCURRENCY=2))
+        provider.req_channels = [EPGChannel("ch.id", "FAKE", "ch", "CH")]
+
+        def fetch(ch, nd):
+            raise RuntimeError(f"boom {ch.id} {nd}")
+
+        with self.assertRaises(RuntimeError):
+            provider.fetch_programs([(provider.req_channels[0], 0)], fetch)
+
+    def test_fetch_programs_resumes_units_from_journal(self):
+        with patch("epg2xml.providers.requests.Session", DummySession):
+            provider = FAKE(CFG)
+        channels = [EPGChannel(f"ch{n}.id", "FAKE", f"ch{n}", f"CH{n}") for n in range(2)]
+        units = [(ch, day) for ch in channels for day in (1, 2)]
+        fetched = []
+
+        def fetch(ch, day):
+            if (ch.id, day) == ("ch1.id", 2) and "restart" not in fetched:
+                raise RuntimeError("network down")
+            fetched.append((ch.id, day))
+            return [] if (ch.id, day) == ("ch0.id", 2) else parse_fake_day(ch.id, day)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dbfile = Path(tmpdir) / "journal.db"
+            provider.req_channels = channels
+            with Journal(dbfile) as provider.journal, self.assertRaises(RuntimeError):
+                provider.fetch_programs(units, fetch)
+            self.assertEqual(provider.journal.stats["recorded"], 2)
+
+            fetched.append("restart")
+            provider.req_channels = channels = [EPGChannel(ch.id, "FAKE", ch.svcid, ch.name) for ch in channels]
+            with Journal(dbfile, resume=True) as provider.journal:
+                provider.fetch_programs([(ch, day) for ch in channels for day in (1, 2)], fetch)
+            self.assertEqual(provider.journal.stats["resumed"], 2)
+
+        # Units that gave no programs may have failed and are fetched again.
+        self.assertEqual(fetched[fetched.index("restart") + 1 :], [("ch0.id", 2), ("ch1.id", 2)])
+        for ch in channels:
+            expected = [p for day in (1, 2) for p in parse_fake_day(ch.id, day) if (ch.id, day) != ("ch0.id", 2)]
+            self.assertEqual(ch.programs, expected)
+
     def test_load_channels_parallel_propagates_worker_exceptions(self):
         handler = self.make_handler(FakeHandlerProvider(RuntimeError("boom")))
 
@@ -341,6 +659,103 @@ class TestProvider(unittest.TestCase):
         self.assertEqual(len(provider.req_channels[1].programs), 1)
         self.assertEqual(provider.req_channels[1].programs[0].title, "테스트 프로그램")
 
+    def test_program_shares_repeated_strings(self):
+        first, second = ("".join(["kt", ".id"]) for _ in range(2))
+        a, b = EPGProgram(first), EPGProgram(second, categories=["".join(["뉴", "스"])])
+        a.add_category("".join(["뉴", "스"]))
+        a.add_extra("".join(["H", "D"]))
+        b.add_extra("".join(["H", "D"]))
+
+        self.assertIs(a.channelid, b.channelid)
+        self.assertIs(a.categories[0], b.categories[0])
+        self.assertIs(a.extras[0], b.extras[0])
+        if sys.version_info >= (3, 10):
+            self.assertFalse(hasattr(a, "__dict__"))
+
+    def test_kt_schedule_is_extracted_without_bs4(self):
+        page = (
+            "<table><tbody><tr><td> 07 </td><td><p>05</p><p>45</p></td>"
+            '<td><p><b>방송중 </b>뉴스 &amp; 날씨<img alt="15세 이상 시청 가능"></p><p>드라마 &lt;2부&gt;</p></td>'
+            "<td><p>교양</p><p>드라마</p></td></tr><tr><td>08</td></tr></tbody></table>"
+        )
+        with patch.object(kt, "schedule_rows_bs4") as fallback:
+            programs = kt.epgs_of_day("kt.id", page, datetime(2026, 1, 1).date(), re.compile(kt.KT.title_regex))
+
+        fallback.assert_not_called()
+        self.assertEqual(
+            [(p.stime.strftime("%H:%M"), p.title, p.part_num, p.categories, p.rating) for p in programs],
+            [("07:05", "뉴스 & 날씨", None, ["교양"], 15), ("07:45", "드라마 (2부)", "2", ["드라마"], 0)],
+        )
+
+    def test_kt_schedule_falls_back_to_bs4_on_unexpected_markup(self):
+        page = "<tbody><tr><td>07</td><td><p>05</td></tr></tbody>"
+        rows = [("07", [("05", "뉴스", "교양", [])])]
+        with patch.object(kt, "schedule_rows_bs4", return_value=rows) as fallback:
+            programs = kt.epgs_of_day("kt.id", page, datetime(2026, 1, 1).date(), re.compile(kt.KT.title_regex))
+
+        fallback.assert_called_once_with(page)
+        self.assertEqual([p.title for p in programs], ["뉴스"])
+
+    @unittest.skipIf(real_bs4 is None, "bs4 is not installed")
+    def test_daum_single_pass_parser_matches_selector_parser(self):
+        class HTMLSoup(real_bs4.BeautifulSoup):
+            def __init__(self, markup):
+                super().__init__(markup, "html.parser")
+
+        class NewYearDateTime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                del tz
+                return cls(2027, 1, 2, 12, 0, 0)
+
+        title_regex = re.compile(daum.DAUM.title_regex)
+        dates = ["12.30", "12.31", "01.01", "01.02", "01.03", "01.04", "01.05"]
+        for name, page, currdate in (
+            ("this year", daum_page(["01.01", "01.02", "01.03"]), FixedDateTime.now()),
+            ("new year", daum_page(dates), NewYearDateTime.now()),
+        ):
+            with self.subTest(name), patch.dict(sys.modules, bs4=real_bs4), patch.object(
+                daum, "BeautifulSoup", HTMLSoup
+            ), patch.object(daum, "datetime", type(currdate)):
+                programs = daum.epgs_of_days("daum.id", page, title_regex)
+                expected = daum_epgs_of_days_select("daum.id", page, title_regex, HTMLSoup, currdate)
+                self.assertEqual(programs, expected)
+                self.assertEqual(len(programs), 4 * len(page.split('class="date"')[1:]))
+
+        self.assertEqual(
+            [p.stime for p in programs if p.title == "영화"],
+            [datetime(2026, 12, 30 + nd, 23, 30) for nd in range(2)]
+            + [datetime(2027, 1, 1 + nd, 23, 30) for nd in range(5)],
+        )
+        first = programs[1]
+        self.assertEqual(
+            (first.title, first.part_num, first.ep_num, first.title_sub, first.rating, first.rebroadcast),
+            ("아침 드라마 2부", "2", "12", "첫 만남", 15, False),
+        )
+        self.assertEqual((programs[0].title, programs[0].rebroadcast), ("심야 뉴스", True))
+
+    @unittest.skipIf(real_bs4 is None or find_spec("lxml") is None, "bs4 or lxml is not installed")
+    def test_naver_lxml_parser_matches_bs4_parser(self):
+        class HTMLSoup(real_bs4.BeautifulSoup):
+            def __init__(self, markup):
+                super().__init__(markup, "html.parser")
+
+        day = datetime(2026, 1, 1).date()
+        data = {"dataHtml": NAVER_ITEMS}
+        with patch.dict(sys.modules, bs4=real_bs4), patch.object(naver, "BeautifulSoup", HTMLSoup):
+            expected = naver.epgs_of_day("naver.id", data, day)
+        with patch.object(html_parser_backend, "name", "lxml.html"):
+            programs = naver.epgs_of_day("naver.id", data, day)
+            self.assertEqual(naver.epgs_of_day("naver.id", {"dataHtml": []}, day), [])
+
+        self.assertEqual(programs, expected)
+        self.assertEqual([type(p.title) for p in programs], [str, str])
+        self.assertEqual(
+            (programs[0].title, programs[0].title_sub, programs[0].rating, programs[0].rebroadcast),
+            ("<특집> 아침 & 뉴스", " 첫 회 ", 15, True),
+        )
+        self.assertEqual((programs[0].extras, programs[1].stime), (["HD"], datetime(2026, 1, 1, 7, 30)))
+
     def test_sqlite_round_trip_preserves_channel_and_program_order(self):
         channel = EPGChannel("kt.id", "KT", "svc1", "Channel A")
         channel.no = "101"
@@ -366,6 +781,252 @@ class TestProvider(unittest.TestCase):
         self.assertEqual([program.title for program in loaded_programs], ["A", "B"])
         self.assertFalse(any(issubclass(w.category, DeprecationWarning) for w in caught))
 
+    def test_sqlite_upsert_refreshes_window_and_keeps_history(self):
+        def prog(hour, title):
+            stime = datetime(2026, 1, 1, hour)
+            return EPGProgram("kt.id", stime=stime, etime=stime + timedelta(hours=1), title=title)
+
+        channel = EPGChannel("kt.id", "KT", "svc1", "Channel A")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dbfile = Path(tmpdir) / "epg.db"
+            with SQLite(dbfile, "w") as db:
+                db.insert_channels([channel])
+                db.insert_programs([prog(h, f"old {h}") for h in range(6)] + [prog(5, "dup 5")])
+
+            with SQLite(dbfile, "a") as db:
+                self.assertEqual(db.upsert_channels([channel]), 0)
+                written, deleted = db.upsert_programs("kt.id", [prog(2, "old 2"), prog(3, "new 3"), prog(5, "old 5")])
+                channel.name = "Channel B"
+                self.assertEqual(db.upsert_channels([channel]), 1)
+
+            with SQLite(dbfile, "r") as db:
+                titles = [(p.stime.hour, p.title) for p in db.select_programs("kt.id")]
+                names = [ch.name for ch in db.select_channels("KT")]
+
+        self.assertEqual((written, deleted), (2, 1))
+        self.assertEqual(titles, [(0, "old 0"), (1, "old 1"), (2, "old 2"), (3, "new 3"), (5, "old 5")])
+        self.assertEqual(names, ["Channel B"])
+
+    def test_sqlite_upsert_without_programs_keeps_stored_ones(self):
+        channel = EPGChannel("kt.id", "KT", "svc1", "Channel A")
+        stime = datetime(2026, 1, 1, 9)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dbfile = Path(tmpdir) / "epg.db"
+            with SQLite(dbfile, "a") as db:
+                db.upsert_channels([channel])
+                db.upsert_programs("kt.id", [EPGProgram("kt.id", stime=stime, etime=stime, title="A")])
+            with SQLite(dbfile, "a") as db:
+                self.assertEqual(db.upsert_programs("kt.id", []), (0, 0))
+            with SQLite(dbfile, "r") as db:
+                self.assertEqual(len(db.select_programs("kt.id")), 1)
+
+    def test_from_db_loads_and_streams_programs_in_channel_order(self):
+        channels = [EPGChannel("b.fake", "FAKE", "b", "B", no="2"), EPGChannel("a.fake", "FAKE", "a", "A", no="1")]
+        channels.append(EPGChannel("c.fake", "FAKE", "c", "C", no="3"))
+        programs = []
+        for hour in (10, 9):
+            for ch in channels[:2]:
+                stime = datetime(2026, 1, 1, hour)
+                programs.append(EPGProgram(ch.id, stime=stime, etime=stime + timedelta(hours=1), title=f"{ch.name}{hour}"))
+
+        def make_handler():
+            with patch("epg2xml.providers.requests.Session", DummySession):
+                return self.make_handler(FAKE(dict(CFG)))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dbfile = Path(tmpdir) / "epg.db"
+            with SQLite(dbfile, "w") as db:
+                db.insert_channels(channels)
+                db.insert_programs(programs)
+
+            loaded = make_handler()
+            loaded.from_db(dbfile)
+            loaded_titles = [(ch.id, [p.title for p in ch.programs]) for ch in loaded.all_channels]
+            loaded_xml, streamed_xml = io.StringIO(), io.StringIO()
+            loaded.to_xml(writer=loaded_xml)
+            make_handler().to_xml(writer=streamed_xml, dbfile=dbfile)
+
+        self.assertEqual(loaded_titles, [("a.fake", ["A9", "A10"]), ("b.fake", ["B9", "B10"]), ("c.fake", [])])
+        self.assertEqual(streamed_xml.getvalue(), loaded_xml.getvalue())
+        self.assertNotIn('"c.fake"', streamed_xml.getvalue())
+
+    def test_dbstream_writes_rows_without_building_programs(self):
+        channels = [EPGChannel("a.fake", "FAKE", "a", "A", no="1")]
+        stime = datetime(2026, 1, 1, 9)
+        programs = [
+            EPGProgram("a.fake", stime=stime, etime=stime + timedelta(hours=1), title="뉴스", ep_num="3"),
+            EPGProgram("a.fake", stime=stime + timedelta(hours=1), etime=stime + timedelta(hours=2), title=None),
+            EPGProgram(
+                "a.fake",
+                stime=stime + timedelta(hours=2),
+                etime=stime + timedelta(hours=3),
+                title="영화 ",
+                title_sub="영화",
+                categories=["영화", " 드라마 "],
+                keywords=["액션"],
+                rebroadcast=True,
+                rating=15,
+                desc="줄거리",
+            ),
+        ]
+        outputs = [OutputProfile(io.StringIO(), {"ADD_DESCRIPTION": False, "ADD_XMLTV_NS": True})]
+
+        def make_handler():
+            with patch("epg2xml.providers.requests.Session", DummySession):
+                return self.make_handler(FAKE(dict(CFG)))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dbfile = Path(tmpdir) / "epg.db"
+            with SQLite(dbfile, "w") as db:
+                db.insert_channels(channels)
+                db.insert_programs(programs)
+
+            loaded = make_handler()
+            loaded.from_db(dbfile)
+            loaded_xml = io.StringIO()
+            loaded.to_xml(writer=loaded_xml, outputs=outputs)
+            expected = [loaded_xml.getvalue(), outputs[0].writer.getvalue()]
+
+            outputs[0].writer.seek(0)
+            outputs[0].writer.truncate()
+            streamed_xml = io.StringIO()
+            with patch("epg2xml.providers.EPGProgram", side_effect=AssertionError), self.assertLogs(
+                "PROV", level="WARNING"
+            ) as logs:
+                make_handler().to_xml(writer=streamed_xml, dbfile=dbfile, outputs=outputs)
+
+        self.assertEqual([streamed_xml.getvalue(), outputs[0].writer.getvalue()], expected)
+        self.assertIn("<keyword lang=\"ko\">액션</keyword>", expected[0])
+        self.assertEqual(logs.output, ["WARNING:PROV:EPGProgram.title is missing: <untitled> <a.fake> @ 2026-01-01T10:00:00"])
+
+    def make_fetching_provider(self, wait=None):
+        with patch("epg2xml.providers.requests.Session", DummySession):
+            provider = FetchingProvider(dict(CFG), wait=wait)
+        provider.req_channels = [EPGChannel(f"{x}.fake", "FAKE", x, x.upper()) for x in "ab"]
+        return provider
+
+    def test_plan_refresh_fetches_only_days_due_by_policy(self):
+        def run(dbfile):
+            with patch("epg2xml.providers.requests.Session", DummySession):
+                provider = DailyProvider(dict(CFG, REFRESH_POLICY={"0": "1h", "1+": "12h"}))
+            provider.req_channels = [EPGChannel(f"{x}.fake", "FAKE", x, x.upper()) for x in "ab"]
+            handler = self.make_handler(provider)
+            handler.plan_refresh(dbfile)
+            provider.get_programs()
+            handler.to_db(dbfile)
+            out = io.StringIO()
+            handler.to_xml(writer=out)
+            return provider.fetched, out.getvalue()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dbfile = Path(tmpdir) / "epg.db"
+            fetched, expected = run(dbfile)
+            self.assertEqual(len(fetched), 6)
+            two_hours_ago = datetime.now() - timedelta(hours=2)
+            with SQLite(dbfile, "a") as db:
+                db.conn.execute("UPDATE epgfetch SET fetched = ?", (two_hours_ago,))
+
+            fetched, written = run(dbfile)
+            self.assertEqual(fetched, [("a.fake", 0), ("b.fake", 0)])
+            self.assertEqual(written, expected)
+            with SQLite(dbfile, "r") as db:
+                units = db.select_fetched()
+        self.assertEqual(len(units), 6)
+        self.assertEqual(sorted(u.fetched > two_hours_ago for u in units.values()), [False] * 4 + [True] * 2)
+
+    def test_stream_xml_writes_channels_before_later_ones_are_fetched(self):
+        streamed = threading.Event()
+
+        class Writer(io.StringIO):
+            def write(self, text):
+                if 'channel="a.fake"' in text:
+                    streamed.set()
+                return super().write(text)
+
+        writer = Writer()
+        provider = self.make_fetching_provider(wait={("b.fake", 1): streamed})
+        self.make_handler(provider).stream_xml(writer=writer)
+
+        expected = io.StringIO()
+        loaded = self.make_fetching_provider()
+        loaded.get_programs()
+        self.make_handler(loaded).to_xml(writer=expected)
+        self.assertEqual(writer.getvalue(), expected.getvalue())
+        self.assertIn('start="20260102210000 +0900" stop="20260103000000 +0900"', writer.getvalue())
+        self.assertEqual([ch.programs for ch in provider.req_channels], [[], []])
+
+    def test_output_profiles_are_written_in_the_same_pass(self):
+        def write(flags, **kwargs):
+            provider = self.make_fetching_provider()
+            provider.cfg.update(flags)
+            provider.get_programs()
+            out = io.StringIO()
+            self.make_handler(provider).to_xml(writer=out, **kwargs)
+            return out.getvalue()
+
+        plain_flags = {"ADD_DESCRIPTION": False, "ADD_XMLTV_NS": True}
+        expected_plain, expected_main = write(plain_flags), write({})
+
+        provider = self.make_fetching_provider()
+        provider.get_programs()
+        main, plain, only_b = io.StringIO(), io.StringIO(), io.StringIO()
+        outputs = [OutputProfile(plain, plain_flags), OutputProfile(only_b, channels=["b.*"])]
+        with patch.object(EPGProgram, "validate", autospec=True, side_effect=EPGProgram.validate) as validate:
+            self.make_handler(provider).to_xml(writer=main, outputs=outputs)
+
+        self.assertEqual(validate.call_count, 8)
+        self.assertEqual(main.getvalue(), expected_main)
+        self.assertEqual(plain.getvalue(), expected_plain)
+        self.assertNotIn("<desc", plain.getvalue())
+        self.assertNotIn('"a.fake"', only_b.getvalue())
+        self.assertEqual(only_b.getvalue().count('channel="b.fake">'), 4)
+        self.assertTrue(only_b.getvalue().endswith("</tv>\n"))
+
+    def test_stream_xml_writes_output_profiles(self):
+        expected = io.StringIO()
+        loaded = self.make_fetching_provider()
+        loaded.get_programs()
+        self.make_handler(loaded).to_xml(writer=expected)
+
+        main, extra = io.StringIO(), io.StringIO()
+        handler = self.make_handler(self.make_fetching_provider())
+        handler.stream_xml(writer=main, outputs=[OutputProfile(extra, channels=["a.fake", "b.fake"])])
+        self.assertEqual(main.getvalue(), expected.getvalue())
+        self.assertEqual(extra.getvalue(), expected.getvalue())
+
+    def test_failed_stream_xml_keeps_the_previous_dbfile(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dbfile = Path(tmpdir) / "epg.db"
+            self.make_handler(self.make_fetching_provider()).stream_xml(writer=io.StringIO(), dbfile=dbfile)
+            with SQLite(dbfile, "r") as db:
+                expected = db.count_programs()
+
+            provider = self.make_fetching_provider()
+            provider.fetch_day = lambda ch, day: 1 / 0
+            with self.assertRaises(ZeroDivisionError):
+                self.make_handler(provider).stream_xml(writer=io.StringIO(), dbfile=dbfile)
+            with SQLite(dbfile, "r") as db:
+                self.assertEqual(db.count_programs(), expected)
+                self.assertEqual([ch.id for ch in db.select_channels("FAKE")], ["a.fake", "b.fake"])
+
+    def test_parse_in_worker_process_returns_equal_programs(self):
+        provider = self.make_fetching_provider()
+        expected = provider.parse(parse_fake_day, "a.fake", 1)
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            provider.parse_pool = pool
+            parsed = provider.parse(parse_fake_day, "a.fake", 1)
+            with self.assertRaises(ZeroDivisionError):
+                provider.parse(divmod, 1, 0)
+
+        self.assertEqual(parsed, expected)
+        self.assertIs(parsed[0].channelid, parsed[1].channelid)
+
+    def test_iter_programs_reraises_provider_errors(self):
+        provider = self.make_fetching_provider()
+        provider.fetch_day = lambda ch, day: 1 / 0
+        with self.assertRaises(ZeroDivisionError):
+            list(provider.iter_programs())
+
     def test_to_xml_writes_to_given_stream(self):
         handler = self.make_handler(FakeXmlProvider())
         buffer = io.StringIO()
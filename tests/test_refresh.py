@@ -0,0 +1,41 @@
+import unittest
+from datetime import date, datetime, timedelta
+
+from epg2xml.refresh import RefreshPolicy, parse_duration
+
+
+class TestRefreshPolicy(unittest.TestCase):
+    def test_durations(self):
+        self.assertEqual(parse_duration(90), timedelta(seconds=90))
+        self.assertEqual(parse_duration("90m"), timedelta(minutes=90))
+        self.assertEqual(parse_duration(" 1.5H "), timedelta(hours=1.5))
+        self.assertEqual(parse_duration("2d"), timedelta(days=2))
+        for value in ("1w", "h", "", None, True, [1]):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_duration(value)
+
+    def test_max_age_by_days_from_today(self):
+        policy = RefreshPolicy({"0": "1h", "1": "3h", "2+": "12h", "5+": "1d", "6": 0})
+        self.assertEqual(
+            [policy.max_age(nd) for nd in range(8)],
+            [timedelta(hours=h) for h in (1, 3, 12, 12, 12, 24, 0, 24)],
+        )
+        self.assertEqual(RefreshPolicy({"2+": 60}).max_age(1), timedelta(0))
+
+    def test_is_fresh(self):
+        policy = RefreshPolicy({"0": "1h", "1+": "12h"})
+        now = datetime(2026, 1, 1, 12)
+        self.assertTrue(policy.is_fresh(date(2026, 1, 1), now - timedelta(minutes=59), now))
+        self.assertFalse(policy.is_fresh(date(2026, 1, 1), now - timedelta(minutes=61), now))
+        self.assertTrue(policy.is_fresh(date(2026, 1, 3), now - timedelta(hours=11), now))
+        self.assertFalse(policy.is_fresh(date(2025, 12, 31), now, now))
+
+    def test_from_config(self):
+        self.assertIsNone(RefreshPolicy.from_config(None))
+        for value in (["1h"], {"today": "1h"}, {"-1": "1h"}, {"0": "soon"}):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                RefreshPolicy.from_config(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
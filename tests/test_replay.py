@@ -0,0 +1,173 @@
+import sys
+import tempfile
+import types
+import unittest
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+
+bs4 = types.ModuleType("bs4")
+
+
+class DummyBeautifulSoup:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class DummyFeatureNotFound(Exception):
+    pass
+
+
+bs4.BeautifulSoup = DummyBeautifulSoup
+bs4.FeatureNotFound = DummyFeatureNotFound
+sys.modules.setdefault("bs4", bs4)
+
+from epg2xml.providers import EPGHandler, EPGProvider
+from epg2xml.replay import RecordingSession, ReplaySession, archive_path, requests
+
+
+CFG = {
+    "ENABLED": True,
+    "FETCH_LIMIT": 2,
+    "ID_FORMAT": "{ServiceId}.{Source.lower()}",
+    "ADD_REBROADCAST_TO_TITLE": False,
+    "ADD_EPNUM_TO_TITLE": True,
+    "ADD_DESCRIPTION": True,
+    "ADD_XMLTV_NS": False,
+    "ADD_CHANNEL_ICON": True,
+    "HTTP_PROXY": None,
+    "CONCURRENCY": 1,
+    "MAX_TPS": None,
+    "MY_CHANNELS": [],
+}
+
+
+class FAKE(EPGProvider):
+    def get_svc_channels(self):
+        return []
+
+    def get_programs(self):
+        raise NotImplementedError
+
+
+class DummyResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+        self.headers = {"Content-Type": "application/json"}
+
+
+class DummySession:
+    def __init__(self):
+        self.headers = {}
+        self.proxies = {}
+        self.calls = []
+        self.closed = False
+
+    def request(self, method=None, url=None, **kwargs):
+        self.calls.append((method, url, kwargs))
+        if url.endswith("/down"):
+            raise requests.exceptions.ConnectionError("down")
+        return DummyResponse(
+            f'{{"url": "{url}", "params": {len(kwargs.get("params") or {})}, "n": {len(self.calls) - 1}}}'
+        )
+
+    def close(self):
+        self.closed = True
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.archive = archive_path(self.tmpdir.name, "fake")
+
+    def record(self, *requests_args):
+        session = DummySession()
+        recorder = RecordingSession(session, self.archive)
+        for method, url, kwargs in requests_args:
+            try:
+                recorder.request(method=method, url=url, **kwargs)
+            except requests.exceptions.RequestException:
+                pass
+        recorder.close()
+        self.assertTrue(session.closed)
+        return session
+
+    def test_archive_is_named_after_provider(self):
+        self.assertEqual(self.archive, Path(self.tmpdir.name) / "FAKE.jsonl.gz")
+
+    def test_replay_serves_recorded_responses_exactly(self):
+        params = {"day": "20240101"}
+        self.record(("GET", "https://a.test/epg", {"params": params}), ("POST", "https://a.test/x", {"data": {"k": 1}}))
+        params["day"] = "mutated after the call"
+
+        replay = ReplaySession(self.archive)
+        post = replay.request(method="POST", url="https://a.test/x", data={"k": 1})
+        get = replay.request(method="GET", url="https://a.test/epg", params={"day": "20240101"})
+
+        self.assertEqual(post.json(), {"url": "https://a.test/x", "params": 0, "n": 1})
+        self.assertEqual(get.json()["params"], 1)
+        self.assertEqual(get.headers["Content-Type"], "application/json")
+        self.assertEqual(get.headers.get("content-type"), "application/json")
+
+    def test_replay_moves_dates_back_to_the_recording_day(self):
+        def on(day):
+            class Today(date):
+                @classmethod
+                def today(cls):
+                    return cls.fromordinal(day.toordinal())
+
+            return patch("epg2xml.replay.date", Today)
+
+        with on(date(2024, 1, 1)):
+            self.record(
+                *(
+                    ("GET", f"https://a.test/day/2024/1/{1 + nd}", {"params": {"ch": ch, "d": f"2024010{1 + nd}"}})
+                    for ch in ("1", "2")
+                    for nd in range(2)
+                ),
+                ("POST", "https://a.test/x", {"data": {"ch": "1", "seldate": "2024-01-02", "id": "20230101"}}),
+            )
+
+        replay = ReplaySession(self.archive)
+        with on(date(2025, 3, 1)):
+            second = replay.request(
+                method="GET", url="https://a.test/day/2025/3/2", params={"ch": "2", "d": "20250302"}
+            )
+            first = replay.request(method="GET", url="https://a.test/day/2025/3/1", params={"ch": "2", "d": "20250301"})
+            post = replay.request(
+                method="POST", url="https://a.test/x", data={"ch": "1", "seldate": "2025-03-02", "id": "20230101"}
+            )
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                replay.request(method="GET", url="https://a.test/day/2025/3/1", params={"ch": "3", "d": "20250301"})
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                replay.request(method="GET", url="https://a.test/day/2025/3/3", params={"ch": "1", "d": "20250303"})
+
+        self.assertEqual([second.json()["n"], first.json()["n"], post.json()["n"]], [3, 2, 4])
+        self.assertEqual(replay.misses, 2)
+
+    def test_replay_reraises_recorded_errors(self):
+        self.record(("GET", "https://a.test/down", {}))
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            ReplaySession(self.archive).request(method="GET", url="https://a.test/down")
+
+    def test_handler_replays_through_provider_request(self):
+        self.record(("GET", "https://a.test/epg", {"params": {"d": 1}}))
+        with patch("epg2xml.providers.requests.Session", return_value=DummySession()):
+            handler = EPGHandler({})
+            handler.providers = [FAKE(dict(CFG))]
+        handler.replay(self.tmpdir.name)
+
+        provider = handler.providers[0]
+        response = provider.request("https://a.test/epg", params={"d": 1})
+        self.assertEqual(response, {"url": "https://a.test/epg", "params": 1, "n": 0})
+        with patch("epg2xml.providers.time.sleep"):
+            self.assertEqual(provider.request("https://a.test/missing"), "")
+        handler.close_sessions()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import gzip
+import http.client
+import unittest
+
+from epg2xml.server import Snapshot, XMLTVServer
+
+HEAD = '<?xml version="1.0" encoding="UTF-8"?>\n<tv generator-info-name="epg2xml">\n'
+
+
+def fragment(channelid):
+    return (
+        channelid,
+        f'  <channel id="{channelid}">\n  </channel>\n',
+        f'  <programme channel="{channelid}">\n    <title>뉴스</title>\n  </programme>\n',
+    )
+
+
+PROVIDERS = [("KT", [fragment("1.kt"), fragment("2.kt")]), ("SK", [fragment("1.sk")])]
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_body_lists_channels_before_programs(self):
+        snapshot = Snapshot(HEAD, PROVIDERS, 0)
+        fragments = [x for _, fragments in PROVIDERS for x in fragments]
+        expected = HEAD + "".join(x[1] for x in fragments) + "".join(x[2] for x in fragments) + "</tv>\n"
+        self.assertEqual(snapshot.body, expected.encode("utf-8"))
+        self.assertEqual(gzip.decompress(snapshot.gzipped), snapshot.body)
+
+    def test_select_is_the_document_of_selected_channels(self):
+        snapshot = Snapshot(HEAD, PROVIDERS, 0)
+        self.assertEqual(snapshot.select(set(), set()), snapshot.body)
+        self.assertEqual(snapshot.select({"SK"}, set()), Snapshot(HEAD, PROVIDERS[1:], 0).body)
+        self.assertEqual(
+            snapshot.select(set(), {"2.kt", "1.sk"}),
+            Snapshot(HEAD, [("KT", [fragment("2.kt")]), ("SK", [fragment("1.sk")])], 0).body,
+        )
+        self.assertEqual(snapshot.select({"KT"}, {"1.sk"}), Snapshot(HEAD, [], 0).body)
+
+    def test_etag_follows_the_content(self):
+        self.assertEqual(Snapshot(HEAD, PROVIDERS, 0).etag, Snapshot(HEAD, PROVIDERS, 1).etag)
+        self.assertNotEqual(Snapshot(HEAD, PROVIDERS, 0).etag, Snapshot(HEAD, PROVIDERS[1:], 0).etag)
+
+
+class TestXMLTVServer(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = None
+        self.server = XMLTVServer(("127.0.0.1", 0), lambda: self.snapshot)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def request(self, path, method="GET", **headers):
+        conn = http.client.HTTPConnection(*self.server.server_address[:2], timeout=5)
+        self.addCleanup(conn.close)
+        conn.request(method, path, headers={k.replace("_", "-"): v for k, v in headers.items()})
+        resp = conn.getresponse()
+        return resp, resp.read()
+
+    def test_unavailable_until_the_first_snapshot(self):
+        resp, _ = self.request("/xmltv.xml")
+        self.assertEqual(resp.status, 503)
+        self.assertIsNotNone(resp.getheader("Retry-After"))
+
+    def test_serves_the_snapshot(self):
+        self.snapshot = Snapshot(HEAD, PROVIDERS, 0)
+        resp, body = self.request("/xmltv.xml")
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(body, self.snapshot.body)
+        self.assertEqual(resp.getheader("ETag"), self.snapshot.etag)
+
+        resp, body = self.request("/xmltv.xml", Accept_Encoding="gzip, deflate")
+        self.assertEqual(resp.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(body, self.snapshot.gzipped)
+        self.assertNotEqual(resp.getheader("ETag"), self.snapshot.etag)
+
+        resp, body = self.request("/xmltv.xml", Accept_Encoding="gzip;q=0")
+        self.assertIsNone(resp.getheader("Content-Encoding"))
+        self.assertEqual(body, self.snapshot.body)
+
+        resp, body = self.request("/xmltv.xml.gz", "HEAD")
+        self.assertEqual(resp.getheader("Content-Type"), "application/gzip")
+        self.assertEqual(int(resp.getheader("Content-Length")), len(self.snapshot.gzipped))
+        self.assertEqual(body, b"")
+
+        resp, _ = self.request("/epg.xml")
+        self.assertEqual(resp.status, 404)
+
+    def test_conditional_requests(self):
+        self.snapshot = Snapshot(HEAD, PROVIDERS, 1_700_000_000)
+        resp, _ = self.request("/xmltv.xml")
+        etag, last_modified = resp.getheader("ETag"), resp.getheader("Last-Modified")
+
+        resp, body = self.request("/xmltv.xml", If_None_Match=etag)
+        self.assertEqual((resp.status, body), (304, b""))
+        resp, _ = self.request("/xmltv.xml", If_Modified_Since=last_modified)
+        self.assertEqual(resp.status, 304)
+
+        self.snapshot = Snapshot(HEAD, PROVIDERS[1:], 1_700_000_600)
+        resp, body = self.request("/xmltv.xml", If_None_Match=etag)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(body, self.snapshot.body)
+
+    def test_filters(self):
+        self.snapshot = Snapshot(HEAD, PROVIDERS, 0)
+        resp, body = self.request("/xmltv.xml?provider=sk")
+        self.assertEqual(body, self.snapshot.select({"SK"}, set()))
+        filtered = resp.getheader("ETag")
+        self.assertNotEqual(filtered, self.snapshot.etag)
+
+        resp, body = self.request("/xmltv.xml.gz?channel=1.kt&channel=1.sk")
+        self.assertEqual(gzip.decompress(body), self.snapshot.select(set(), {"1.kt", "1.sk"}))
+
+        resp, _ = self.request("/xmltv.xml?provider=SK", If_None_Match=filtered)
+        self.assertEqual(resp.status, 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,383 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+
+bs4 = types.ModuleType("bs4")
+
+
+class DummyBeautifulSoup:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class DummyFeatureNotFound(Exception):
+    pass
+
+
+bs4.BeautifulSoup = DummyBeautifulSoup
+bs4.FeatureNotFound = DummyFeatureNotFound
+sys.modules.setdefault("bs4", bs4)
+
+from epg2xml.utils import (
+    AdaptiveRateLimiter,
+    AtomicOutput,
+    CompressedWriter,
+    HTMLParserBackend,
+    OptionalDependencyError,
+    ParserBeautifulSoup,
+    RateLimiter,
+    compress_bytes,
+    compression_of,
+    decode_body,
+    open_output,
+    strptime,
+    xmltv_time,
+)
+
+
+class FakeClock:
+    def __init__(self, start: float = 100.0):
+        self.value = start
+
+    def __call__(self) -> float:
+        return self.value
+
+
+class TestRateLimiter(unittest.TestCase):
+    def make_limiter(self, clock, **kwargs) -> RateLimiter:
+        limiter = RateLimiter(**kwargs)
+        limiter.now = clock
+        limiter.next_slot = clock()
+        return limiter
+
+    def test_rejects_non_positive_tps(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(tps=0)
+
+    def test_reservations_are_spaced_by_interval(self):
+        clock = FakeClock()
+        limiter = self.make_limiter(clock, tps=4.0)
+
+        delays = [limiter.reserve() for _ in range(4)]
+
+        self.assertEqual(delays, [0.0, 0.25, 0.5, 0.75])
+
+    def test_burst_tokens_are_available_immediately_and_refill(self):
+        clock = FakeClock()
+        limiter = self.make_limiter(clock, tps=2.0, burst=3)
+
+        self.assertEqual([limiter.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertEqual(limiter.reserve(), 0.5)
+
+        clock.value += 10.0
+        self.assertEqual([limiter.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+
+    def test_calls_per_period_keep_their_average_rate(self):
+        limiter = RateLimiter(calls=15, period=900.0)
+
+        self.assertEqual(limiter.burst, 15)
+        self.assertAlmostEqual(limiter.rate, 15 / 900.0)
+
+    def test_slow_call_does_not_block_other_callers(self):
+        limiter = RateLimiter(tps=1000.0)
+        release = threading.Event()
+        finished = []
+
+        @limiter
+        def call(name, wait=False):
+            if wait:
+                release.wait(5)
+            finished.append(name)
+
+        slow = threading.Thread(target=call, args=("slow", True))
+        slow.start()
+        fast = threading.Thread(target=call, args=("fast",))
+        fast.start()
+        fast.join(5)
+        release.set()
+        slow.join(5)
+
+        self.assertEqual(finished, ["fast", "slow"])
+
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_success_ramps_up_to_max_tps(self):
+        limiter = AdaptiveRateLimiter(tps=1.0, max_tps=2.0, increase=0.5)
+
+        limiter.success()
+        self.assertAlmostEqual(limiter.rate, 1.5)
+        for _ in range(10):
+            limiter.success()
+        self.assertAlmostEqual(limiter.rate, 2.0)
+
+    def test_backoff_halves_rate_down_to_min_tps(self):
+        limiter = AdaptiveRateLimiter(tps=1.0, min_tps=0.2)
+
+        limiter.backoff()
+        self.assertAlmostEqual(limiter.rate, 0.5)
+        for _ in range(5):
+            limiter.backoff()
+        self.assertAlmostEqual(limiter.rate, 0.2)
+        self.assertEqual(limiter.throttled, 6)
+
+    def test_retry_after_holds_back_next_reservation(self):
+        clock = FakeClock()
+        limiter = AdaptiveRateLimiter(tps=1.0)
+        limiter.now = clock
+        limiter.next_slot = clock()
+
+        limiter.backoff(30.0)
+
+        self.assertEqual(limiter.reserve(), 30.0)
+
+    def test_set_rate_is_clamped(self):
+        limiter = AdaptiveRateLimiter(tps=1.0, max_tps=3.0)
+
+        limiter.set_rate(10.0)
+        self.assertAlmostEqual(limiter.rate, 3.0)
+        limiter.set_rate(0.0001)
+        self.assertAlmostEqual(limiter.rate, limiter.min_tps)
+
+
+class ClosingBytesIO(io.BytesIO):
+    def close(self):
+        self.closed_value = self.getvalue()
+        super().close()
+
+
+class BrokenStream(ClosingBytesIO):
+    def write(self, data):
+        if self.tell() > 100:
+            raise OSError("broken pipe")
+        return super().write(data)
+
+
+class TestCompressedWriter(unittest.TestCase):
+    def test_compression_is_guessed_from_extension(self):
+        self.assertEqual(compression_of("xmltv.xml.gz"), "gzip")
+        self.assertEqual(compression_of("xmltv.XML.XZ"), "xz")
+        self.assertEqual(compression_of("/tmp/xmltv.xml.bz2"), "bz2")
+        self.assertIsNone(compression_of("xmltv.xml"))
+
+    def test_round_trips_through_each_compression(self):
+        text = "".join(f"  <programme>제목 {n}</programme>\n" for n in range(5000))
+        for compression, decompress in (("gzip", gzip.decompress), ("xz", lzma.decompress), ("bz2", bz2.decompress)):
+            with self.subTest(compression=compression):
+                raw = ClosingBytesIO()
+                with CompressedWriter(raw, compression, level=1, bufsize=1000) as writer:
+                    for line in text.splitlines(keepends=True):
+                        writer.write(line)
+
+                self.assertTrue(raw.closed)
+                self.assertEqual(decompress(raw.closed_value).decode("utf-8"), text)
+
+    def test_compress_bytes_round_trips_through_each_compression(self):
+        data = "".join(f"  <programme>제목 {n}</programme>\n" for n in range(5000)).encode("utf-8")
+        for compression, decompress in (("gzip", gzip.decompress), ("xz", lzma.decompress), ("bz2", bz2.decompress)):
+            with self.subTest(compression=compression):
+                self.assertEqual(decompress(compress_bytes(data, compression, level=1)), data)
+        with self.assertRaises(ValueError):
+            compress_bytes(data, "zip")
+
+    def test_gzip_output_is_reproducible(self):
+        outputs = []
+        for _ in range(2):
+            raw = ClosingBytesIO()
+            with CompressedWriter(raw, "gzip") as writer:
+                writer.write("<tv></tv>\n")
+            outputs.append(raw.closed_value)
+
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_write_errors_surface_to_the_writer(self):
+        writer = CompressedWriter(BrokenStream(), "gzip", bufsize=1)
+        with self.assertRaises(OSError):
+            for _ in range(100):
+                writer.write("x" * 100000)
+            writer.close()
+
+    def test_rejects_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            CompressedWriter(io.BytesIO(), "zip")
+
+
+class TestAtomicOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, path, text, compression=None):
+        with ExitStack() as stack:
+            open_output(stack, path, compression).write(text)
+
+    def test_replaces_only_when_content_changed(self):
+        path = Path(self.tmpdir.name) / "xmltv.xml"
+        self.write(path, "<tv>뉴스</tv>\n")
+        self.assertEqual(path.read_text(encoding="utf-8"), "<tv>뉴스</tv>\n")
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(path.stat().st_mode & 0o777, 0o666 & ~umask)
+        os.utime(path, (0, 0))
+        ino = path.stat().st_ino
+
+        with self.assertLogs("UTILS", level="INFO") as logs:
+            self.write(path, "<tv>뉴스</tv>\n")
+        self.assertIn("unchanged", logs.output[0])
+        self.assertEqual((path.stat().st_ino, path.stat().st_mtime), (ino, 0))
+
+        self.write(path, "<tv>날씨</tv>\n")
+        self.assertEqual(path.read_text(encoding="utf-8"), "<tv>날씨</tv>\n")
+        self.assertGreater(path.stat().st_mtime, time.time() - 60)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["xmltv.xml"])
+
+    def test_compressed_output_is_compared_as_written(self):
+        path = Path(self.tmpdir.name) / "xmltv.xml.gz"
+        for _ in range(2):
+            output = AtomicOutput(path)
+            with output as raw, CompressedWriter(raw, "gzip") as writer:
+                writer.write("<tv/>\n")
+        self.assertFalse(output.changed)
+        self.assertEqual(gzip.decompress(path.read_bytes()), b"<tv/>\n")
+
+    def test_failed_write_keeps_the_previous_file(self):
+        path = Path(self.tmpdir.name) / "xmltv.xml"
+        self.write(path, "<tv/>\n")
+        with self.assertRaises(RuntimeError), ExitStack() as stack:
+            open_output(stack, path, None).write("<tv>")
+            raise RuntimeError("interrupted")
+        self.assertEqual(path.read_text(encoding="utf-8"), "<tv/>\n")
+        self.assertEqual(os.listdir(self.tmpdir.name), ["xmltv.xml"])
+
+
+class TestHTMLParserBackend(unittest.TestCase):
+    def test_select_checks_name_and_dependency(self):
+        backend = HTMLParserBackend()
+        backend.select("html.parser")
+        self.assertEqual(backend.name, "html.parser")
+        with self.assertRaises(ValueError):
+            backend.select("regex")
+        with patch("epg2xml.utils.find_spec", return_value=None), self.assertRaises(OptionalDependencyError):
+            backend.select("html5lib")
+        self.assertEqual(backend.name, "html.parser")
+
+    def test_parses_are_timed_per_backend(self):
+        backend = HTMLParserBackend()
+        backend.select("html.parser")
+        with patch("epg2xml.utils.html_parser_backend", backend), patch.object(
+            ParserBeautifulSoup.__base__, "__init__", return_value=None
+        ) as init:
+            ParserBeautifulSoup("<p>a</p>")
+            ParserBeautifulSoup("<p>b</p>")
+
+        init.assert_called_with("<p>b</p>", "html.parser")
+        self.assertEqual(backend.pages, {"html.parser": 2})
+        self.assertGreaterEqual(backend.seconds["html.parser"], 0)
+
+    def test_lxml_html_builds_bs4_trees_with_lxml(self):
+        backend = HTMLParserBackend()
+        with patch("epg2xml.utils.find_spec", return_value=object()):
+            backend.select("lxml.html")
+        with patch("epg2xml.utils.html_parser_backend", backend), patch.object(
+            ParserBeautifulSoup.__base__, "__init__", return_value=None
+        ) as init:
+            ParserBeautifulSoup("<p>a</p>")
+
+        init.assert_called_with("<p>a</p>", "lxml")
+        self.assertEqual((backend.name, list(backend.pages)), ("lxml.html", ["lxml"]))
+
+
+
+class TestTimestamps(unittest.TestCase):
+    FORMATS = ("%Y%m%d%H%M%S", "%Y-%m-%d %H:%M", "%Y%m%d%H:%M:%S", "%Y%m%d", "%Y-%m-%d", "%m.%d")
+
+    def assert_same_as_strptime(self, text, fmt):
+        try:
+            expected = datetime.strptime(text, fmt)
+        except ValueError:
+            with self.assertRaises(ValueError):
+                strptime(text, fmt)
+        else:
+            self.assertEqual(strptime(text, fmt), expected)
+
+    def test_strptime_matches_datetime_strptime(self):
+        rng = random.Random(0)
+        base = datetime(1990, 1, 1)
+        for fmt in self.FORMATS:
+            for _ in range(300):
+                text = (base + timedelta(seconds=rng.randrange(50 * 365 * 86400))).strftime(fmt)
+                # Also try mangled inputs, which must be rejected or accepted alike.
+                pos = rng.randrange(len(text))
+                mangled = text[:pos] + rng.choice("0123456789 :-x+") + text[pos + 1 :]
+                for value in (text, mangled, text[:-1], text + "0", f" {text}"):
+                    with self.subTest(fmt=fmt, text=value):
+                        self.assert_same_as_strptime(value, fmt)
+
+    def test_strptime_edge_cases(self):
+        cases = [
+            ("20240229", "%Y%m%d"),
+            ("20230229", "%Y%m%d"),
+            ("20241231240000", "%Y%m%d%H%M%S"),
+            ("2024-1-5 9:05", "%Y-%m-%d %H:%M"),
+            ("２０２４0101", "%Y%m%d"),
+            ("2024+101", "%Y%m%d"),
+            ("01.01", "%m.%d"),
+            ("2024-01-01T10:00", "%Y-%m-%dT%H:%M"),
+            ("10:00", "%H:%M"),
+        ]
+        for text, fmt in cases:
+            with self.subTest(fmt=fmt, text=text):
+                self.assert_same_as_strptime(text, fmt)
+
+    def test_xmltv_time_matches_strftime(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            value = datetime(2000, 1, 1) + timedelta(seconds=rng.randrange(30 * 365 * 86400))
+            self.assertEqual(xmltv_time(value), value.strftime("%Y%m%d%H%M%S +0900"))
+
+
+
+class TestDecodeBody(unittest.TestCase):
+    def test_decodes_by_content_type_or_leading_bracket(self):
+        cases = [
+            ('{"a": [1]}', "application/json; charset=utf-8", {"a": [1]}),
+            ('"text"', "application/vnd.api+json", "text"),
+            ("\n [1, 2]", "text/html", [1, 2]),
+            ('{"a": 1}', None, {"a": 1}),
+            ("<html>{}</html>", "text/html", "<html>{}</html>"),
+            ("1", "text/plain", "1"),
+            ("{broken", "application/json", "{broken"),
+            ("", None, ""),
+        ]
+        for text, content_type, expected in cases:
+            with self.subTest(text=text, content_type=content_type):
+                self.assertEqual(decode_body(text, content_type), expected)
+
+    def test_falls_back_to_json_for_what_orjson_rejects(self):
+        class FakeOrjson:
+            JSONDecodeError = ValueError
+
+            @staticmethod
+            def loads(data):
+                raise ValueError("NaN")
+
+        with patch("epg2xml.utils.orjson", FakeOrjson):
+            self.assertEqual(decode_body('{"a": 1}'), {"a": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import io
+import sys
+import tempfile
+import time
+import types
+import unittest
+from dataclasses import fields
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+
+bs4 = types.ModuleType("bs4")
+
+
+class DummyBeautifulSoup:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class DummyFeatureNotFound(Exception):
+    pass
+
+
+bs4.BeautifulSoup = DummyBeautifulSoup
+bs4.FeatureNotFound = DummyFeatureNotFound
+sys.modules.setdefault("bs4", bs4)
+
+from epg2xml.providers import EPGProgram
+from epg2xml.xmlcache import FragmentCache
+
+
+CFG = {
+    "ADD_REBROADCAST_TO_TITLE": False,
+    "ADD_EPNUM_TO_TITLE": True,
+    "ADD_DESCRIPTION": True,
+    "ADD_XMLTV_NS": False,
+}
+
+
+def make_programs():
+    programs = []
+    stime = datetime(2024, 1, 1, 6)
+    for n in range(5):
+        prog = EPGProgram("1.fake", stime, stime + timedelta(minutes=30), title=f" 뉴스 {n} ", ep_num=str(n + 1))
+        prog.add_cast(["배우"])
+        programs.append(prog)
+        stime += timedelta(minutes=30)
+    return programs
+
+
+def write_all(programs, cfg=CFG, cache=None) -> str:
+    out = io.StringIO()
+    for prog in programs:
+        prog.to_xml(cfg, writer=out, cache=cache)
+    return out.getvalue()
+
+
+class TestFragmentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dbfile = Path(self.tmpdir.name) / "xmlcache.db"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_unchanged_programs_are_written_from_the_previous_run(self):
+        expected = write_all(make_programs())
+        with FragmentCache(self.dbfile) as cache:
+            self.assertEqual(write_all(make_programs(), cache=cache), expected)
+        self.assertEqual(cache.stats["misses"], 5)
+
+        programs = make_programs()
+        programs[2].title = "특집"
+        expected = write_all(programs)
+        programs = make_programs()
+        programs[2].title = "특집"
+        with FragmentCache(self.dbfile) as cache, patch.object(
+            EPGProgram, "xml_data", autospec=True, side_effect=EPGProgram.xml_data
+        ) as xml_data:
+            written = write_all(programs, cache=cache)
+        self.assertEqual(written, expected)
+        self.assertEqual(xml_data.call_count, 1)
+        self.assertEqual((cache.stats["hits"], cache.stats["misses"]), (4, 1))
+
+    def test_key_covers_every_program_field(self):
+        base = make_programs()[0]
+        base.sanitize()
+        changes = {
+            "channelid": "2.fake",
+            "stime": base.stime - timedelta(minutes=1),
+            "etime": base.etime + timedelta(minutes=1),
+            "categories": ["뉴스"],
+            "rebroadcast": True,
+            "rating": 15,
+            "cast": [],
+            "crew": base.cast,
+            "extras": ["HD"],
+            "keywords": ["시사"],
+        }
+        for f in fields(EPGProgram):
+            with self.subTest(field=f.name):
+                prog = make_programs()[0]
+                prog.sanitize()
+                setattr(prog, f.name, changes.get(f.name, "changed"))
+                self.assertNotEqual(
+                    FragmentCache.program_key(FragmentCache.program_content(prog), CFG),
+                    FragmentCache.program_key(FragmentCache.program_content(base), CFG),
+                )
+
+    def test_output_config_is_part_of_the_key(self):
+        cfg = dict(CFG, ADD_DESCRIPTION=False)
+        with FragmentCache(self.dbfile) as cache:
+            write_all(make_programs(), cache=cache)
+            self.assertEqual(write_all(make_programs(), cfg, cache=cache), write_all(make_programs(), cfg))
+        self.assertEqual(cache.stats["misses"], 10)
+        self.assertEqual(cache.stats["hits"], 0)
+
+    def test_key_is_taken_before_other_profiles_render(self):
+        cfg = dict(CFG, ADD_DESCRIPTION=False)
+        with FragmentCache(self.dbfile) as cache:
+            for prog in make_programs():
+                prog.write_xml([(io.StringIO(), CFG), (io.StringIO(), cfg)], cache=cache)
+        with FragmentCache(self.dbfile) as cache:
+            self.assertEqual(write_all(make_programs(), cfg, cache=cache), write_all(make_programs(), cfg))
+        self.assertEqual((cache.stats["hits"], cache.stats["misses"]), (5, 0))
+
+    def test_fragments_are_flushed_in_batches_and_unused_ones_evicted(self):
+        with FragmentCache(self.dbfile, batch_size=2) as cache:
+            write_all(make_programs(), cache=cache)
+            self.assertEqual(len(cache.added), 1)
+            self.assertEqual(cache.conn.execute("SELECT count(*) FROM fragment").fetchone()[0], 4)
+
+        with FragmentCache(self.dbfile, batch_size=2) as cache:
+            write_all(make_programs(), cache=cache)
+            self.assertEqual(cache.stats["hits"], 5)
+            self.assertEqual(len(cache.used), 1)
+
+        with patch("epg2xml.xmlcache.time.time", return_value=time.time() + 8 * 86400):
+            with FragmentCache(self.dbfile) as cache:
+                write_all(make_programs()[:1], cache=cache)
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(cache.stats["evicted"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import random
+import sys
+import types
+import unittest
+from datetime import datetime, timedelta
+
+
+bs4 = types.ModuleType("bs4")
+
+
+class DummyBeautifulSoup:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class DummyFeatureNotFound(Exception):
+    pass
+
+
+bs4.BeautifulSoup = DummyBeautifulSoup
+bs4.FeatureNotFound = DummyFeatureNotFound
+sys.modules.setdefault("bs4", bs4)
+
+from epg2xml.providers import CAT_KO2EN, TAG_CREDITS, Credit, EPGChannel, EPGProgram
+from epg2xml.xmltv import channel_element, escape_attr, escape_text, programme_element, render_channel, render_programme
+
+CHARS = "가나다 abc123&<>\"'\r\n\t\x01\x0b￾()부회 "
+
+
+def random_text(rng: random.Random, max_len: int = 12) -> str:
+    return "".join(rng.choice(CHARS) for _ in range(rng.randint(0, max_len)))
+
+
+def random_program(rng: random.Random) -> EPGProgram:
+    stime = datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 10000))
+    prog = EPGProgram(random_text(rng) or "ch", stime, stime + timedelta(minutes=rng.randint(0, 120)))
+    prog.title = rng.choice([None, random_text(rng), f"{random_text(rng)} ({rng.randint(1, 3)}부)"])
+    prog.title_sub = rng.choice([None, random_text(rng)])
+    prog.ep_num = rng.choice([None, str(rng.randint(1, 99)), f"{rng.randint(1, 9)},{rng.randint(1, 9)}"])
+    prog.rebroadcast = rng.random() < 0.5
+    prog.rating = rng.choice([0, 12, 15, 19])
+    prog.desc = rng.choice([None, random_text(rng, 40)])
+    prog.poster_url = rng.choice([None, f"https://img.test/{random_text(rng)}?a=1&b=2"])
+    for _ in range(rng.randint(0, 3)):
+        prog.add_category(rng.choice([*CAT_KO2EN, random_text(rng)]))
+        prog.add_keyword(random_text(rng))
+    prog.add_cast(random_text(rng) for _ in range(rng.randint(0, 3)))
+    prog.add_crew((random_text(rng) for _ in range(rng.randint(0, 2))), rng.choice(TAG_CREDITS))
+    if prog.cast and rng.random() < 0.5:
+        prog.cast.append(Credit(random_text(rng) or "x", "actor", random_text(rng) or "role\t\"&"))
+    return prog
+
+
+class TestXMLTVWriter(unittest.TestCase):
+    def test_escapes_match_elementtree_and_strip_illegal_chars(self):
+        self.assertEqual(escape_text('a&b<c>d"\r\n\t\x01'), 'a&amp;b&lt;c&gt;d"\r\n\t')
+        self.assertEqual(escape_attr('a&b<c>"\x0b'), "a&amp;b&lt;c&gt;&quot;")
+
+    def test_programme_output_is_identical_to_element_tree(self):
+        rng = random.Random(20240101)
+        for n in range(1000):
+            cfg = {
+                "ADD_EPNUM_TO_TITLE": rng.random() < 0.5,
+                "ADD_REBROADCAST_TO_TITLE": rng.random() < 0.5,
+                "ADD_DESCRIPTION": rng.random() < 0.7,
+                "ADD_XMLTV_NS": rng.random() < 0.3,
+            }
+            data = random_program(rng).xml_data(cfg)
+            with self.subTest(n=n, data=data):
+                self.assertEqual(render_programme(data), programme_element(data).tostring(level=1))
+
+    def test_channel_output_is_identical_to_element_tree(self):
+        rng = random.Random(7)
+        for n in range(500):
+            ch = EPGChannel(f"id{random_text(rng)}", f"src{random_text(rng)}", "svc", f"name{random_text(rng)}")
+            ch.no = rng.choice([None, str(rng.randint(1, 999))])
+            ch.icon = rng.choice([None, f"https://img.test/{random_text(rng)}"])
+            data = ch.xml_data()
+            with self.subTest(n=n, data=data):
+                self.assertEqual(render_channel(data), channel_element(data).tostring(level=1))
+
+    def test_empty_text_after_stripping_keeps_full_element_form(self):
+        prog = EPGProgram("ch", datetime(2024, 1, 1), datetime(2024, 1, 1, 1), title="제목", title_sub="\x01")
+        data = prog.xml_data({"ADD_EPNUM_TO_TITLE": True, "ADD_REBROADCAST_TO_TITLE": False, "ADD_DESCRIPTION": False})
+
+        self.assertIn('<sub-title lang="ko"></sub-title>', render_programme(data))
+        self.assertEqual(render_programme(data), programme_element(data).tostring(level=1))
+
+
+if __name__ == "__main__":
+    unittest.main()